@@ -0,0 +1,54 @@
+import argparse
+import importlib.util
+import os
+import sys
+import time
+
+from bs4 import BeautifulSoup
+
+# 直接运行脚本时将项目根目录加入模块搜索路径，以便导入 seseget
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from seseget.sites.hanime import VIDEO_PAGE_STRAINER
+from seseget.sites.jm_comic import JmComicFetcher
+from seseget.sites.wnacg import WnacgFetcher
+from seseget.utils.html_utils import HTML_PARSERS
+from seseget.utils.trace import logger
+
+
+# 各站点页面的局部解析规则
+SITE_STRAINERS = {
+    "hanime": VIDEO_PAGE_STRAINER,
+    "wnacg": WnacgFetcher.COMIC_PAGE_STRAINER,
+    "jmcomic": JmComicFetcher.ALBUM_PAGE_STRAINER,
+}
+
+
+def bench(markup: str, parser: str, parse_only=None, number=10) -> float:
+    """返回平均解析耗时(ms)"""
+    start = time.perf_counter()
+    for _ in range(number):
+        BeautifulSoup(markup, parser, parse_only=parse_only)
+    return (time.perf_counter() - start) / number * 1000
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="对比各html解析器完整解析和局部解析保存的站点页面的耗时")
+    parser.add_argument("-s", "--site", required=True, choices=list(SITE_STRAINERS.keys()), help="页面所属站点")
+    parser.add_argument("-n", "--number", type=int, default=10, help="每项测试的解析次数")
+    parser.add_argument("file", nargs="+", help="保存的页面html文件")
+
+    args = parser.parse_args()
+    parsers = [p for p in HTML_PARSERS if p == "html.parser" or importlib.util.find_spec(p) is not None]
+    strainer = SITE_STRAINERS[args.site]
+
+    for file in args.file:
+        with open(file, "r", encoding="utf-8") as f:
+            markup = f.read()
+
+        logger.info(f"{os.path.basename(file)} ({len(markup) // 1024}KB)")
+        baseline = bench(markup, "html.parser", number=args.number)
+        for parser_name in parsers:
+            for mode, parse_only in (("完整解析", None), ("局部解析", strainer)):
+                cost = bench(markup, parser_name, parse_only, args.number)
+                logger.info(f"  {parser_name:<12}{mode}: {cost:8.2f}ms  x{baseline / cost:.1f}")
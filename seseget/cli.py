@@ -1,13 +1,70 @@
 import argparse
 import asyncio
 import signal
+import sys
 
+from .config.path import DATA_DIR
+from .library.index import library_index
 from .request.downloadtask import download_manager
-from .request.fetcher import FetcherRegistry
+from .request.fetcher import FetcherRegistry, ComicFetcher
 from .request.requests import session_manager
+from .utils.thread_utils import get_thread_pool_stats
 from .utils.trace import logger
 
 
+# 批量下载时默认同时获取资源信息的url数量
+DEFAULT_INFO_CONCURRENCY = 8
+
+
+async def iter_urls(urls: list[str], input_file: str = ""):
+    """
+    依次产出命令行中的url和输入文件中的url
+
+    输入文件按行流式读取，不会一次性载入内存，每行一个url，忽略空行和以'#'开头的注释行，
+    input_file 为 '-' 时从标准输入读取
+    """
+    for url in urls:
+        yield url
+
+    if not input_file:
+        return
+
+    f = sys.stdin if input_file == "-" else open(input_file, "r", encoding="utf-8")
+    try:
+        while True:
+            # 标准输入可能阻塞，放到线程中读取
+            line = await asyncio.to_thread(f.readline)
+            if not line:
+                break
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            yield line
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+
+async def download_url(url: str, site: str = "", chapter_id_list: list[int] = None, no_download=False, force=False,
+                       refresh=False):
+    """下载单个url，未指定站点时根据url自动识别"""
+    site = site or FetcherRegistry.match_site(url)
+    if not site:
+        logger.error(f"无法识别url所属站点，请使用 -s 指定站点: {url}")
+        return
+
+    try:
+        fetcher = FetcherRegistry.get_fetcher(site)
+        logger.debug(f"获取到Fetcher[{fetcher}]")
+        if isinstance(fetcher, ComicFetcher):
+            await fetcher.download(url, chapter_id_list=chapter_id_list, no_download=no_download, force=force,
+                                   refresh=refresh)
+        else:
+            await fetcher.download(url, no_download=no_download, force=force, refresh=refresh)
+    except Exception as e:
+        logger.error(f"下载失败! url: {url}, info: {e}")
+
+
 async def process_worker_async():
     def handle_signal(signum, frame):
         logger.debug("收到退出信号")
@@ -22,28 +79,57 @@ async def process_worker_async():
     signal.signal(signal.SIGINT, handle_signal)
 
     parser = argparse.ArgumentParser()
-    parser.add_argument("url", nargs="+", default="", help="url，可接受多个url")
-    parser.add_argument("-s", "--site", default="", help=f"站点名，支持{FetcherRegistry.list_sites()}")
+    parser.add_argument("url", nargs="*", default=[], help="url，可接受多个url")
+    parser.add_argument("-s", "--site", default="",
+                        help=f"站点名，支持{FetcherRegistry.list_sites()}，未指定时根据url自动识别")
+    parser.add_argument("-i", "--input-file", default="",
+                        help="批量下载，从文件读取url，每行一个，'-'表示从标准输入读取")
+    parser.add_argument("-j", "--jobs", type=int, default=DEFAULT_INFO_CONCURRENCY,
+                        help=f"同时获取资源信息的最大url数量，默认{DEFAULT_INFO_CONCURRENCY}")
     parser.add_argument("-c", "--chapter", default="", help="章节号，指定漫画下载章节号，多个章节请使用逗号分隔, 未指定章节则下载全部章节")
     parser.add_argument("--no-download", default=False, action="store_true", help="不下载资源，仅显示资源信息")
+    parser.add_argument("--force", default=False, action="store_true", help="忽略媒体库记录，重新下载已下载过的资源")
+    parser.add_argument("--refresh", default=False, action="store_true", help="忽略资源信息缓存，重新获取资源信息")
+    parser.add_argument("--rebuild-library", default=False, action="store_true", help="扫描下载目录，重建媒体库索引")
 
     args = parser.parse_args()
-    urls = args.url
-    site = args.site
-    no_download = args.no_download
+    if args.rebuild_library:
+        library_index.rebuild(DATA_DIR)
+        if not args.url and not args.input_file:
+            return
+    if not args.url and not args.input_file:
+        parser.error("请提供url或使用 -i 指定输入文件")
 
-    for url in urls:
-        fetcher = FetcherRegistry.get_fetcher(site)
-        logger.debug(f"获取到Fetcher[{fetcher}]")
-        if site in ("bika", "jmcomic"):
-            chapter = [int(c) for c in (args.chapter.split(",") if args.chapter else [])]
-            await fetcher.download(url, chapter_id_list=chapter, no_download=no_download)
-        else:
-            await fetcher.download(url, no_download=no_download)
+    chapter = [int(c) for c in (args.chapter.split(",") if args.chapter else [])]
+
+    # 按输入顺序逐个提交url，同时处理中的url数量不超过 jobs
+    semaphore = asyncio.Semaphore(max(args.jobs, 1))
+    pending: set[asyncio.Task] = set()
+
+    def on_done(t: asyncio.Task):
+        pending.discard(t)
+        semaphore.release()
+
+    async for url in iter_urls(args.url, args.input_file):
+        await semaphore.acquire()
+        task = asyncio.create_task(download_url(url, args.site, chapter, args.no_download, args.force,
+                                                  args.refresh))
+        pending.add(task)
+        task.add_done_callback(on_done)
+
+    if pending:
+        await asyncio.gather(*pending)
 
     await download_manager.wait_all()
+    session_stats = session_manager.stats()
+    logger.debug(f"会话数: {session_stats['sessions']}, 已创建: {session_stats['created']}, "
+                 f"已关闭空闲会话: {session_stats['evicted']}")
     await session_manager.close_all()
 
+    for stats in get_thread_pool_stats():
+        logger.debug(f"线程池[{stats['name']}] 线程数: {stats['max_workers']}, 已执行任务: {stats['completed']}, "
+                     f"最大排队任务数: {stats['max_queued']}")
+
 
 def main():
     try:
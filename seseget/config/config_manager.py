@@ -1,8 +1,12 @@
 # config_manager.py
+import copy
 import os
 from collections import UserDict
 from typing import Any, Dict, Optional, Union, Self
 from ruamel.yaml import YAML
+from ruamel.yaml.comments import CommentedMap, CommentedSeq
+from ruamel.yaml.error import CommentMark
+from ruamel.yaml.tokens import CommentToken
 import shutil
 
 from ..utils.trace import logger
@@ -115,11 +119,129 @@ class ConfigManager:
             with open(self._config_path, "r", encoding='utf-8') as f:
                 raw_config = self._yaml.load(f)
             self._config = self._wrap_dict(raw_config)
+
+            # 旧版本的配置文件缺少新增的配置项，使用默认配置补全
+            if os.path.exists(self._default_config_path):
+                with open(self._default_config_path, "r", encoding='utf-8') as f:
+                    default_config = self._yaml.load(f)
+                if self._merge_default(raw_config, default_config):
+                    self._config = self._wrap_dict(raw_config)
+                    self._save()
             logger.debug("Config loaded.")
         except Exception as e:
             logger.error(f"Config init failed: {str(e)}")
             raise
 
+    @classmethod
+    def _merge_default(cls, data: Dict, default: Dict, parent: Optional[tuple] = None) -> bool:
+        """
+        递归地将default中data缺少的键添加到data中，不修改已有的值，返回是否有新增
+
+        新增的键插入到默认配置中的相同位置，并带上默认配置中的注释，保存后配置文件的结构和注释与默认配置一致
+        Args:
+            parent: (data的父映射, default的父映射, 键)，顶层映射为None
+        """
+        changed = False
+        for index, (key, value) in enumerate(default.items()):
+            if key not in data:
+                cls._insert_default(data, default, key, index, parent)
+                changed = True
+            elif isinstance(data[key], dict) and isinstance(value, dict):
+                changed = cls._merge_default(data[key], value, (data, default, key)) or changed
+        return changed
+
+    @classmethod
+    def _insert_default(cls, data: Dict, default: Dict, key: str, index: int, parent: Optional[tuple]) -> None:
+        """将default中的第index个键key插入到data中默认配置的前一个键之后"""
+        value = copy.deepcopy(default[key])
+        if not isinstance(data, CommentedMap) or not isinstance(default, CommentedMap):
+            data[key] = value
+            return
+
+        prev_key = next((k for k in reversed(list(default)[:index]) if k in data), None)
+        position = list(data).index(prev_key) + 1 if prev_key is not None else 0
+        data.insert(position, key, value)
+        if key in default.ca.items:
+            data.ca.items[key] = copy.deepcopy(default.ca.items[key])
+
+        if prev_key is not None:
+            # ruamel将两个键之间的注释行和前一个键的行尾注释保存在前一个键上：
+            # 前一个键保留自己的行尾注释，注释行改为默认配置中的(即新增键的说明)，
+            # 原有注释行中与默认配置相同的开头部分属于前一个键(如注释掉的列表项)，其余的移到新增的键之后
+            prev_comment = cls._get_tail_comment(data, prev_key)
+            data_eol, data_lines = cls._split_comment(prev_comment)
+            _, default_lines = cls._split_comment(cls._get_tail_comment(default, prev_key))
+            cls._set_tail_comment(data, prev_key, cls._make_comment(data_eol, default_lines, prev_comment))
+            moved_lines = data_lines[len(cls._common_lines(data_lines, default_lines)):]
+        else:
+            # 映射第一个键之前的注释保存在父映射上，改为默认配置中的，原有的注释移到新增的键之后
+            if parent is None:
+                data_holder, default_holder, slot = data.ca.comment, default.ca.comment, 1
+            else:
+                data_parent, default_parent, parent_key = parent
+                data_holder = data_parent.ca.items.setdefault(parent_key, [None, None, None, None])
+                default_holder = default_parent.ca.items.get(parent_key)
+                slot = 3
+            data_leading = data_holder[slot] if data_holder else None
+            if data_holder is not None:
+                data_holder[slot] = copy.deepcopy(default_holder[slot]) if default_holder else None
+            moved_lines = "".join(" " * c.column + c.value for c in data_leading or [])
+
+        key_comment = cls._get_tail_comment(data, key)
+        key_eol, _ = cls._split_comment(key_comment)
+        cls._set_tail_comment(data, key, cls._make_comment(key_eol, moved_lines, key_comment))
+
+    @staticmethod
+    def _split_comment(comment: Optional[CommentToken]) -> tuple:
+        """将键之后的注释分为行尾注释和之后的注释行"""
+        if comment is None:
+            return "", ""
+        eol, _, lines = comment.value.partition("\n")
+        return eol, lines
+
+    @staticmethod
+    def _make_comment(eol: str, lines: str, template: Optional[CommentToken]) -> Optional[CommentToken]:
+        """由行尾注释和注释行组成键之后的注释，行尾注释的位置沿用template"""
+        if not eol and not lines:
+            return None
+        if eol and template is not None:
+            comment = copy.deepcopy(template)
+            comment.value = f"{eol}\n{lines}"
+            return comment
+        return CommentToken(f"{eol}\n{lines}", CommentMark(0), None)
+
+    @staticmethod
+    def _common_lines(a: str, b: str) -> str:
+        """a和b开头相同的注释行，遇到空行为止(空行之后的注释属于下一个键)"""
+        common = []
+        for line_a, line_b in zip(a.splitlines(keepends=True), b.splitlines(keepends=True)):
+            if line_a != line_b or not line_a.strip():
+                break
+            common.append(line_a)
+        return "".join(common)
+
+    @staticmethod
+    def _tail_comment_slot(node, key) -> tuple:
+        """键之后的注释的保存位置，值为非空的映射或列表时，注释保存在其最后一项上"""
+        value = node[key]
+        while isinstance(value, (CommentedMap, CommentedSeq)) and len(value) > 0:
+            node, key = value, (list(value)[-1] if isinstance(value, CommentedMap) else len(value) - 1)
+            value = node[key]
+        return node, key, 2 if isinstance(node, CommentedMap) else 0
+
+    @classmethod
+    def _get_tail_comment(cls, node, key) -> Optional[CommentToken]:
+        node, key, slot = cls._tail_comment_slot(node, key)
+        items = node.ca.items.get(key)
+        return items[slot] if items else None
+
+    @classmethod
+    def _set_tail_comment(cls, node, key, comment: Optional[CommentToken]) -> None:
+        node, key, slot = cls._tail_comment_slot(node, key)
+        if comment is None and key not in node.ca.items:
+            return
+        node.ca.items.setdefault(key, [None, None, None, None])[slot] = comment
+
     def _wrap_dict(self, data: Dict) -> ObservableDict:
         def save_callback():
             self._save()
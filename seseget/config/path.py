@@ -8,6 +8,15 @@ CONFIG_DIR = BASE_DIR / "conf"
 CONFIG_PATH = str(CONFIG_DIR) + "/conf.yaml"
 DEFAULT_CONFIG_PATH = BASE_DIR / "seseget/config/default_conf.yaml"
 
+# 媒体库索引数据库路径
+LIBRARY_DB_PATH = str(CONFIG_DIR / "library.db")
+
+# 资源信息缓存数据库路径
+INFO_CACHE_DB_PATH = str(CONFIG_DIR / "info_cache.db")
+
+# JM域名评分数据路径
+JM_DOMAIN_HEALTH_PATH = str(CONFIG_DIR / "jm_domain_health.json")
+
 # 下载资源路径
 DATA_DIR = str(BASE_DIR / "data")
 
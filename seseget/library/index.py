@@ -0,0 +1,190 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+from ..config.path import LIBRARY_DB_PATH
+from ..utils.trace import logger
+
+
+class LibraryIndex:
+    """本地媒体库索引
+
+    以 (站点名, 资源id) 为键记录已下载到本地的资源，资源id为视频的vid，漫画的cid，或漫画章节的 "cid/章节号"，
+    下载前查询索引即可跳过已下载的资源，无需请求网络。
+
+    每条记录同时写入资源目录下的清单文件(MANIFEST_NAME)，索引数据库丢失或损坏时可通过 rebuild 扫描下载目录重建。
+
+    另外记录每个目录名的下一个可用序号，用于 allocate_dir 分配不重复的目录名，避免逐个序号探测目录是否存在。
+    """
+
+    MANIFEST_NAME = ".seseget.json"
+
+    def __init__(self, db_path: str):
+        self._db_path = db_path
+        self._conn: sqlite3.Connection | None = None
+        self._lock = threading.Lock()
+
+    def _get_conn(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = sqlite3.connect(self._db_path, check_same_thread=False)
+            self._conn.executescript("""
+                CREATE TABLE IF NOT EXISTS items (
+                    site TEXT NOT NULL,
+                    resource_id TEXT NOT NULL,
+                    path TEXT NOT NULL,
+                    title TEXT NOT NULL DEFAULT '',
+                    url TEXT NOT NULL DEFAULT '',
+                    updated_at REAL NOT NULL,
+                    PRIMARY KEY (site, resource_id)
+                );
+                CREATE TABLE IF NOT EXISTS dir_alloc (
+                    base TEXT PRIMARY KEY,
+                    next_index INTEGER NOT NULL
+                );
+            """)
+        return self._conn
+
+    def get(self, site: str, resource_id: str) -> Optional[dict]:
+        """查询资源记录，记录的目录已被删除时视为不存在并清除记录"""
+        if not site or not resource_id:
+            return None
+
+        with self._lock:
+            conn = self._get_conn()
+            row = conn.execute("SELECT path, title, url, updated_at FROM items WHERE site=? AND resource_id=?",
+                               (site, str(resource_id))).fetchone()
+            if row is None:
+                return None
+
+            if not os.path.isdir(row[0]):
+                conn.execute("DELETE FROM items WHERE site=? AND resource_id=?", (site, str(resource_id)))
+                conn.commit()
+                return None
+
+        return {"path": row[0], "title": row[1], "url": row[2], "updated_at": row[3]}
+
+    def contains(self, site: str, resource_id: str) -> bool:
+        """资源是否已下载"""
+        return self.get(site, resource_id) is not None
+
+    def add(self, site: str, resource_id: str, path: str, title: str = "", url: str = ""):
+        """添加资源记录，并同步写入资源目录下的清单文件"""
+        if not site or not resource_id:
+            return
+
+        resource_id = str(resource_id)
+        path = os.path.abspath(path)
+        with self._lock:
+            conn = self._get_conn()
+            conn.execute("INSERT OR REPLACE INTO items (site, resource_id, path, title, url, updated_at) "
+                         "VALUES (?, ?, ?, ?, ?, ?)",
+                         (site, resource_id, path, title, url, time.time()))
+            conn.commit()
+
+            try:
+                self._update_manifest(path, site, resource_id, title, url)
+            except OSError as e:
+                logger.warning(f"写入媒体库清单文件失败! info: {e}")
+
+    def remove(self, site: str, resource_id: str):
+        """删除资源记录"""
+        with self._lock:
+            conn = self._get_conn()
+            conn.execute("DELETE FROM items WHERE site=? AND resource_id=?", (site, str(resource_id)))
+            conn.commit()
+
+    def allocate_dir(self, path: str) -> str:
+        """
+        分配不重复的目录名，目录已存在时依次使用 path_[1], path_[2]... 命名
+
+        目录名的下一个可用序号记录在索引中，通常只需探测一次目录是否存在
+        """
+        base = os.path.abspath(path)
+        with self._lock:
+            conn = self._get_conn()
+            row = conn.execute("SELECT next_index FROM dir_alloc WHERE base=?", (base,)).fetchone()
+
+            if not os.path.exists(path):
+                if row is None:
+                    conn.execute("INSERT INTO dir_alloc (base, next_index) VALUES (?, 1)", (base,))
+                    conn.commit()
+                return path
+
+            index = row[0] if row else 1
+            new_path = f"{path}_[{index}]"
+            # 目录可能由外部创建，序号被占用时继续向后查找
+            while os.path.exists(new_path):
+                index = index + 1
+                new_path = f"{path}_[{index}]"
+
+            conn.execute("INSERT OR REPLACE INTO dir_alloc (base, next_index) VALUES (?, ?)", (base, index + 1))
+            conn.commit()
+
+        return new_path
+
+    def rebuild(self, data_dir: str) -> int:
+        """
+        扫描下载目录中的清单文件，重建索引
+        Args:
+            data_dir: 下载目录
+        Returns: 重建后的记录数
+        """
+        count = 0
+        with self._lock:
+            conn = self._get_conn()
+            conn.execute("DELETE FROM items")
+            conn.execute("DELETE FROM dir_alloc")
+
+            for dir_path, _, file_names in os.walk(data_dir):
+                if self.MANIFEST_NAME not in file_names:
+                    continue
+
+                try:
+                    with open(os.path.join(dir_path, self.MANIFEST_NAME), "r", encoding="utf-8") as f:
+                        manifest = json.load(f)
+                except (OSError, json.JSONDecodeError) as e:
+                    logger.warning(f"读取媒体库清单文件失败，跳过: {dir_path}, info: {e}")
+                    continue
+
+                site = manifest.get("site", "")
+                for resource_id, item in manifest.get("items", {}).items():
+                    conn.execute("INSERT OR REPLACE INTO items (site, resource_id, path, title, url, updated_at) "
+                                 "VALUES (?, ?, ?, ?, ?, ?)",
+                                 (site, resource_id, os.path.abspath(dir_path), item.get("title", ""),
+                                  item.get("url", ""), item.get("updated_at", time.time())))
+                    count = count + 1
+
+            conn.commit()
+
+        logger.info(f"媒体库索引重建完成，共{count}条记录")
+        return count
+
+    def _update_manifest(self, path: str, site: str, resource_id: str, title: str, url: str):
+        manifest_path = os.path.join(path, self.MANIFEST_NAME)
+        manifest = {"site": site, "items": {}}
+        if os.path.exists(manifest_path):
+            try:
+                with open(manifest_path, "r", encoding="utf-8") as f:
+                    manifest = json.load(f)
+            except json.JSONDecodeError:
+                logger.warning(f"媒体库清单文件损坏，重新生成: {manifest_path}")
+
+        manifest.setdefault("items", {})[resource_id] = {"title": title, "url": url, "updated_at": time.time()}
+
+        temp_path = f"{manifest_path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        os.replace(temp_path, manifest_path)
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+# 全局媒体库索引实例
+library_index = LibraryIndex(LIBRARY_DB_PATH)
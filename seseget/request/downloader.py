@@ -2,36 +2,149 @@ import asyncio
 import os
 import re
 import shutil
+import time
+from collections import deque
+from typing import Callable, Mapping
 
 from .downloadtask import TaskDLProgress, FileDLProgress, download_manager
 from .requests import session_manager
+from ..config.config_manager import config
 from ..utils.file_utils import get_file_basename
 from ..utils.subprocess_utils import exec_cmd
+from ..utils.thread_utils import run_in_thread_pool, SUBPROCESS
 from ..utils.trace import logger
 
 
-async def _download_file(file_name, url, auto_retry=True, progress: TaskDLProgress = None, **kwargs):
+class StreamStalledError(TimeoutError):
+    """流式下载的连接停滞(空闲超时或速度过低)"""
+
+
+async def _iter_stream(response):
+    """
+    读取流式响应数据，检测停滞的连接
+
+    - 空闲超时：单次读取等待超过 download.timeout.idle 秒
+    - 低速：最近 download.timeout.low_speed_window 秒内的平均速度低于 download.timeout.low_speed
+
+    连接停滞时抛出 StreamStalledError，速度慢但持续传输的连接不受影响
+    """
+    timeout_config = config["download"]["timeout"]
+    idle_timeout = float(timeout_config["idle"])
+    min_speed = float(timeout_config["low_speed"]) * 1024
+    window = float(timeout_config["low_speed_window"])
+
+    content = response.aiter_content()
+    start = time.monotonic()
+    samples = deque()   # (读取时间, 数据大小)
+    window_size = 0
+    while True:
+        try:
+            data = await asyncio.wait_for(content.__anext__(), idle_timeout)
+        except StopAsyncIteration:
+            return
+        except asyncio.TimeoutError:
+            raise StreamStalledError(f"{idle_timeout}s内没有收到数据")
+
+        now = time.monotonic()
+        samples.append((now, len(data)))
+        window_size = window_size + len(data)
+        while samples[0][0] < now - window:
+            window_size = window_size - samples.popleft()[1]
+        if min_speed > 0 and now - start >= window and window_size < min_speed * window:
+            raise StreamStalledError(f"最近{window}s平均速度{window_size / window / 1024:.2f}KB/s，低于最低速度")
+
+        yield data
+
+
+# 多个镜像地址竞速时，最先读取完该大小数据的地址胜出
+MIRROR_PROBE_SIZE = 256 * 1024
+
+
+async def _probe_mirror(url, **kwargs):
+    """
+    请求镜像地址并读取 MIRROR_PROBE_SIZE 大小的数据，用于竞速，耗时包含首字节延迟和读取数据的耗时
+    Returns: (url, 响应, 响应数据迭代器, 已读取的数据块列表)
+    """
+    response = await session_manager.request("GET", url=url, stream=True, **kwargs)
+    content = _iter_stream(response)
+    chunks = []
+    try:
+        if response.status_code in (200, 206):
+            size = 0
+            while size < MIRROR_PROBE_SIZE:
+                try:
+                    data = await content.__anext__()
+                except StopAsyncIteration:
+                    break
+                chunks.append(data)
+                size = size + len(data)
+        elif response.status_code != 416:
+            response.raise_for_status()
+    except BaseException:
+        response.close()
+        raise
+    return url, response, content, chunks
+
+
+async def _race_mirrors(urls: list[str], **kwargs):
+    """
+    同时请求多个镜像地址，选出最快的地址，其余请求关闭
+    Returns: 最快地址的 _probe_mirror 结果
+    """
+    pending = {asyncio.create_task(_probe_mirror(url, **kwargs)) for url in urls}
+    winner = None
+    errors = []
+    try:
+        while pending and winner is None:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is not None:
+                    errors.append(task.exception())
+                elif winner is None:
+                    winner = task.result()
+                else:
+                    task.result()[1].close()
+    finally:
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+
+    if winner is None:
+        raise errors[0]
+    logger.debug(f"镜像地址竞速完成，使用: {winner[0]}")
+    return winner
+
+
+async def _download_file(file_name, url: str | list[str], auto_retry=True, progress: TaskDLProgress = None,
+                         race_mirrors=True, **kwargs):
     """
     下载单个文件
 
     整体流程：
       1. 检查本地文件状态（存在？大小？） → 决定是否断点续传
-      2. 发起 GET 请求（stream=True）
+      2. 发起 GET 请求（stream=True），有多个镜像地址时同时请求并选出最快的地址
       3. 根据响应状态码判断：全新下载 / 续传 / 已完成 / 文件损坏
       4. 流式读取响应体，逐 chunk 写入文件 + 更新进度
-      5. 异常时重试（最多 3 次）
+      5. 异常时重试（最多 3 次），有多个镜像地址时立即换用其它地址从断点继续下载
 
     Args:
         file_name: 文件保存完整路径
-        url: 下载地址
+        url: 下载地址，或内容相同的多个镜像地址列表
         auto_retry: 下载异常时是否自动重试（最多 3 次）
         progress: 控制下载进度的 TaskDLProgress 对象
+        race_mirrors: 有多个镜像地址时，True: 同时请求所有地址竞速，False: 依次使用，失败时换用下一个地址，
+                      适用于小文件，避免竞速的请求数据量超过文件本身
         **kwargs: 附加参数，传递给异步 HTTP 请求（headers, proxy 等）
     """
     retry_max = 3
     retry_times = 0
+    urls = [url] if isinstance(url, str) else list(url)
+    stalled_offset = -1     # 上次连接停滞时，该次请求写入文件的起始位置
 
     while True:
+        cur_url = None
+        read_size = 0
+        start_offset = 0    # 本次请求写入文件的起始位置，服务器不支持 Range 返回200时为0
         try:
             f_size = 0
             if os.path.exists(file_name):
@@ -46,13 +159,19 @@ async def _download_file(file_name, url, auto_retry=True, progress: TaskDLProgre
                 # 本地文件不存在但传入了 Range → 清理掉（从头下载）
                 kwargs["headers"].pop("Range")
 
-            logger.debug(f"request [{url}]")
-            response = await session_manager.request("GET", url=url, stream=True, **kwargs)
+            if len(urls) > 1 and race_mirrors:
+                logger.debug(f"request mirrors {urls}")
+                cur_url, response, content, prefetched = await _race_mirrors(urls, **kwargs)
+            else:
+                cur_url = urls[0]
+                logger.debug(f"request [{cur_url}]")
+                response = await session_manager.request("GET", url=cur_url, stream=True, **kwargs)
+                content = _iter_stream(response)
+                prefetched = []
             if response:
                 logger.debug(f"[response open]")
 
             total_size = 0
-            read_size = 0
             file_mode = ''
 
             try:
@@ -65,6 +184,7 @@ async def _download_file(file_name, url, auto_retry=True, progress: TaskDLProgre
                 elif response.status_code == 206:
                     # 206 Partial Content：服务器接受了 Range 请求，从断点续传
                     file_mode = 'ab'    # 追加模式，不覆盖已有数据
+                    start_offset = f_size
                     logger.debug(f"respone[206], Content-Length: {response.headers['Content-Length']}")
                     total_size = f_size + int(response.headers['Content-Length'])
 
@@ -99,7 +219,13 @@ async def _download_file(file_name, url, auto_retry=True, progress: TaskDLProgre
                     progress.add_progress(file_name, total=total_size)
 
                 with open(file_name, file_mode) as f:
-                    async for data in response.aiter_content():
+                    for data in prefetched:
+                        size = f.write(data)
+                        read_size = read_size + size
+                        if progress is not None:
+                            progress.update(file_name, size)
+
+                    async for data in content:
                         size = f.write(data)
                         read_size = read_size + size
                         if progress is not None:
@@ -117,10 +243,21 @@ async def _download_file(file_name, url, auto_retry=True, progress: TaskDLProgre
                 logger.debug(f"[response close]")
 
         except Exception as result:
+            if cur_url is not None and len(urls) > 1:
+                # 当前镜像地址失败，换用其它镜像地址，从已下载的位置继续下载
+                logger.debug(f"镜像地址下载失败，换用其它地址, url: {cur_url}, info: {result}")
+                urls.remove(cur_url)
+                continue
+            if isinstance(result, StreamStalledError) and read_size > 0 and start_offset > stalled_offset:
+                # 连接停滞但断点位置比上次停滞时前进了，立即重新连接从断点继续下载，不计入重试次数，
+                # 服务器不支持 Range 时每次都从头下载，断点位置不会前进，按普通错误重试
+                logger.debug(f"连接停滞，重新连接, info: {result}")
+                stalled_offset = start_offset
+                continue
             if auto_retry:
                 if retry_times < retry_max:
                     logger.debug('Error! info: %s' % result)
-                    logger.debug("GET %s Failed, Retry(%d)..." % (url, retry_times))
+                    logger.debug("GET %s Failed, Retry(%d)..." % (urls[0], retry_times))
                     retry_times = retry_times + 1
                     await asyncio.sleep(5)
                     continue
@@ -137,8 +274,112 @@ async def _download_file(file_name, url, auto_retry=True, progress: TaskDLProgre
     return 0
 
 
+class HedgePolicy:
+    """对冲请求策略
+
+    记录近期请求的耗时，请求耗时超过其指定百分位时允许再发起一个相同的请求(对冲请求)，使用先完成的结果，
+    避免个别卡住的连接拖慢整体。对冲请求数占请求数的比例不超过 max_rate，服务器整体变慢时不会成倍增加负载。
+
+    percentile / max_rate / min_delay 每次使用时从 get_config 返回的配置中读取，运行中修改配置可以立即生效。
+    """
+
+    WINDOW = 200        # 统计耗时和对冲比例的最近请求数
+    MIN_SAMPLES = 20    # 耗时样本数不足时不发起对冲请求
+
+    def __init__(self, get_config: Callable[[], Mapping]):
+        self.get_config = get_config
+        self._costs = deque(maxlen=self.WINDOW)     # 最近请求的耗时(s)
+        self._hedged = deque(maxlen=self.WINDOW)    # 最近请求是否发起了对冲请求
+        self._inflight = 0  # 正在进行的对冲请求数
+
+    def delay(self) -> float | None:
+        """对冲延迟(s)，请求耗时超过该值后发起对冲请求，样本不足时返回None"""
+        if len(self._costs) < self.MIN_SAMPLES:
+            return None
+        costs = sorted(self._costs)
+        hedge_config = self.get_config()
+        index = min(int(len(costs) * float(hedge_config["percentile"]) / 100), len(costs) - 1)
+        return max(costs[index], float(hedge_config["min_delay"]))
+
+    def try_hedge(self) -> bool:
+        """申请发起一个对冲请求，超过对冲比例上限时返回False"""
+        budget = float(self.get_config()["max_rate"]) * max(len(self._hedged), self.MIN_SAMPLES)
+        if sum(self._hedged) + self._inflight + 1 > budget:
+            return False
+        self._inflight = self._inflight + 1
+        return True
+
+    def record(self, cost: float | None, hedged: bool):
+        """
+        记录一次请求结果
+        Args:
+            cost: 请求耗时(s)，请求失败时为None
+            hedged: 是否发起了对冲请求
+        """
+        if cost is not None:
+            self._costs.append(cost)
+        if hedged:
+            self._inflight = self._inflight - 1
+        self._hedged.append(hedged)
+
+
+comic_image_hedge = HedgePolicy(lambda: config["download"]["comic"]["hedge"])
+
+
+async def _download_file_hedged(file_name, url: str | list[str], hedge: HedgePolicy, progress: TaskDLProgress = None):
+    """
+    下载小文件，耗时超过对冲延迟时再发起一个请求下载到临时文件，使用先完成的结果，另一个请求取消
+    Args:
+        file_name: 文件保存完整路径
+        url: 下载地址，或内容相同的多个镜像地址列表，对冲请求优先使用镜像地址
+        hedge: 对冲请求策略
+        progress: 控制下载进度的 TaskDLProgress 对象
+    """
+    urls = [url] if isinstance(url, str) else list(url)
+    hedge_file = file_name + ".hedge"
+    start = time.monotonic()
+    primary = asyncio.create_task(_download_file(file_name, urls, True, progress, race_mirrors=False))
+    tasks = [primary]
+    hedged = False
+    winner = None
+    try:
+        delay = hedge.delay()
+        if delay is not None:
+            await asyncio.wait(tasks, timeout=delay)
+            if not primary.done() and hedge.try_hedge():
+                hedged = True
+                logger.debug(f"下载耗时超过{delay:.2f}s，发起对冲请求: {file_name}")
+                # 对冲请求不更新进度，避免重复计算下载量
+                tasks.append(asyncio.create_task(
+                    _download_file(hedge_file, urls[1:] + urls[:1], True, None, race_mirrors=False)))
+
+        pending = set(tasks)
+        while pending and winner is None:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            winner = next((task for task in done if task.exception() is None), None)
+        if winner is None:
+            # 全部请求失败，抛出原请求的异常
+            raise primary.exception()
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        hedge.record(time.monotonic() - start if winner is not None else None, hedged)
+        if winner is not tasks[-1] and os.path.exists(hedge_file):
+            os.remove(hedge_file)
+
+    if winner is not primary:
+        logger.debug(f"对冲请求先完成: {file_name}")
+        os.replace(hedge_file, file_name)
+        if progress is not None:
+            f_size = os.path.getsize(file_name)
+            progress.add_progress(file_name, total=f_size)
+            progress.set_downloaded(file_name, f_size)
+    return 0
+
+
 async def _download_files(file_name_list: list[str],
-                           url_list: list[str],
+                           url_list: list[str | list[str]],
                            *,
                            max_workers=10,
                            progress: TaskDLProgress = None,
@@ -147,7 +388,7 @@ async def _download_files(file_name_list: list[str],
     下载多个文件
     Args:
         file_name_list: 文件保存路径列表
-        url_list: 下载地址列表
+        url_list: 下载地址列表，每项可以为内容相同的多个镜像地址列表
         max_workers: 最大同时下载数
         progress: TaskDLProgress对象，管理下载进度
         **kwargs:
@@ -188,7 +429,7 @@ async def download_file(file_name, url):
 
 
 async def download_file_ex(file_name: str,
-                            url: str,
+                            url: str | list[str],
                             *,
                             progress: TaskDLProgress = None,
                             **kwargs):
@@ -237,7 +478,7 @@ async def download_mp4(filename, url, progress: TaskDLProgress = None):
 
 async def download_mp4_by_merge_video_audio(filename, video_url, audio_url, headers,
                                              progress: TaskDLProgress = None):
-    """下载视频和音频文件并合并成mp4文件"""
+    """下载视频和音频文件并合并成mp4文件，video_url/audio_url 可以为内容相同的多个镜像地址列表"""
     dir = os.path.dirname(filename)
     cache_dir = os.path.join(dir, "cache")
     audio_path = os.path.join(cache_dir, "cache.mp3")
@@ -263,7 +504,8 @@ async def download_mp4_by_merge_video_audio(filename, video_url, audio_url, head
     progress.set_status(FileDLProgress.Status.PROCESS)
 
     # ffmpeg 是 CPU 密集型子进程，放入线程池执行
-    await asyncio.to_thread(
+    await run_in_thread_pool(
+        SUBPROCESS,
         exec_cmd,
         ["ffmpeg", "-hide_banner", "-i", f"{video_path}", "-i", f"{audio_path}", "-c:v", "copy", "-c:a", "aac",
          "-strict", "experimental", f"{filename}"]
@@ -307,7 +549,7 @@ async def download_mp4_by_m3u8(filename, url, progress: TaskDLProgress = None):
         progress.set_progress_count(len(ts_list))
         progress.set_status(FileDLProgress.Status.DOWNLOADING)
 
-    semaphore = asyncio.Semaphore(10)
+    semaphore = asyncio.Semaphore(max(int(config["download"]["connections"]), 1))
 
     async def _download_ts(ts_url, idx):
         f_ts_name = '%08d.ts' % idx
@@ -343,7 +585,8 @@ async def download_mp4_by_m3u8(filename, url, progress: TaskDLProgress = None):
         progress.set_status(FileDLProgress.Status.PROCESS)
 
     # ffmpeg拼接ts文件，保存为mp4
-    await asyncio.to_thread(
+    await run_in_thread_pool(
+        SUBPROCESS,
         exec_cmd,
         ["ffmpeg", "-f", "concat", "-safe", "0", "-i", "ts_temp/ts_files_list.txt", "-c", "copy", filename]
     )
@@ -371,13 +614,16 @@ async def download_comic_capter_images(save_dir: str, image_urls, progress: Task
 
     logger.debug(f"image_urls: {image_urls}")
 
-    semaphore = asyncio.Semaphore(10)
+    semaphore = asyncio.Semaphore(max(int(config["download"]["connections"]), 1))
 
     async def _download_image(index, url):
         image_name = "%05d.jpg" % index
         image_path = save_dir + "/" + image_name
         async with semaphore:
-            await _download_file(image_path, url, True, progress)
+            if config["download"]["comic"]["hedge"]["enable"]:
+                await _download_file_hedged(image_path, url, comic_image_hedge, progress)
+            else:
+                await _download_file(image_path, url, True, progress)
 
     tasks = [_download_image(idx, url) for idx, url in enumerate(image_urls)]
 
@@ -398,3 +644,5 @@ async def download_comic_capter_images(save_dir: str, image_urls, progress: Task
     logger.info("下载完成！")
     if progress:
         progress.set_status(FileDLProgress.Status.PROCESS)
+
+    return 0
@@ -1,7 +1,7 @@
 import asyncio
 import uuid
 import functools
-from typing import Callable
+from typing import Callable, Hashable
 import inspect
 import traceback
 
@@ -183,9 +183,10 @@ class TaskDLProgress:
 class DownloadTask:
     """下载任务，记录任务id, name和进度"""
 
-    def __init__(self, task_id: str, name: str):
+    def __init__(self, task_id: str, name: str, key: Hashable = None):
         self.id: str = task_id
         self.name: str = name
+        self.key: Hashable = key    # 任务键，相同键的任务同时只会存在一个
         self.task_progress: TaskDLProgress = TaskDLProgress(name)
         self.asyncio_task: asyncio.Task | None = None
 
@@ -197,6 +198,7 @@ class DownloadManager:
         self.max_concurrent = max_concurrent
         self.tasks: list[DownloadTask] = []
         self.id_to_task: dict[str, DownloadTask] = {}
+        self.key_to_task: dict[Hashable, DownloadTask] = {}
         self._semaphore = asyncio.Semaphore(max_concurrent)
         self._id_counter = 0
 
@@ -214,13 +216,36 @@ class DownloadManager:
         else:
             return original_func
 
-    async def create_task(self, name, func, *args):
-        """创建异步下载任务"""
+    def find_active_task(self, key: Hashable) -> DownloadTask | None:
+        """查找指定键的未完成任务"""
+        if key is None:
+            return None
+        task = self.key_to_task.get(key)
+        if task and task.asyncio_task and not task.asyncio_task.done():
+            return task
+        return None
+
+    async def create_task(self, name, func, *args, key: Hashable = None):
+        """
+        创建异步下载任务
+        Args:
+            name: 任务名
+            func: 下载函数
+            *args: 下载函数参数
+            key: 任务键，已存在相同键的未完成任务时不再创建新任务，直接返回已存在的任务
+        """
+        active_task = self.find_active_task(key)
+        if active_task:
+            logger.info(f"已存在相同的下载任务[{active_task.name}]")
+            return active_task
+
         task_id = self._generate_task_id()
-        task = DownloadTask(task_id, name)
+        task = DownloadTask(task_id, name, key)
 
         self.tasks.append(task)
         self.id_to_task[task_id] = task
+        if key is not None:
+            self.key_to_task[key] = task
 
         wrapped_func = self._wrap_download_func(func, task.task_progress)
 
@@ -235,10 +260,16 @@ class DownloadManager:
 
         asyncio_task = asyncio.create_task(_run_with_semaphore())
         task.asyncio_task = asyncio_task
+        if key is not None:
+            asyncio_task.add_done_callback(lambda _: self._remove_task_key(task))
 
         logger.debug(f"创建下载任务[task_id: {task_id}, name: {name}]")
         return task
 
+    def _remove_task_key(self, task: DownloadTask):
+        if self.key_to_task.get(task.key) is task:
+            del self.key_to_task[task.key]
+
     def get_task_by_id(self, task_id):
         return self.id_to_task.get(task_id)
 
@@ -269,6 +300,7 @@ class DownloadManager:
                 task.asyncio_task.cancel()
         self.tasks.clear()
         self.id_to_task.clear()
+        self.key_to_task.clear()
 
 
 # 全局下载管理器实例
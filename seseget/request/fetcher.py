@@ -1,10 +1,11 @@
 import asyncio
+import copy
 import os
+import re
 import sys
 import shutil
 from abc import ABC, abstractmethod
-from collections import OrderedDict
-from typing import Dict, Type, Optional, TypeVar, Generic, Union
+from typing import Dict, Type, Optional, TypeVar, Generic, Union, List, Tuple, Hashable, AsyncIterator
 
 from . import downloader
 from ..config.config_manager import config
@@ -12,9 +13,14 @@ from ..metadata.comic import ComicMetaData
 from ..metadata.video import VideoMetaData
 from ..metadata.video.doc import make_video_metadata_file
 from ..metadata.comic.doc import make_comic
-from ..utils.file_utils import make_filename_valid, make_diff_dir_name
+from ..library.index import library_index
+from ..utils.async_utils import SingleFlight
+from ..utils.file_utils import make_filename_valid
+from ..utils.thread_utils import run_in_thread_pool, DISK
 from ..utils.trace import logger
 from .downloadtask import FileDLProgress, TaskDLProgress, download_manager
+from .info_cache import info_cache
+from .requests import session_manager
 
 
 class ChapterInfo:
@@ -62,6 +68,7 @@ class VideoInfo:
         self.metadata = VideoMetaData()     # 元数据
         self.series_info = []       # 系列视频信息
         self.video_dir = ""         # 本地保存目录
+        self.ie_result = None       # yt-dlp 获取到的视频信息(info_dict)，下载时直接使用，避免重复提取页面
 
     def print_info(self):
         logger.info(f"---------------------------------")
@@ -73,25 +80,6 @@ class VideoInfo:
         logger.info(f"---------------------------------")
 
 
-class VideoInfoCache:
-    def __init__(self, max_size=10):
-        self.cache = OrderedDict()
-        self.max_size = max_size
-        self._lock = asyncio.Lock()
-
-    def get_video_info(self, vid):
-        if vid in self.cache:
-            self.cache.move_to_end(vid)
-            return self.cache[vid]
-        return None
-
-    async def update_cache(self, vid, video_info):
-        async with self._lock:
-            self.cache[vid] = video_info
-            if len(self.cache) > self.max_size:
-                oldest_vid, _ = self.cache.popitem(last=False)
-
-
 def make_source_info_file(save_dir, resource_info):
     """创建保存下载资源的来源信息的文件"""
     if config["download"]["save_source_info"]:
@@ -141,11 +129,19 @@ class SSGBaseFetcher(AbstractFetcher, Generic[T_Info]):
     
     补充了一些通用方法
     """
+    site_name = ""  # 站点名，注册时由 FetcherRegistry 赋值
     site_dir = ""
+    info_cache_ttl: Optional[int] = None    # 资源信息缓存有效期(s)，为None时使用配置中的有效期
 
     def __init__(self, max_tasks=5):
         self.max_tasks = max_tasks
         self.task_semaphore = asyncio.Semaphore(max_tasks)
+        self._info_flight = SingleFlight()
+        self._download_flight = SingleFlight()
+
+    def _parse_resource_id(self, url) -> str:
+        """从url中解析资源id(视频vid/漫画cid)，不请求网络，无法解析时返回空字符串，子类根据站点url格式重写"""
+        return ""
 
     @abstractmethod
     def _make_save_dir(self, info: T_Info):
@@ -161,11 +157,63 @@ class SSGBaseFetcher(AbstractFetcher, Generic[T_Info]):
         pass
 
     @abstractmethod
-    async def download(self, url, **kwargs):
+    async def _download(self, url, **kwargs):
+        """下载资源，子类需要实现该功能"""
         pass
 
+    def _request_key(self, url, **kwargs) -> Hashable:
+        """由站点、资源id和请求参数组成的请求键，用于合并并发的相同请求"""
+        return self._info_cache_key(url), repr(sorted(kwargs.items()))
+
+    async def download(self, url, **kwargs):
+        """下载资源，并发提交的相同下载请求只会执行一次"""
+        return await self._download_flight.do(self._request_key(url, **kwargs), self._download, url, **kwargs)
+
+    def _info_cache_key(self, url) -> str:
+        return f"{self.site_name}:{self._parse_resource_id(url) or url}"
+
+    def _info_cache_params(self, **kwargs) -> dict:
+        """影响抓取结果的请求参数，与资源信息一起缓存，子类根据 _fetch_info 支持的参数重写"""
+        return {}
+
+    def _match_cached_info(self, entry: dict, **kwargs) -> Optional[T_Info]:
+        """从缓存条目中取出与本次请求参数匹配的资源信息，不匹配时返回None"""
+        if entry["params"] == self._info_cache_params(**kwargs):
+            return entry["info"]
+        return None
+
     async def info(self, url, **kwargs):
-        return await self._fetch_info(url, **kwargs)
+        """
+        获取资源信息，优先使用资源信息缓存，并发的相同请求只会抓取一次
+        Args:
+            url: 资源页面url
+            **kwargs: 传递给 _fetch_info 的参数，另外支持以下参数
+                refresh: True 不读取缓存，重新抓取资源信息并更新缓存
+                no_cache: True 不读取也不写入缓存
+        """
+        info = await self._info_flight.do(self._request_key(url, **kwargs), self._info, url, **kwargs)
+        # 并发的调用者共享同一个结果，各自返回副本，避免相互修改
+        return copy.deepcopy(info)
+
+    async def _info(self, url, **kwargs):
+        refresh = kwargs.pop("refresh", False)
+        use_cache = info_cache.enabled and not kwargs.pop("no_cache", False)
+        key = self._info_cache_key(url)
+
+        if use_cache and not refresh:
+            entry = info_cache.get(key, self.info_cache_ttl)
+            if entry is not None:
+                info = self._match_cached_info(entry, **kwargs)
+                if info is not None:
+                    logger.info(f"匹配到缓存中的资源信息({key})")
+                    return info
+
+        info = await self._fetch_info(url, **kwargs)
+
+        if use_cache and info is not None:
+            info_cache.put(key, {"info": info, "params": self._info_cache_params(**kwargs)})
+
+        return info
 
 
 # 视频站点的抓取器需要继承VideoFetcher
@@ -179,7 +227,7 @@ class VideoFetcher(SSGBaseFetcher[T_VideoInfo], Generic[T_VideoInfo]):
     - _download_process 基础的下载流程，通过 VideoInfo 对象中的 url 地址下载
     - _download_process_with_semaphore 控制并发数的下载流程
     - _start_download_task 创建下载任务
-    - download 基础的下载接口
+    - _download 基础的下载流程
 
     需要实现的功能：
     - _fetch_info 获取站点信息，解析出 T_VideoInfo 信息
@@ -193,7 +241,6 @@ class VideoFetcher(SSGBaseFetcher[T_VideoInfo], Generic[T_VideoInfo]):
 
     def __init__(self, max_tasks=5):
         super().__init__(max_tasks)
-        self.video_info_cache = VideoInfoCache(10)
 
     def _make_save_dir(self, info: T_Info):
         if not self.__class__.site_dir:
@@ -203,7 +250,7 @@ class VideoFetcher(SSGBaseFetcher[T_VideoInfo], Generic[T_VideoInfo]):
 
         series_dir = os.path.join(self.__class__.site_dir, make_filename_valid(info.metadata.series))
         info.video_dir = os.path.join(series_dir, make_filename_valid(info.name))
-        info.video_dir = make_diff_dir_name(info.video_dir)
+        info.video_dir = library_index.allocate_dir(info.video_dir)
 
         if not os.path.exists(series_dir):
             os.mkdir(series_dir)
@@ -235,42 +282,105 @@ class VideoFetcher(SSGBaseFetcher[T_VideoInfo], Generic[T_VideoInfo]):
         video_path = video_info.video_dir + '/' + make_filename_valid('%s.mp4' % video_info.name)
 
         if '.m3u8' in video_info.download_url.split('/')[-1]:
-            await downloader.download_mp4_by_m3u8(video_path, video_info.download_url, progress)
+            return await downloader.download_mp4_by_m3u8(video_path, video_info.download_url, progress)
         else:
-            await downloader.download_mp4(video_path, video_info.download_url, progress)
+            return await downloader.download_mp4(video_path, video_info.download_url, progress)
 
-    async def _download_process_with_semaphore(self, video_info: T_VideoInfo, progress: TaskDLProgress = None):
+    async def _download_and_record(self, video_info: T_VideoInfo, progress: TaskDLProgress = None):
+        """下载视频，下载成功后记录到媒体库"""
         try:
-            await self._download_process(video_info, progress)
+            result = await self._download_process(video_info, progress)
+            if result == 0:
+                library_index.add(self.site_name, video_info.vid, video_info.video_dir,
+                                  video_info.name, video_info.view_url)
+            else:
+                # 下载失败可能是缓存的下载地址已失效，删除缓存，下次重新获取
+                info_cache.invalidate(self._info_cache_key(video_info.view_url))
+            return result
         except Exception:
+            info_cache.invalidate(self._info_cache_key(video_info.view_url))
             raise
+
+    async def _download_process_with_semaphore(self, video_info: T_VideoInfo, progress: TaskDLProgress = None):
+        try:
+            return await self._download_and_record(video_info, progress)
         finally:
             self.task_semaphore.release()
 
+    def _download_task_key(self, video_info: T_VideoInfo) -> Hashable:
+        return self.site_name, video_info.vid
+
+    def _has_active_task(self, video_info: T_VideoInfo) -> bool:
+        """是否已存在相同视频的下载任务"""
+        task = download_manager.find_active_task(self._download_task_key(video_info))
+        if task:
+            logger.info(f"视频(vid-{video_info.vid})正在下载中[{task.name}]")
+            return True
+        return False
+
     async def _start_download_task(self, video_info: T_VideoInfo):
-        await download_manager.create_task(video_info.name, self._download_process_with_semaphore, video_info)
+        await download_manager.create_task(video_info.name, self._download_process_with_semaphore, video_info,
+                                           key=self._download_task_key(video_info))
+
+    async def _start_download_tasks(self, video_info_list: List[T_VideoInfo]):
+        """
+        为多个视频分别创建下载任务并行下载，同时创建各视频的目录和元数据文件
+
+        调用前需要获取一个任务并发数，所有视频共用，全部下载结束后释放
+        """
+        tasks = []
+        for video_info in video_info_list:
+            self._make_save_dir(video_info)
+            tasks.append(await download_manager.create_task(video_info.name, self._download_and_record, video_info,
+                                                            key=self._download_task_key(video_info)))
+            await self._make_metadata_file(video_info)
+            self._make_source_info_file(video_info)
+
+        asyncio.gather(*(t.asyncio_task for t in tasks), return_exceptions=True).add_done_callback(
+            lambda _: self.task_semaphore.release())
 
     @abstractmethod
     async def _fetch_info(self, url, **kwargs) -> T_VideoInfo:
         """抓取资源信息，子类需要实现该功能"""
         pass
 
-    async def download(self, url, **kwargs):
+    def _is_downloaded(self, vid) -> bool:
+        """视频是否已下载到媒体库"""
+        if library_index.contains(self.site_name, vid):
+            logger.info(f"视频(vid-{vid})已存在于媒体库中，跳过下载")
+            return True
+        return False
+
+    async def _download(self, url, **kwargs):
         default_params = {
             "no_download": False,
+            "force": False,     # True: 忽略媒体库记录，重新下载
+            "refresh": False,   # True: 忽略资源信息缓存，重新获取资源信息
         }
         params = {**default_params, **kwargs}
+
+        # 先通过url中的vid查询媒体库，已下载则无需请求网络
+        check_library = not params["no_download"] and not params["force"]
+        if check_library and self._is_downloaded(self._parse_resource_id(url)):
+            return
+
         await self.task_semaphore.acquire()
+        try:
+            video_info = await self.info(url, refresh=params["refresh"])
+            video_info.print_info()
 
-        video_info = await self._fetch_info(url)
-        video_info.print_info()
+            if params["no_download"] or (check_library and self._is_downloaded(video_info.vid)) or \
+                    self._has_active_task(video_info):
+                self.task_semaphore.release()
+                return
 
-        if params["no_download"]:
+            self._make_save_dir(video_info)
+            await self._start_download_task(video_info)
+        except Exception:
+            # 下载任务创建前出错，任务不会释放并发数
             self.task_semaphore.release()
-            return
+            raise
 
-        self._make_save_dir(video_info)
-        await self._start_download_task(video_info)
         await self._make_metadata_file(video_info)
         self._make_source_info_file(video_info)
 
@@ -284,11 +394,14 @@ class ComicFetcher(SSGBaseFetcher[T_ComicInfo], Generic[T_ComicInfo, T_ChapterIn
     - _download_process 基础的下载流程，通过 ChapterInfo 对象中的 chapter.image_urls 地址下载所有图片并合并为漫画文件
     - _download_process_with_semaphore 控制并发数的下载流程
     - _start_download_task 创建下载任务
-    - download 基础的下载接口
+    - _download 基础的下载流程
 
     需要实现的功能：
     - _fetch_info 获取站点信息，并解析出 T_ComicInfo 中信息
 
+    可选实现的功能：
+    - _fetch_info_iter 逐个产出章节信息，获取章节信息耗时较长的站点可重写，章节解析完成后即可开始下载
+
     Note:
 
     如果_download_process中的下载方式无法满足需求，可根据需求重写， 
@@ -298,9 +411,10 @@ class ComicFetcher(SSGBaseFetcher[T_ComicInfo], Generic[T_ComicInfo, T_ChapterIn
     其它使用 T_ComicInfo 或 T_ChapterInfo 作为参数的函数根据需要重写
     """
 
-    def __init__(self, max_tasks=1):
+    def __init__(self, max_tasks=1, max_chapter_tasks=1):
         super().__init__(max_tasks=max_tasks)
-        self.capter_lock = asyncio.Lock()
+        # 同时下载的章节数
+        self.chapter_semaphore = asyncio.Semaphore(max_chapter_tasks)
 
     def _make_save_dir(self, info: T_Info):
         if not self.__class__.site_dir:
@@ -308,10 +422,17 @@ class ComicFetcher(SSGBaseFetcher[T_ComicInfo], Generic[T_ComicInfo, T_ChapterIn
         if not os.path.exists(self.__class__.site_dir):
             os.mkdir(self.__class__.site_dir)
 
+        # 同一部漫画沿用媒体库中记录的目录，不重复创建
+        record = library_index.get(self.site_name, info.cid)
+        if record:
+            info.comic_dir = record["path"]
+            return
+
         info.comic_dir = os.path.join(self.__class__.site_dir, make_filename_valid(info.title))
-        info.comic_dir = make_diff_dir_name(info.comic_dir)
+        info.comic_dir = library_index.allocate_dir(info.comic_dir)
         if not os.path.exists(info.comic_dir):
             os.mkdir(info.comic_dir)
+        library_index.add(self.site_name, info.cid, info.comic_dir, info.title, info.view_url)
 
     async def _download_process(self, comic_title: str, chapter: T_ChapterInfo, progress: TaskDLProgress = None):
         """此处实现了基本的资源下载逻辑，子类可以根据需要选择继承或重写"""
@@ -326,7 +447,7 @@ class ComicFetcher(SSGBaseFetcher[T_ComicInfo], Generic[T_ComicInfo, T_ChapterIn
         res = await downloader.download_comic_capter_images(image_temp_dir_path, chapter.image_urls, progress)
 
         # 图片下载完成，打包成漫画文件
-        make_comic(comic_dir, comic_title, image_temp_dir_path, chapter.metadata)
+        await run_in_thread_pool(DISK, make_comic, comic_dir, comic_title, image_temp_dir_path, chapter.metadata)
 
         if progress:
             progress.set_status(FileDLProgress.Status.DOWNLOAD_OK)
@@ -338,14 +459,19 @@ class ComicFetcher(SSGBaseFetcher[T_ComicInfo], Generic[T_ComicInfo, T_ChapterIn
 
         return res
 
+    @staticmethod
+    def _chapter_resource_id(cid, chapter_id) -> str:
+        """章节在媒体库中的资源id"""
+        return f"{cid}/{chapter_id}"
+
     async def _download_process_with_semaphore(self, comic_title: str, chapter: T_ChapterInfo, progress: TaskDLProgress = None):
-        try:
-            async with self.capter_lock:
-                await self._download_process(comic_title, chapter, progress)
-        except Exception:
-            raise
-        finally:
-            self.task_semaphore.release()
+        async with self.chapter_semaphore:
+            result = await self._download_process(comic_title, chapter, progress)
+            if result == 0:
+                comic_info = chapter.comic_info
+                library_index.add(self.site_name, self._chapter_resource_id(comic_info.cid, chapter.id),
+                                  comic_info.comic_dir, chapter.title, comic_info.view_url)
+            return result
 
     async def _start_download_task(self, chapter: T_ChapterInfo):
         comic_info = chapter.comic_info
@@ -361,55 +487,193 @@ class ComicFetcher(SSGBaseFetcher[T_ComicInfo], Generic[T_ComicInfo, T_ChapterIn
                     raise ValueError("当前目标路径过长，无法创建漫画文件")
 
         logger.info("正在下载第%d章" % chapter.id)
+        if chapter.image_urls:
+            # 章节等待下载期间，提前建立到图片服务器的连接
+            session_manager.start_prewarm(chapter.image_urls)
         task_name = comic_title
-        await download_manager.create_task(task_name, self._download_process_with_semaphore, comic_title, chapter)
+        await download_manager.create_task(task_name, self._download_process_with_semaphore, comic_title, chapter,
+                                           key=self._download_task_key(chapter))
+
+    def _download_task_key(self, chapter: T_ChapterInfo) -> Hashable:
+        return self.site_name, chapter.comic_info.cid, chapter.id
 
     def _make_source_info_file(self, info: T_ComicInfo):
         make_source_info_file(info.comic_dir, info)
 
+    def _info_cache_params(self, **kwargs) -> dict:
+        chapter_id_list = kwargs.get("chapter_id_list")
+        return {"chapter_id_list": sorted(int(c) for c in chapter_id_list) if chapter_id_list else None}
+
+    def _match_cached_info(self, entry: dict, **kwargs) -> Optional[T_ComicInfo]:
+        """缓存中包含本次请求的全部章节时，取出请求的章节"""
+        cached_ids = entry["params"]["chapter_id_list"]
+        request_ids = self._info_cache_params(**kwargs)["chapter_id_list"]
+        comic_info: T_ComicInfo = entry["info"]
+
+        if request_ids is None:
+            return comic_info if cached_ids is None else None
+
+        if cached_ids is not None and not set(request_ids).issubset(cached_ids):
+            return None
+
+        chapter_list = [c for c in comic_info.chapter_list if int(c.id) in request_ids]
+        if len(chapter_list) != len(request_ids):
+            return None
+        comic_info.chapter_list = chapter_list
+        return comic_info
+
     @abstractmethod
     async def _fetch_info(self, url, **kwargs) -> T_ComicInfo:
         """抓取资源信息，子类需要实现该功能"""
         pass
 
-    async def download(self, url, **kwargs):
+    async def _fetch_info_iter(self, url, **kwargs) -> AsyncIterator[T_ChapterInfo]:
+        """
+        抓取资源信息，逐个产出章节信息
+
+        章节的 comic_info 指向同一个 ComicInfo 对象，产出章节时会同时加入 comic_info.chapter_list。
+        默认实现为抓取完整资源信息后依次产出，子类可重写为每个章节的图片地址解析完成后立即产出
+        """
+        comic_info = await self._fetch_info(url, **kwargs)
+        for chapter in comic_info.chapter_list:
+            yield chapter
+
+    async def info_iter(self, url, **kwargs) -> AsyncIterator[T_ChapterInfo]:
+        """
+        获取资源信息，逐个产出章节信息，优先使用资源信息缓存，全部章节产出后更新缓存
+        Args:
+            url: 资源页面url
+            **kwargs: 同 info
+        """
+        refresh = kwargs.pop("refresh", False)
+        use_cache = info_cache.enabled and not kwargs.pop("no_cache", False)
+        key = self._info_cache_key(url)
+
+        if use_cache and not refresh:
+            entry = info_cache.get(key, self.info_cache_ttl)
+            comic_info = self._match_cached_info(entry, **kwargs) if entry is not None else None
+            if comic_info is not None:
+                logger.info(f"匹配到缓存中的资源信息({key})")
+                for chapter in comic_info.chapter_list:
+                    yield chapter
+                return
+
+        comic_info = None
+        async for chapter in self._fetch_info_iter(url, **kwargs):
+            comic_info = chapter.comic_info
+            yield chapter
+
+        if use_cache and comic_info is not None:
+            info_cache.put(key, {"info": comic_info, "params": self._info_cache_params(**kwargs)})
+
+    def _is_chapter_downloaded(self, cid, chapter_id) -> bool:
+        """章节是否已下载到媒体库"""
+        return library_index.contains(self.site_name, self._chapter_resource_id(cid, chapter_id))
+
+    async def _download(self, url, **kwargs):
         default_params = {
             "no_download": False,
-            "chapter_id_list": None
+            "chapter_id_list": None,
+            "force": False,     # True: 忽略媒体库记录，重新下载
+            "refresh": False,   # True: 忽略资源信息缓存，重新获取资源信息
         }
         params = {**default_params, **kwargs}
-        await self.task_semaphore.acquire()
+        check_library = not params["no_download"] and not params["force"]
 
-        comic_info = await self._fetch_info(url, chapter_id_list=params["chapter_id_list"])
-        comic_info.print_info()
+        # 指定的章节都已下载时无需请求网络
+        cid = self._parse_resource_id(url)
+        if check_library and cid and params["chapter_id_list"] and \
+                all(self._is_chapter_downloaded(cid, chapter_id) for chapter_id in params["chapter_id_list"]):
+            logger.info(f"漫画(cid-{cid})指定章节已全部存在于媒体库中，跳过下载")
+            return
 
         if params["no_download"]:
-            self.task_semaphore.release()
+            comic_info = await self.info(url, chapter_id_list=params["chapter_id_list"], refresh=params["refresh"])
+            comic_info.print_info()
             return
 
-        self._make_save_dir(comic_info)
+        await self.task_semaphore.acquire()
+        try:
+            # 章节信息逐个获取，每获取到一个章节立即创建下载任务，不等待全部章节解析完成
+            comic_info = None
+            skip_count = 0
+            start_count = 0
+            async for chapter in self.info_iter(url, chapter_id_list=params["chapter_id_list"],
+                                                refresh=params["refresh"]):
+                comic_info = chapter.comic_info
+
+                if check_library and self._is_chapter_downloaded(comic_info.cid, chapter.id):
+                    skip_count = skip_count + 1
+                    continue
+
+                if download_manager.find_active_task(self._download_task_key(chapter)):
+                    logger.info(f"第{chapter.id}章正在下载中")
+                    continue
+
+                if start_count == 0:
+                    self._make_save_dir(comic_info)
+                    self._make_source_info_file(comic_info)
+
+                await self._start_download_task(chapter)
+                start_count = start_count + 1
+        finally:
+            self.task_semaphore.release()
+
+        if comic_info is None:
+            logger.warning("未获取到任何章节")
+            return
 
-        for chapter in comic_info.chapter_list:
-            await self._start_download_task(chapter)
-            self._make_source_info_file(comic_info)
+        comic_info.print_info()
+        if skip_count:
+            logger.info(f"跳过媒体库中已存在的{skip_count}个章节")
+        if start_count == 0:
+            logger.info(f"漫画(cid-{comic_info.cid})没有需要下载的章节")
 
 
 class FetcherRegistry:
     """Fetcher类注册器"""
     _registry: Dict[str, Type[AbstractFetcher]] = {}
     _fetchers: Dict[str, AbstractFetcher] = {}
+    _url_patterns: List[Tuple[str, str]] = []     # (站点名, url正则)，按注册顺序匹配
+    _url_index: Optional[re.Pattern] = None      # 由所有url正则合并预编译的索引，注册新站点后重建
 
     @classmethod
-    def register(cls, site_name: str):
-        """注册装饰器"""
+    def register(cls, site_name: str, url_patterns: Optional[List[str]] = None):
+        """
+        注册装饰器
+        Args:
+            site_name: 站点名
+            url_patterns: 站点资源页面url的正则列表，用于根据url自动识别站点，正则中不能包含命名分组
+        """
         def decorator(fetcher_class: Type[AbstractFetcher]):
             if not issubclass(fetcher_class, AbstractFetcher):
                 raise TypeError(f"{fetcher_class} 必须继承自 AbstractFetcher")
             cls._registry[site_name] = fetcher_class
+            fetcher_class.site_name = site_name
+            for pattern in url_patterns or []:
+                cls._url_patterns.append((site_name, pattern))
+            cls._url_index = None
             logger.debug(f"注册Fetcher类{fetcher_class}")
             return fetcher_class
         return decorator
 
+    @classmethod
+    def _build_url_index(cls) -> re.Pattern:
+        """将所有站点的url正则合并为一个预编译的正则，每个站点的正则放在独立的命名分组中"""
+        alternatives = [f"(?P<_{index}>{pattern})" for index, (_, pattern) in enumerate(cls._url_patterns)]
+        return re.compile("|".join(alternatives) or r"(?!)", re.IGNORECASE)
+
+    @classmethod
+    def match_site(cls, url: str) -> Optional[str]:
+        """根据url识别所属站点，无法识别时返回None"""
+        if cls._url_index is None:
+            cls._url_index = cls._build_url_index()
+
+        match = cls._url_index.search(url)
+        if not match:
+            return None
+        return cls._url_patterns[int(match.lastgroup[1:])][0]
+
     @classmethod
     def get_fetcher(cls, site_name: str, *args, **kwargs) -> Optional[AbstractFetcher]:
         """获取指定站点的下载器实例"""
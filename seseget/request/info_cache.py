@@ -0,0 +1,129 @@
+import pickle
+import sqlite3
+import threading
+import time
+from typing import Any, Optional
+
+from ..config.config_manager import config
+from ..config.path import INFO_CACHE_DB_PATH
+from ..utils.trace import logger
+
+
+class InfoCache:
+    """资源信息持久化缓存
+
+    缓存以 "站点名:资源id" 为键，保存序列化后的 VideoInfo/ComicInfo 等资源信息对象，
+    条目超过有效期后失效，总大小超过上限时按最近访问时间淘汰最久未使用的条目(LRU)。
+    有效期和大小上限见配置文件 cache 项。
+    """
+
+    def __init__(self, db_path: str):
+        self._db_path = db_path
+        self._conn: sqlite3.Connection | None = None
+        self._lock = threading.Lock()
+
+    def _get_conn(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = sqlite3.connect(self._db_path, check_same_thread=False)
+            self._conn.executescript("""
+                CREATE TABLE IF NOT EXISTS info_cache (
+                    key TEXT PRIMARY KEY,
+                    data BLOB NOT NULL,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_info_cache_accessed_at ON info_cache (accessed_at);
+            """)
+        return self._conn
+
+    @property
+    def enabled(self) -> bool:
+        return bool(config["cache"]["enable"])
+
+    def get(self, key: str, ttl: Optional[int] = None) -> Optional[Any]:
+        """
+        读取缓存
+        Args:
+            key: 缓存键
+            ttl: 有效期(s)，未指定时使用配置中的有效期
+        Returns: 缓存的对象，缓存不存在或已过期时返回None
+        """
+        ttl = config["cache"]["ttl"] if ttl is None else ttl
+        now = time.time()
+        with self._lock:
+            conn = self._get_conn()
+            row = conn.execute("SELECT data, created_at FROM info_cache WHERE key=?", (key,)).fetchone()
+            if row is None:
+                return None
+
+            if now - row[1] > ttl:
+                conn.execute("DELETE FROM info_cache WHERE key=?", (key,))
+                conn.commit()
+                return None
+
+            conn.execute("UPDATE info_cache SET accessed_at=? WHERE key=?", (now, key))
+            conn.commit()
+
+        try:
+            return pickle.loads(row[0])
+        except Exception as e:
+            logger.warning(f"资源信息缓存读取失败(key-{key}), info: {e}")
+            self.invalidate(key)
+            return None
+
+    def put(self, key: str, value: Any):
+        """写入缓存，写入后总大小超过上限时淘汰最久未使用的条目"""
+        try:
+            data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception as e:
+            logger.warning(f"资源信息无法缓存(key-{key}), info: {e}")
+            return
+
+        now = time.time()
+        with self._lock:
+            conn = self._get_conn()
+            conn.execute("INSERT OR REPLACE INTO info_cache (key, data, size, created_at, accessed_at) "
+                         "VALUES (?, ?, ?, ?, ?)", (key, data, len(data), now, now))
+            self._evict(conn)
+            conn.commit()
+
+    def _evict(self, conn: sqlite3.Connection):
+        max_size = int(config["cache"]["max_size"] * 1024 * 1024)
+        total_size = conn.execute("SELECT COALESCE(SUM(size), 0) FROM info_cache").fetchone()[0]
+        if total_size <= max_size:
+            return
+
+        evict_keys = []
+        for key, size in conn.execute("SELECT key, size FROM info_cache ORDER BY accessed_at"):
+            if total_size <= max_size:
+                break
+            evict_keys.append((key,))
+            total_size = total_size - size
+
+        conn.executemany("DELETE FROM info_cache WHERE key=?", evict_keys)
+        logger.debug(f"淘汰资源信息缓存{len(evict_keys)}条")
+
+    def invalidate(self, key: str):
+        """删除指定缓存"""
+        with self._lock:
+            conn = self._get_conn()
+            conn.execute("DELETE FROM info_cache WHERE key=?", (key,))
+            conn.commit()
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            conn = self._get_conn()
+            conn.execute("DELETE FROM info_cache")
+            conn.commit()
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+# 全局资源信息缓存实例
+info_cache = InfoCache(INFO_CACHE_DB_PATH)
@@ -1,18 +1,25 @@
 import asyncio
+import ipaddress
+import socket
+import time
+from collections import OrderedDict
 
-from curl_cffi import requests as sync_requests
+from curl_cffi import requests as sync_requests, CurlHttpVersion, CurlOpt
 from curl_cffi.requests import AsyncSession
 from urllib.parse import urlparse
 from urllib.request import getproxies
-from typing import Dict
+from typing import Dict, Iterable, List, Tuple
 from requests.structures import CaseInsensitiveDict
 
 from ..config import settings
+from ..utils.async_utils import SingleFlight
 from ..utils.trace import logger
 from ..config.config_manager import config
 
 
 REQUEST_RETRY_MAX = 3
+# 检查并关闭空闲会话的最小间隔(s)
+SESSION_EVICT_INTERVAL = 30
 DEFAULT_HEADERS = {
     'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/121.0.0.0 Safari/537.36'
 }
@@ -89,59 +96,265 @@ class SessionManager:
 # session_manager = SessionManager()
 
 
-# 异步 SessionManager
-class AsyncSessionManager:
-    """异步 Session 管理器，按请求主机自动分配独立 AsyncSession"""
+class DNSCache:
+    """域名解析缓存
+
+    解析结果在 common.request.dns_ttl 时间内有效，所有主机会话共用，并发解析同一域名时只解析一次。
+    解析结果通过 CURLOPT_RESOLVE 提供给 curl，解析失败时不缓存，由 curl 自行解析。
+    """
 
     def __init__(self):
-        self._sessions: Dict[str, AsyncSession] = {}
-        self._lock = asyncio.Lock()
+        self._entries: Dict[Tuple[str, int], Tuple[float, List[str]]] = {}   # (域名, 端口) -> (解析时间, 地址列表)
+        self._single_flight = SingleFlight()
 
-    async def _get_session_for_host(self, host: str) -> AsyncSession:
-        async with self._lock:
-            if host not in self._sessions:
-                session = AsyncSession()
-                self._sessions[host] = session
-            return self._sessions[host]
+    async def resolve(self, host: str, port: int) -> List[str]:
+        """解析域名，返回地址列表，解析失败时返回空列表"""
+        entry = self._entries.get((host, port))
+        if entry is not None and time.monotonic() - entry[0] < float(config["common"]["request"]["dns_ttl"]):
+            return entry[1]
+        return await self._single_flight.do((host, port), self._resolve, host, port)
 
-    async def request(self, method, url, **kwargs):
-        """发起异步请求，自动路由到对应主机的 AsyncSession"""
-        if "headers" in kwargs:
-            headers = CaseInsensitiveDict(DEFAULT_HEADERS)
-            headers.update(kwargs["headers"])
-            kwargs["headers"] = headers.copy()
-        else:
-            kwargs["headers"] = DEFAULT_HEADERS.copy()
-        logger.debug(f'headers: {kwargs["headers"]}')
+    async def _resolve(self, host: str, port: int) -> List[str]:
+        try:
+            infos = await asyncio.get_running_loop().getaddrinfo(host, port, type=socket.SOCK_STREAM)
+        except OSError as e:
+            logger.debug(f"域名解析失败: {host}, info: {e}")
+            return []
+        addrs = list(dict.fromkeys(f"[{info[4][0]}]" if info[0] == socket.AF_INET6 else info[4][0]
+                                   for info in infos))
+        self._entries[(host, port)] = (time.monotonic(), addrs)
+        logger.debug(f"域名解析: {host} -> {addrs}")
+        return addrs
 
-        if "proxies" not in kwargs:
-            proxy_config = config["common"]["proxy"]
+
+dns_cache = DNSCache()
+
+
+# 异步 SessionManager
+class HostSession:
+    """主机的 AsyncSession 及该主机的默认请求参数，参数在创建时计算，之后的请求直接复用"""
+
+    def __init__(self, host: str):
+        request_config = config["common"]["request"]
+        max_clients = int(request_config["host_max_clients"].get(host, request_config["max_clients"]))
+        http_version = CurlHttpVersion.V2TLS if request_config["http2"] else CurlHttpVersion.V1_1
+
+        self.host = host
+        self.session = AsyncSession(max_clients=max(max_clients, 1), http_version=http_version)
+        self.headers = CaseInsensitiveDict(DEFAULT_HEADERS)
+        self.impersonate = "chrome110"
+        self.active = 0     # 进行中的请求数，流式请求在数据传输结束后才算完成
+        self.requests = 0   # 累计请求数
+        self.last_used = time.monotonic()
+
+    def set_resolve(self, host: str, port: int, addrs: List[str]):
+        """设置会话的域名解析结果，"+"前缀表示该记录与curl自身的解析结果一样按超时时间失效"""
+        resolve = f"+{host}:{port}:{','.join(addrs)}"
+        if self.session.curl_options.get(CurlOpt.RESOLVE) != [resolve]:
+            self.session.curl_options = {**self.session.curl_options, CurlOpt.RESOLVE: [resolve]}
+
+    def acquire(self):
+        self.active = self.active + 1
+        self.requests = self.requests + 1
+        self.last_used = time.monotonic()
+
+    def release(self, *_):
+        self.active = self.active - 1
+        self.last_used = time.monotonic()
+
+
+class AsyncSessionManager:
+    """异步 Session 管理器，按请求主机自动分配独立 AsyncSession
+
+    会话按最近使用顺序排列，空闲超过 common.request.session_idle_timeout 的会话会被关闭，
+    会话数超过 common.request.max_sessions 时关闭最久未使用的空闲会话，有进行中请求的会话不会被关闭
+    """
+
+    def __init__(self):
+        self._sessions: OrderedDict[str, HostSession] = OrderedDict()
+        self._lock = asyncio.Lock()
+        self._last_evict = time.monotonic()
+        self._created = 0
+        self._evicted = 0
+        self._prewarm_tasks: set[asyncio.Task] = set()
+        self._proxy_config = None
+        self._proxies = None
+
+    def _get_default_proxies(self) -> dict:
+        """默认代理，配置文件未设置代理时使用系统代理，代理配置不变时复用上次的结果"""
+        proxy_config = config["common"]["proxy"]
+        if self._proxies is None or proxy_config != self._proxy_config:
             if proxy_config:
                 proxies = {
                     "http": proxy_config,
                     "https": proxy_config,
                 }
-                kwargs["proxies"] = proxies
             else:
                 sys_proxies = getproxies()
                 proxies = {
                     "http": sys_proxies.get("http"),
                     "https": sys_proxies.get("https"),
                 }
-                kwargs["proxies"] = proxies
-            logger.debug(f'proxy: {kwargs["proxies"]}')
+            self._proxy_config = proxy_config
+            self._proxies = proxies
+            logger.debug(f'proxy: {proxies}')
+        return self._proxies
+
+    async def _get_session_for_host(self, host: str) -> HostSession:
+        # 会话已存在时直接返回，不需要加锁
+        host_session = self._sessions.get(host)
+        if host_session is not None:
+            self._sessions.move_to_end(host)
+            return host_session
 
-        if "impersonate" not in kwargs:
-            kwargs["impersonate"] = "chrome110"
+        async with self._lock:
+            if host not in self._sessions:
+                await self._evict(reserve=1)
+                self._sessions[host] = HostSession(host)
+                self._created = self._created + 1
+            return self._sessions[host]
 
-        if "timeout" not in kwargs:
-            kwargs["timeout"] = settings.REQUEST_TIMEOUT
+    async def _evict(self, reserve: int = 0):
+        """
+        关闭空闲超时的会话，会话数超过上限时按最久未使用的顺序关闭空闲会话，调用时需持有锁
+        Args:
+            reserve: 需要为新会话预留的数量
+        """
+        request_config = config["common"]["request"]
+        max_sessions = max(int(request_config["max_sessions"]), 1)
+        idle_timeout = float(request_config["session_idle_timeout"])
+        now = time.monotonic()
+        self._last_evict = now
+
+        evict_hosts = []
+        over = len(self._sessions) + reserve - max_sessions
+        for host, host_session in self._sessions.items():
+            if host_session.active > 0:
+                continue
+            if over > 0 or now - host_session.last_used > idle_timeout:
+                evict_hosts.append(host)
+                over = over - 1
+
+        for host in evict_hosts:
+            # 先移出会话表，之后的请求会创建新会话
+            host_session = self._sessions.pop(host)
+            await host_session.session.close()
+            self._evicted = self._evicted + 1
+            logger.debug(f"关闭空闲AsyncSession: {host}")
+
+    @staticmethod
+    async def _apply_dns_cache(host_session: HostSession, parsed_url):
+        """使用共用的域名解析缓存，不使用代理时才生效(使用代理时由代理服务器解析域名)"""
+        hostname = parsed_url.hostname
+        if not hostname:
+            return
+        try:
+            ipaddress.ip_address(hostname)
+            return
+        except ValueError:
+            pass
+
+        port = parsed_url.port or (443 if parsed_url.scheme == "https" else 80)
+        addrs = await dns_cache.resolve(hostname, port)
+        if addrs:
+            host_session.set_resolve(hostname, port, addrs)
+
+    async def prewarm(self, urls: Iterable[str | List[str]], connections: int = None, **kwargs):
+        """
+        预热即将请求的主机，提前解析域名并建立连接(包括TLS握手)，之后的请求直接复用连接
+        Args:
+            urls: 即将请求的url，每项也可以为镜像地址列表(使用第一个地址)，每个主机取前几个url发起HEAD请求建立连接
+            connections: 每个主机建立的连接数，为None时使用配置 common.request.prewarm_connections
+            **kwargs: 附加参数，传递给请求(headers 等)
+        """
+        if connections is None:
+            connections = int(config["common"]["request"]["prewarm_connections"])
+        if connections <= 0:
+            return
+
+        host_urls: Dict[str, List[str]] = {}
+        for url in urls:
+            if not isinstance(url, str):
+                url = url[0]
+            host = urlparse(url).netloc
+            host_session = self._sessions.get(host)
+            if host_session is not None and host_session.active > 0:
+                # 正在请求的主机已有可用连接
+                continue
+            url_list = host_urls.setdefault(host, [])
+            if len(url_list) < connections:
+                url_list.append(url)
+
+        async def warm(url):
+            try:
+                response = await self.request("HEAD", url, **kwargs)
+                logger.debug(f"预热连接: {url} [{response.status_code}]")
+            except Exception as e:
+                logger.debug(f"预热连接失败, url: {url}, info: {e}")
+
+        await asyncio.gather(*[warm(url) for url_list in host_urls.values() for url in url_list])
+
+    def start_prewarm(self, urls: Iterable[str | List[str]], **kwargs):
+        """在后台预热即将请求的主机，不等待预热完成，参数同 prewarm"""
+        task = asyncio.create_task(self.prewarm(urls, **kwargs))
+        self._prewarm_tasks.add(task)
+        task.add_done_callback(self._prewarm_tasks.discard)
+
+    async def request(self, method, url, **kwargs):
+        """发起异步请求，自动路由到对应主机的 AsyncSession"""
+        if time.monotonic() - self._last_evict >= SESSION_EVICT_INTERVAL and not self._lock.locked():
+            async with self._lock:
+                await self._evict()
 
         parsed_url = urlparse(url)
         host = parsed_url.netloc
-        session = await self._get_session_for_host(host)
-
-        return await session.request(method, url, **kwargs)
+        host_session = await self._get_session_for_host(host)
+        # 获取会话后立即计入进行中的请求，之后的等待期间会话不会被关闭
+        host_session.acquire()
+        try:
+            headers = host_session.headers.copy()
+            if "headers" in kwargs:
+                headers.update(kwargs["headers"])
+            kwargs["headers"] = headers
+            logger.debug(f'headers: {kwargs["headers"]}')
+
+            if "proxies" not in kwargs:
+                kwargs["proxies"] = self._get_default_proxies()
+
+            if "impersonate" not in kwargs:
+                kwargs["impersonate"] = host_session.impersonate
+
+            if float(config["common"]["request"]["dns_ttl"]) > 0 and not any((kwargs["proxies"] or {}).values()):
+                await self._apply_dns_cache(host_session, parsed_url)
+
+            if "timeout" not in kwargs:
+                if kwargs.get("stream"):
+                    # 流式请求的传输时间不设上限，分别限制建立连接和读取数据的空闲时间
+                    kwargs["timeout"] = (float(config["download"]["timeout"]["connect"]),
+                                         float(config["download"]["timeout"]["idle"]))
+                else:
+                    kwargs["timeout"] = settings.REQUEST_TIMEOUT
+
+            response = await host_session.session.request(method, url, **kwargs)
+        except BaseException:
+            host_session.release()
+            raise
+        if kwargs.get("stream"):
+            # 流式请求在数据传输结束后释放
+            response.astream_task.add_done_callback(host_session.release)
+        else:
+            host_session.release()
+        return response
+
+    def stats(self) -> dict:
+        """会话统计信息"""
+        return {
+            "sessions": len(self._sessions),
+            "active_requests": sum(s.active for s in self._sessions.values()),
+            "created": self._created,
+            "evicted": self._evicted,
+            "hosts": {host: {"active": s.active, "requests": s.requests} for host, s in self._sessions.items()},
+        }
 
     async def get(self, url, **kwargs):
         return await self.request("GET", url, **kwargs)
@@ -150,9 +363,12 @@ class AsyncSessionManager:
         return await self.request("POST", url, **kwargs)
 
     async def close_all(self):
+        for task in list(self._prewarm_tasks):
+            task.cancel()
+        await asyncio.gather(*self._prewarm_tasks, return_exceptions=True)
         async with self._lock:
-            for host, session in self._sessions.items():
-                await session.close()
+            for host, host_session in self._sessions.items():
+                await host_session.session.close()
                 logger.debug(f"释放AsyncSession: {host}")
             self._sessions.clear()
 
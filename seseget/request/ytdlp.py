@@ -1,5 +1,17 @@
+import asyncio
+import atexit
+import copy
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Hashable, List, Optional
+
 import yt_dlp
+from yt_dlp.downloader import FileDownloader, HttpFD, get_suitable_downloader
+from . import downloader
 from .downloadtask import TaskDLProgress, FileDLProgress
+from ..config.config_manager import config
 from ..utils.trace import SSGLogger, logger
 
 
@@ -29,20 +41,191 @@ DEFAULT_FORMAT = 'bestvideo[ext=mp4]+bestaudio[ext=m4a]/best[ext=mp4]/best'
 VIDEO_FORMAT = 'bestvideo[ext=mp4]/bestvideo'
 AUDIO_FORMAT = 'bestaudio[ext=m4a]/bestaudio'
 
+# 每个站点(及配置)最多保留的空闲 YoutubeDL 实例数
+YDL_POOL_MAX_IDLE = 2
+
 
-def get_info(url, extend_opts=None):
+def make_ydl_opts(extend_opts=None) -> dict:
+    """获取信息和下载共用的 yt-dlp 配置，两者配置一致时获取到的信息可以直接用于下载"""
     ydl_opts = {
         'logger': YtDlpLogger(),
+        'format': 'bv[ext=mp4]+ba[ext=m4a]/b[ext=mp4]/b',
         'source_address': '0.0.0.0',
         'verbose': True,
         'retries': 3,
+        'noprogress': True,
+        'merge_output_format': 'mp4',
+        'noplaylist': True,
+        # 分片视频(DASH/HLS)的分片按下载任务的连接数并发下载
+        'concurrent_fragment_downloads': max(int(config["download"]["connections"]), 1),
     }
+    http_chunk_size = int(config["download"]["video"]["http_chunk_size"] * 1024 * 1024)
+    if http_chunk_size > 0:
+        ydl_opts['http_chunk_size'] = http_chunk_size
     if extend_opts is not None:
         ydl_opts.update(extend_opts)
+    return ydl_opts
+
+
+class _HookProgress:
+    """接收 downloader 的下载进度，转换为 yt-dlp 的进度回调"""
+
+    def __init__(self, fd: FileDownloader, filename: str, tmpfilename: str, info_dict: dict):
+        self.fd = fd
+        self.filename = filename
+        self.tmpfilename = tmpfilename
+        self.info_dict = info_dict
+        self.start = time.time()
+        self.downloaded = 0
+        self.total = 0
+
+    def add_progress(self, file_name: str, total: int = 0):
+        self.total = total
+
+    def update(self, file_name: str, size: int):
+        self.downloaded += size
+        self.fd._hook_progress({
+            'status': 'downloading',
+            'filename': self.filename,
+            'tmpfilename': self.tmpfilename,
+            'downloaded_bytes': self.downloaded,
+            'total_bytes': self.total or None,
+            'elapsed': time.time() - self.start,
+        }, self.info_dict)
+
+
+class SSGHttpFD(FileDownloader):
+    """使用 seseget 的下载器下载普通http(s)文件，支持断点续传和下载重试，请求使用站点共用的会话"""
+
+    FD_NAME = 'seseget'
+
+    def __init__(self, ydl, params, loop: asyncio.AbstractEventLoop):
+        super().__init__(ydl, params)
+        self.loop = loop
+
+    def real_download(self, filename, info_dict):
+        tmpfilename = self.temp_name(filename)
+        self.report_destination(filename)
+
+        hook_progress = _HookProgress(self, filename, tmpfilename, info_dict)
+        headers = dict(info_dict.get('http_headers') or {})
+        # downloader 运行在事件循环中，当前线程等待下载完成
+        future = asyncio.run_coroutine_threadsafe(
+            downloader.download_file_ex(tmpfilename, info_dict['url'], progress=hook_progress, headers=headers),
+            self.loop)
+        future.result()
+
+        self.try_rename(tmpfilename, filename)
+        size = os.path.getsize(filename)
+        self._hook_progress({
+            'status': 'finished',
+            'filename': filename,
+            'downloaded_bytes': size,
+            'total_bytes': size,
+            'elapsed': time.time() - hook_progress.start,
+        }, info_dict)
+        return True
+
+
+class SSGYoutubeDL(yt_dlp.YoutubeDL):
+    """设置了 event_loop 时，普通http(s)文件交给 SSGHttpFD 下载，其余协议仍使用 yt-dlp 内置的下载器"""
+
+    def __init__(self, params=None, auto_init=True):
+        super().__init__(params, auto_init)
+        self.event_loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def dl(self, name, info, subtitle=False, test=False):
+        if (self.event_loop is None or test or subtitle or name == '-' or not info.get('url')
+                or get_suitable_downloader(info, self.params) is not HttpFD):
+            return super().dl(name, info, subtitle, test)
+
+        fd = SSGHttpFD(self, self.params, self.event_loop)
+        for ph in self._progress_hooks:
+            fd.add_progress_hook(ph)
+        self.write_debug(f'Invoking {fd.FD_NAME} downloader on "{info["url"]}"')
+
+        new_info = self._copy_infodict(info)
+        if new_info.get('http_headers') is None:
+            new_info['http_headers'] = self._calc_headers(new_info)
+        return fd.download(name, new_info, subtitle)
+
+
+class PooledYoutubeDL:
+    """池中的 YoutubeDL 实例，创建时注册转发进度的回调，每次使用时通过 progress_hook 设置实际的回调"""
+
+    def __init__(self, ydl_opts: dict):
+        self.progress_hook: Optional[Callable[[dict], None]] = None
+        self.ydl = SSGYoutubeDL({**ydl_opts, 'progress_hooks': [self._on_progress]})
 
+    def _on_progress(self, d):
+        if self.progress_hook:
+            self.progress_hook(d)
+
+
+class YoutubeDLPool:
+    """YoutubeDL 实例池
+
+    创建 YoutubeDL 需要初始化提取器、加载cookie文件和网络连接，按站点和配置缓存空闲的实例复用。
+    实例同一时间只会被一个线程使用，使用完成后放回池中，使用过程中出现异常的实例不再复用。
+    """
+
+    def __init__(self, max_idle: int = YDL_POOL_MAX_IDLE):
+        self._max_idle = max_idle
+        self._idle: Dict[Hashable, List[PooledYoutubeDL]] = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def acquire(self, site: str, extend_opts: Optional[dict] = None):
+        """
+        获取 YoutubeDL 实例
+        Args:
+            site: 站点名
+            extend_opts: 站点的 yt-dlp 扩展配置，相同站点和配置的实例可以复用
+        """
+        key = (site, repr(sorted((extend_opts or {}).items())))
+        with self._lock:
+            idle = self._idle.get(key)
+            pooled = idle.pop() if idle else None
+        if pooled is None:
+            pooled = PooledYoutubeDL(make_ydl_opts(extend_opts))
+
+        reusable = False
+        try:
+            yield pooled
+            reusable = True
+        finally:
+            pooled.progress_hook = None
+            pooled.ydl.event_loop = None
+            pooled.ydl.save_cookies()
+            with self._lock:
+                idle = self._idle.setdefault(key, [])
+                if reusable and len(idle) < self._max_idle:
+                    idle.append(pooled)
+                    pooled = None
+            if pooled is not None:
+                pooled.ydl.close()
+
+    def close_all(self):
+        with self._lock:
+            pools, self._idle = self._idle, {}
+        for idle in pools.values():
+            for pooled in idle:
+                pooled.ydl.close()
+
+
+ydl_pool = YoutubeDLPool()
+atexit.register(ydl_pool.close_all)
+
+
+def get_info(url, extend_opts=None, site=""):
+    """
+    通过yt_dlp获取视频信息
+    Returns: 可序列化的视频信息(info_dict)，可以传递给 download_by_yt_dlp 直接下载，失败时返回None
+    """
     try:
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            info = ydl.extract_info(url, download=False)
+        with ydl_pool.acquire(site, extend_opts) as pooled:
+            info = pooled.ydl.extract_info(url, download=False)
+            info = pooled.ydl.sanitize_info(info)
     except Exception as result:
         logger.error('Error! info: %s' % result)
         return None
@@ -50,8 +233,28 @@ def get_info(url, extend_opts=None):
     return info
 
 
-def download_by_yt_dlp(filename, url, extend_opts=None, progress: TaskDLProgress = None):
-    """通过yt_dlp下载视频"""
+def _prepare_ie_result(info_dict: dict) -> dict:
+    """去除获取信息时产生的下载相关字段，得到可以重新处理下载的信息副本"""
+    ie_result = yt_dlp.YoutubeDL.sanitize_info(copy.deepcopy(info_dict), True)
+    if info_dict.get('_type') == 'playlist' and info_dict.get('entries'):
+        ie_result['entries'] = [_prepare_ie_result(entry) for entry in info_dict['entries']]
+    return ie_result
+
+
+def download_by_yt_dlp(filename, url, extend_opts=None, progress: TaskDLProgress = None, info_dict: dict = None,
+                       site="", loop: asyncio.AbstractEventLoop = None):
+    """
+    通过yt_dlp下载视频
+    Args:
+        filename: 保存路径，可以为yt-dlp的输出模板，extend_opts中指定了outtmpl时使用outtmpl
+        url: 视频页面url
+        extend_opts: 站点的 yt-dlp 扩展配置
+        progress: 下载进度
+        info_dict: get_info 获取的视频信息，不为None时直接使用该信息下载，不再重新提取页面
+        site: 站点名，用于复用 YoutubeDL 实例
+        loop: 调用者的事件循环，配置 download.video.native_downloader 开启时，普通http(s)文件在该事件循环中使用
+              seseget 的下载器下载
+    """
     # 下载进度回调
     def progress_hook(d):
         file_name = ""
@@ -78,29 +281,27 @@ def download_by_yt_dlp(filename, url, extend_opts=None, progress: TaskDLProgress
         progress.set_downloaded(file_name, downloaded)
         progress.set_status(status)
 
-    # 下载配置
-    ydl_opts = {
-        'logger': YtDlpLogger(),
-        'format': 'bv[ext=mp4]+ba[ext=m4a]/b[ext=mp4]/b',
-        #'outtmpl': dir + '/%(title)s.%(ext)s',
-        'outtmpl': filename,
-        'source_address': '0.0.0.0',
-        'verbose': True,
-        'retries': 3,
-        'progress_hooks': [progress_hook],
-        'noprogress': True,
-        'merge_output_format': 'mp4',
-        'noplaylist': True,
-    }
-    if extend_opts is not None:
-        ydl_opts.update(extend_opts)
+    # 输出路径每次下载都不同，不作为实例配置
+    extend_opts = dict(extend_opts or {})
+    outtmpl = extend_opts.pop('outtmpl', filename)
 
     try:
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+        with ydl_pool.acquire(site, extend_opts) as pooled:
+            ydl = pooled.ydl
+            pooled.progress_hook = progress_hook
+            if config["download"]["video"]["native_downloader"]:
+                ydl.event_loop = loop
+            ydl.params['outtmpl'] = {'default': outtmpl}
+            ydl._parse_outtmpl()
+
             progress.init_progress()
             progress.set_progress_count(2)
             progress.set_status(FileDLProgress.Status.DOWNLOADING)
-            error_code = ydl.download([url])
+            if info_dict is not None:
+                ydl.process_ie_result(_prepare_ie_result(info_dict), download=True)
+                error_code = 0
+            else:
+                error_code = ydl.download([url])
 
             if error_code:
                 logger.error(f'YoutubeDL.download error! code:{error_code}')
@@ -110,6 +311,10 @@ def download_by_yt_dlp(filename, url, extend_opts=None, progress: TaskDLProgress
                 progress.set_status(FileDLProgress.Status.DOWNLOAD_OK)
 
     except Exception as result:
+        if info_dict is not None:
+            # 缓存的信息中的下载地址可能已过期，重新提取页面下载
+            logger.warning(f'使用已获取的视频信息下载失败，重新提取页面下载, info: {result}')
+            return download_by_yt_dlp(filename, url, extend_opts | {'outtmpl': outtmpl}, progress, None, site, loop)
         logger.error('Error! info: %s' % result)
         progress.set_status(FileDLProgress.Status.DOWNLOAD_ERROR)
         return -1
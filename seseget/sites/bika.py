@@ -1,7 +1,8 @@
+import asyncio
 import time
 import hmac
 from hashlib import sha256
-from typing import List
+from typing import List, AsyncIterator
 from urllib.parse import urlparse, urljoin
 
 from ..config.path import DATA_DIR
@@ -64,10 +65,15 @@ base_url = "https://api." + host + "/"
 applekillflag = "C69BAF41DA5ABD1FFEDC6D2FEA56B"
 appleversion = r"~d}$Q7$eIni=V)9\RK/P.RM4;9[7|@/CA}b~OW!3?EV`:<>M7pddUBL5n|0/*Cn"
 
+# 同时请求哔咔API的最大数量
+API_CONCURRENCY = 8
+
 
 class BikaClient:
     def __init__(self):
         self.context = BikaComicInfo()
+        self._api_semaphore = asyncio.Semaphore(API_CONCURRENCY)
+        self._login_lock = asyncio.Lock()
 
     def get_token(self):
         return config["bika"]["token"]
@@ -103,6 +109,15 @@ class BikaClient:
         else:
             return False
 
+    async def relogin(self, expired_token) -> bool:
+        """认证失败时重新登录，并发请求同时认证失败时只登录一次"""
+        async with self._login_lock:
+            if self.get_token() != expired_token:
+                # 其它请求已重新登录
+                return True
+            logger.info("哔咔认证失败，重新登录")
+            return await self.login()
+
     async def request_api(self, method, path_name):
         url = base_url + path_name
         headers_api = HEADERS_API.copy()
@@ -111,15 +126,16 @@ class BikaClient:
         headers_api["nonce"] = self.get_nonce()
         headers_api["signature"] = self.get_signature(path_name, headers_api["time"], method)
 
-        response = await async_request(method, url, headers=headers_api)
+        async with self._api_semaphore:
+            response = await async_request(method, url, headers=headers_api)
         if "unauthorized" in response.text:
-            logger.info("哔咔认证失败，重新登录")
-            if await self.login():
+            if await self.relogin(headers_api["authorization"]):
                 headers_api["time"] = str(int(time.time()))
                 headers_api["authorization"] = self.get_token()
                 headers_api["nonce"] = self.get_nonce()
                 headers_api["signature"] = self.get_signature(path_name, headers_api["time"], method)
-                response = await async_request(method, url, headers=headers_api)
+                async with self._api_semaphore:
+                    response = await async_request(method, url, headers=headers_api)
             else:
                 logger.error("哔咔登录失败")
 
@@ -137,53 +153,65 @@ class BikaClient:
         self.context.description = comic_json["description"]
         self.context.cover = urljoin(urljoin(comic_json["thumb"]["fileServer"], "static/"), comic_json["thumb"]["path"])
 
-    async def get_comic_chapter(self, cid, page_cnt=1):
-        path_name = "comics/" + cid + "/eps?page=" + str(page_cnt)
-        response = await self.request_api("GET", path_name)
-
-        resp_json = response.json()
-        self.context.chapter = self.context.chapter + resp_json["data"]["eps"]["docs"]
-        page_max = int(resp_json["data"]["eps"]["pages"])
-
-        if page_cnt < page_max:
-            await self.get_comic_chapter(cid, page_cnt + 1)
-        else:
-            self.context.chapter.reverse()
-            self.context.chapter.insert(0, {"order": "0", "title": "占位用的，使 chapter order 和列表 index 对齐，方便定位"})
-
-    async def get_comic_chapter_pages(self, cid, chapter_id, page_cnt=1):
-        path_name = "comics/" + cid + "/order/" + str(chapter_id) + "/pages?page=" + str(page_cnt)
-        response = await self.request_api("GET", path_name)
-
-        resp_json = response.json()
-        if "pages" in self.context.chapter[chapter_id]:
-            self.context.chapter[chapter_id]["pages"] = self.context.chapter[chapter_id]["pages"] + \
-                                                        resp_json["data"]["pages"]["docs"]
-        else:
-            self.context.chapter[chapter_id]["pages"] = resp_json["data"]["pages"]["docs"]
-
-        pages_max = int(resp_json["data"]["pages"]["pages"])
-        if page_cnt < pages_max:
-            await self.get_comic_chapter_pages(cid, chapter_id, page_cnt + 1)
-
-    async def get_bika_comic_info(self, cid, chapter_id_list) -> BikaComicInfo:
-        await self.get_comic_view_info(cid)
-        await self.get_comic_chapter(cid)
-
+    async def get_all_pages(self, path_name, field) -> list:
+        """
+        请求分页API的全部内容
+
+        先请求第1页获取总页数，再并发请求剩余的页，按页码顺序合并各页的docs
+        Args:
+            path_name: API路径，不包含page参数
+            field: 响应data中分页数据的字段名
+        """
+        response = await self.request_api("GET", path_name + "?page=1")
+        page_json = response.json()["data"][field]
+        page_max = int(page_json["pages"])
+
+        responses = await asyncio.gather(*[self.request_api("GET", path_name + "?page=" + str(page_cnt))
+                                           for page_cnt in range(2, page_max + 1)])
+
+        docs = list(page_json["docs"])
+        for response in responses:
+            docs = docs + response.json()["data"][field]["docs"]
+        return docs
+
+    async def get_comic_chapter(self, cid):
+        path_name = "comics/" + cid + "/eps"
+        self.context.chapter = await self.get_all_pages(path_name, "eps")
+        self.context.chapter.reverse()
+        self.context.chapter.insert(0, {"order": "0", "title": "占位用的，使 chapter order 和列表 index 对齐，方便定位"})
+
+    async def get_comic_chapter_pages(self, cid, chapter_id):
+        path_name = "comics/" + cid + "/order/" + str(chapter_id) + "/pages"
+        self.context.chapter[chapter_id]["pages"] = await self.get_all_pages(path_name, "pages")
+
+    async def get_comic_view_and_chapter(self, cid):
+        """获取漫画信息和章节列表"""
+        await asyncio.gather(self.get_comic_view_info(cid), self.get_comic_chapter(cid))
+
+    def select_chapters(self, chapter_id_list) -> List[dict]:
+        """从章节列表中选出指定章节，未指定时选出全部章节"""
         if not chapter_id_list:
             chapter_id_list = range(1, len(self.context.chapter))
 
+        chapters = []
         for chapter_id in chapter_id_list:
             chapter = self.context.chapter[int(chapter_id)]
             if int(chapter_id) != chapter["order"]:
                 raise Exception("哔咔章节号无法匹配！")
+            chapters.append(chapter)
+        return chapters
 
-            await self.get_comic_chapter_pages(cid, chapter["order"])
+    async def get_bika_comic_info(self, cid, chapter_id_list) -> BikaComicInfo:
+        await self.get_comic_view_and_chapter(cid)
+        chapters = self.select_chapters(chapter_id_list)
+
+        # 各章节的图片列表并发请求，总并发数由 API_CONCURRENCY 限制
+        await asyncio.gather(*[self.get_comic_chapter_pages(cid, chapter["order"]) for chapter in chapters])
 
         return self.context
 
 
-@FetcherRegistry.register("bika")
+@FetcherRegistry.register("bika", url_patterns=[r"(?:manhuabika|picacomic)\.com/"])
 class BikaFetcher(ComicFetcher):
     site_dir = os.path.join(DATA_DIR, "bika")
 
@@ -195,55 +223,89 @@ class BikaFetcher(ComicFetcher):
 
         return image_urls
 
-    async def _fetch_info(self, url, **kwargs) -> ComicInfo:
-        chapter_id_list = kwargs.get("chapter_id_list", None)
+    def _parse_resource_id(self, url) -> str:
+        return os.path.basename(urlparse(url).path)
 
-        view_url_parse = urlparse(url)
-        cid = os.path.basename(view_url_parse.path)
-        logger.debug(f"cid: {cid}")
+    @staticmethod
+    def _make_comic_info(url, cid, bika_context: BikaComicInfo) -> ComicInfo:
         comic_info = ComicInfo()
         comic_info.view_url = url
         comic_info.cid = cid
-
-        bika_client = BikaClient()
-        bika_context = await bika_client.get_bika_comic_info(cid, chapter_id_list)
-
         comic_info.title = bika_context.title
         comic_info.author = bika_context.author
         comic_info.genres = bika_context.genres
+        comic_info.cover_url = bika_context.cover
+        return comic_info
+
+    def _make_chapter_info(self, bika_context: BikaComicInfo, bika_chapter: dict, comic_info: ComicInfo) -> ChapterInfo:
+        chapter_info = ChapterInfo()
+        chapter_info.title = bika_chapter["title"]
+        chapter_info.id = bika_chapter["order"]
+
+        chapter_info.metadata.series = bika_context.title
+        chapter_info.metadata.title = bika_chapter["title"]
+        chapter_info.metadata.number = bika_chapter["order"]
+        chapter_info.metadata.creator = bika_context.author
+        chapter_info.metadata.subjects = bika_context.genres
+
+        date_match = re.search(r"^(\d+)-(\d+)-(\d+)", bika_chapter["updated_at"])
+        chapter_info.metadata.year = date_match.group(1)
+        chapter_info.metadata.month = date_match.group(2)
+        chapter_info.metadata.day = date_match.group(3)
+        chapter_info.comic_info = comic_info
+
+        if "英語 ENG" in bika_context.genres:
+            chapter_info.metadata.language = "en"
+        elif "生肉" in bika_context.genres:
+            chapter_info.metadata.language = "ja"
+        else:
+            chapter_info.metadata.language = "zh"
+        chapter_info.metadata.description = bika_context.description
+
+        chapter_info.image_urls = self._get_image_urls(bika_context, chapter_info)
+        return chapter_info
+
+    async def _fetch_info(self, url, **kwargs) -> ComicInfo:
+        chapter_id_list = kwargs.get("chapter_id_list", None)
+
+        cid = self._parse_resource_id(url)
+        logger.debug(f"cid: {cid}")
+
+        bika_client = BikaClient()
+        bika_context = await bika_client.get_bika_comic_info(cid, chapter_id_list)
+        comic_info = self._make_comic_info(url, cid, bika_context)
 
         for bika_chapter in bika_context.chapter:
             if "pages" not in bika_chapter:
                 logger.debug(f"无章节图片，跳过")
                 continue
 
-            chapter_info = ChapterInfo()
-            chapter_info.title = bika_chapter["title"]
-            chapter_info.id = bika_chapter["order"]
-
-            chapter_info.metadata.series = bika_context.title
-            chapter_info.metadata.title = bika_chapter["title"]
-            chapter_info.metadata.number = bika_chapter["order"]
-            chapter_info.metadata.creator = bika_context.author
-            chapter_info.metadata.subjects = bika_context.genres
-
-            date_match = re.search(r"^(\d+)-(\d+)-(\d+)", bika_chapter["updated_at"])
-            chapter_info.metadata.year = date_match.group(1)
-            chapter_info.metadata.month = date_match.group(2)
-            chapter_info.metadata.day = date_match.group(3)
-            chapter_info.comic_info = comic_info
-
-            if "英語 ENG" in bika_context.genres:
-                chapter_info.metadata.language = "en"
-            elif "生肉" in bika_context.genres:
-                chapter_info.metadata.language = "ja"
-            else:
-                chapter_info.metadata.language = "zh"
-            chapter_info.metadata.description = bika_context.description
+            comic_info.chapter_list.append(self._make_chapter_info(bika_context, bika_chapter, comic_info))
 
-            chapter_info.image_urls = self._get_image_urls(bika_context, chapter_info)
+        return comic_info
 
-            comic_info.chapter_list.append(chapter_info)
-            comic_info.cover_url = bika_context.cover
+    async def _fetch_info_iter(self, url, **kwargs) -> AsyncIterator[ChapterInfo]:
+        chapter_id_list = kwargs.get("chapter_id_list", None)
 
-        return comic_info
+        cid = self._parse_resource_id(url)
+        logger.debug(f"cid: {cid}")
+
+        bika_client = BikaClient()
+        bika_context = bika_client.context
+        await bika_client.get_comic_view_and_chapter(cid)
+        comic_info = self._make_comic_info(url, cid, bika_context)
+
+        # 所有章节的图片列表同时开始请求，按章节顺序等待，前面的章节解析完成后立即产出
+        chapters = bika_client.select_chapters(chapter_id_list)
+        tasks = [asyncio.create_task(bika_client.get_comic_chapter_pages(cid, chapter["order"])) for chapter in chapters]
+        try:
+            for bika_chapter, task in zip(chapters, tasks):
+                await task
+                chapter_info = self._make_chapter_info(bika_context, bika_chapter, comic_info)
+                comic_info.chapter_list.append(chapter_info)
+                yield chapter_info
+        finally:
+            for task in tasks:
+                task.cancel()
+            # 等待取消完成，并获取已失败任务的异常，避免 asyncio 打印 "Task exception was never retrieved"
+            await asyncio.gather(*tasks, return_exceptions=True)
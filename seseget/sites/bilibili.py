@@ -1,12 +1,13 @@
-import copy
-import json
-from bs4 import BeautifulSoup
+import asyncio
+import time
+from typing import List, Tuple
 
 from ..request import downloader
 from ..request.downloadtask import TaskDLProgress
 from ..config.path import DATA_DIR
 from ..metadata.video import *
 from ..request.fetcher import VideoInfo, VideoFetcher, FetcherRegistry, make_source_info_file
+from ..request.info_cache import info_cache
 from ..utils.trace import logger
 from ..request.requests import async_request
 from ..utils.file_utils import *
@@ -18,6 +19,8 @@ class BiliVideoInfo(VideoInfo):
         super().__init__()
         self.video_download_url = ""
         self.audio_download_url = ""
+        self.video_backup_urls: List[str] = []     # 视频流的备用CDN地址
+        self.audio_backup_urls: List[str] = []     # 音频流的备用CDN地址
         self.video_view = ""
         self.video_like = ""
         self.video_coin = ""
@@ -40,7 +43,18 @@ class BiliVideoInfo(VideoInfo):
         logger.info(f"---------------------------------")
 
 
-@FetcherRegistry.register("bilibili")
+# B站API
+VIEW_API = "https://api.bilibili.com/x/web-interface/view"
+TAGS_API = "https://api.bilibili.com/x/tag/archive/tags"
+PLAYURL_API = "https://api.bilibili.com/x/player/playurl"
+# 请求DASH格式的全部清晰度(包括4K、HDR、杜比视界、AV1编码)
+PLAYURL_FNVAL = 4048
+
+# 同时请求B站API的最大数量
+API_CONCURRENCY = 8
+
+
+@FetcherRegistry.register("bilibili", url_patterns=[r"bilibili\.com/video/"])
 class BilibiliFetcher(VideoFetcher[BiliVideoInfo]):
     site_dir = os.path.join(DATA_DIR, "bilibili")
     BILI_HEADERS = {
@@ -48,81 +62,240 @@ class BilibiliFetcher(VideoFetcher[BiliVideoInfo]):
         "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36",
     }
 
-    async def _fetch_info(self, url, **kwargs) -> BiliVideoInfo:
-        vid = ""
-        match = re.search(r'https?://www\.bilibili\.com/video/([^/?]+)', url)
-        if match:
-            vid = match.group(1)
+    def __init__(self, max_tasks=5):
+        super().__init__(max_tasks)
+        self._api_semaphore = asyncio.Semaphore(API_CONCURRENCY)
+
+    @staticmethod
+    def _parse_bvid(url) -> str:
+        match = re.search(r'bilibili\.com/video/([^/?#]+)', url)
+        return match.group(1) if match else ""
 
+    @staticmethod
+    def _parse_page(url) -> int:
+        """url中指定的分P序号，未指定时为第1P"""
+        match = re.search(r'[?&]p=(\d+)', url)
+        return int(match.group(1)) if match else 1
+
+    def _parse_resource_id(self, url) -> str:
+        # 第1P使用BV号作为vid，其余分P在BV号后加上分P序号
+        bvid = self._parse_bvid(url)
+        page = self._parse_page(url)
+        return bvid if not bvid or page == 1 else f"{bvid}_p{page}"
+
+    async def _request_api(self, url, params: dict) -> dict:
+        """请求B站API，返回响应中的data"""
         headers = self.BILI_HEADERS.copy()
+        headers["Referer"] = "https://www.bilibili.com/"
         if config['bilibili']['cookie']:
             headers["Cookie"] = config['bilibili']['cookie']
-        response = await async_request("GET", url, headers=headers)
-        video_soup = BeautifulSoup(response.text, 'html.parser')
-
-        viewbox_report = video_soup.find("div", attrs={"id": "viewbox_report"})
-        view_text = viewbox_report.find("div", attrs={"class": "view-text"})
-        arc_toolbar_report = video_soup.find("div", attrs={"id": "arc_toolbar_report"})
-        video_like_info = arc_toolbar_report.find("span", attrs={"class": "video-like-info"})
-        video_coin_info = arc_toolbar_report.find("span", attrs={"class": "video-coin-info"})
-        video_fav_info = arc_toolbar_report.find("span", attrs={"class": "video-fav-info"})
-        video_share_info = arc_toolbar_report.find("span", attrs={"class": "video-share-info"})
-        v_desc = video_soup.find("div", attrs={"id": "v_desc"})
-
-        video_title = viewbox_report.find("h1").text
-        video_desc_span = v_desc.find("span")
-        video_descript = ""
-        if video_desc_span:
-            video_descript = video_desc_span.text
-        video_author = video_soup.find("meta", attrs={"itemprop": "author"}).attrs["content"]
-        video_cover = "https:" + video_soup.find("meta", attrs={"itemprop": "image"}).attrs["content"].split("@")[0]
-        video_thumbnail = "https:" + video_soup.find("meta", attrs={"itemprop": "thumbnailUrl"}).attrs["content"].split("@")[0]
-        video_date = video_soup.find("meta", attrs={"itemprop": "uploadDate"}).attrs["content"]
-        video_tags_element = video_soup.find_all("div", attrs={"class": "tag not-btn-tag"})
-
-        video_tags = []
-        for e in video_tags_element:
-            video_tags.append(e.text)
-
-        video_view = view_text.text
-        video_like = video_like_info.text
-        video_coin = video_coin_info.text
-        video_fav = video_fav_info.text
-        video_share = video_share_info.text
+
+        async with self._api_semaphore:
+            response = await async_request("GET", url, params=params, headers=headers)
+        if response is None:
+            raise ValueError(f"B站API请求失败! url: {url}, params: {params}")
+
+        resp_json = response.json()
+        if resp_json.get("code") != 0:
+            raise ValueError(f"B站API请求失败! url: {url}, params: {params}, "
+                             f"code: {resp_json.get('code')}, info: {resp_json.get('message')}")
+        return resp_json["data"]
+
+    async def _get_tags(self, bvid) -> List[str]:
+        """获取视频标签，标签不影响下载，获取失败时返回空列表"""
+        try:
+            data = await self._request_api(TAGS_API, {"bvid": bvid})
+        except Exception as e:
+            logger.warning(f"获取视频标签失败(bvid-{bvid}), info: {e}")
+            return []
+        return [tag["tag_name"] for tag in data or []]
+
+    async def _get_download_urls(self, bvid, cid) -> Tuple[List[str], List[str]]:
+        """获取分P的视频流和音频流下载地址，每个流返回主地址和备用CDN地址的列表，第一个为主地址"""
+        data = await self._request_api(PLAYURL_API, {"bvid": bvid, "cid": cid, "fnval": PLAYURL_FNVAL, "fourk": 1})
+
+        def stream_urls(stream: dict) -> List[str]:
+            backup_urls = stream.get('backupUrl') or stream.get('backup_url') or []
+            return list(dict.fromkeys([stream['baseUrl'], *backup_urls]))
+
+        return stream_urls(data['dash']['video'][0]), stream_urls(data['dash']['audio'][0])
+
+    @staticmethod
+    def _set_download_urls(video_info: BiliVideoInfo, urls: Tuple[List[str], List[str]]):
+        video_urls, audio_urls = urls
+        video_info.video_download_url, *video_info.video_backup_urls = video_urls
+        video_info.audio_download_url, *video_info.audio_backup_urls = audio_urls
+
+    @staticmethod
+    def _make_video_info(arc: dict, page: dict, page_count: int, tags: List[str]) -> BiliVideoInfo:
+        """
+        由API数据生成视频信息
+        Args:
+            arc: 稿件信息，视频信息API返回的data或合集中视频的arc
+            page: 分P信息
+            page_count: 稿件的分P数
+            tags: 视频标签
+        """
+        bvid = arc["bvid"]
+        page_no = page["page"]
+        stat = arc["stat"]
+        video_title = arc["title"]
+        video_author = (arc.get("owner") or arc.get("author"))["name"]
+        video_date = time.strftime("%Y-%m-%d", time.localtime(arc["pubdate"]))
+        video_cover = arc["pic"].replace("http://", "https://")
+
+        name = video_title
+        view_url = f"https://www.bilibili.com/video/{bvid}/"
+        if page_count > 1:
+            name = f"{video_title}_P{page_no}_{page['part']}"
+            view_url = view_url + f"?p={page_no}"
 
         metadata = VideoMetaData()
-        metadata.title = video_title
-        metadata.sub_title = video_title
-        metadata.describe = video_descript
-        metadata.public_time = video_date[0:10]
+        metadata.title = name
+        metadata.sub_title = name
+        metadata.describe = arc.get("desc", "")
+        metadata.public_time = video_date
         metadata.year = video_date[0:4]
         metadata.author = video_author
         metadata.series = video_author
-        metadata.tag_list = video_tags.copy()
-
-        info = re.findall('window.__playinfo__=(.*?)</script>', response.text)[0]
-        json_data = json.loads(info)
-
-        video_download_url = json_data['data']['dash']['video'][0]['baseUrl']
-        audio_download_url = json_data['data']['dash']['audio'][0]['baseUrl']
+        metadata.tag_list = tags.copy()
 
         video_info = BiliVideoInfo()
 
-        video_info.vid = vid
-        video_info.name = video_title
-        video_info.view_url = url
+        video_info.vid = bvid if page_no == 1 else f"{bvid}_p{page_no}"
+        video_info.name = name
+        video_info.view_url = view_url
         video_info.cover_url = video_cover
-        video_info.thumbnail_url = video_thumbnail
+        video_info.thumbnail_url = video_cover
         video_info.metadata = metadata
-        video_info.video_download_url = video_download_url
-        video_info.audio_download_url = audio_download_url
-        video_info.video_view = video_view
-        video_info.video_like = video_like
-        video_info.video_coin = video_coin
-        video_info.video_fav = video_fav
-        video_info.video_share = video_share
+        video_info.video_view = str(stat.get("view", ""))
+        video_info.video_like = str(stat.get("like", ""))
+        video_info.video_coin = str(stat.get("coin", ""))
+        video_info.video_fav = str(stat.get("favorite", stat.get("fav", "")))
+        video_info.video_share = str(stat.get("share", ""))
+
+        return video_info
+
+    async def _fetch_info(self, url, **kwargs) -> BiliVideoInfo:
+        bvid = self._parse_bvid(url)
+        page_no = self._parse_page(url)
+
+        view, tags = await asyncio.gather(self._request_api(VIEW_API, {"bvid": bvid}), self._get_tags(bvid))
+        page = next((p for p in view["pages"] if p["page"] == page_no), None)
+        if page is None:
+            raise ValueError(f"视频(bvid-{bvid})不存在第{page_no}P")
+
+        video_info = self._make_video_info(view, page, len(view["pages"]), tags)
+        self._set_download_urls(video_info, await self._get_download_urls(bvid, page["cid"]))
+        return video_info
+
+    async def _fetch_info_list(self, url) -> List[BiliVideoInfo]:
+        """
+        批量获取视频信息
+
+        视频信息API的一次响应中已包含稿件的全部分P和所属合集的全部视频，
+        根据配置展开全部分P(all_parts)和合集(all_collection)后，再并发获取各视频的标签和下载地址
+        """
+        bvid = self._parse_bvid(url)
+        view = await self._request_api(VIEW_API, {"bvid": bvid})
+
+        # 当前稿件的分P
+        if config["bilibili"]["all_parts"]:
+            pages = view["pages"]
+        else:
+            pages = [p for p in view["pages"] if p["page"] == self._parse_page(url)]
+        own_entries = [(view, page, len(view["pages"])) for page in pages]
+
+        # (稿件信息, 分P信息, 稿件分P数)，合集中的其它稿件只下载第1P
+        entries = []
+        season = view.get("ugc_season")
+        if config["bilibili"]["all_collection"] and season:
+            logger.info(f"视频属于合集[{season['title']}]")
+            for section in season["sections"]:
+                for episode in section["episodes"]:
+                    if episode["bvid"] == bvid:
+                        entries.extend(own_entries)
+                    else:
+                        arc = {**episode["arc"], "bvid": episode["bvid"]}
+                        entries.append((arc, episode["page"], int(episode["arc"].get("videos", 1))))
+        else:
+            entries = own_entries
+
+        bvid_list = list(dict.fromkeys(arc["bvid"] for arc, _, _ in entries))
+        tags_list, urls_list = await asyncio.gather(
+            asyncio.gather(*[self._get_tags(b) for b in bvid_list]),
+            asyncio.gather(*[self._get_download_urls(arc["bvid"], page["cid"]) for arc, page, _ in entries]))
+        tags_dict = dict(zip(bvid_list, tags_list))
+
+        video_info_list = []
+        for (arc, page, page_count), urls in zip(entries, urls_list):
+            video_info = self._make_video_info(arc, page, page_count, tags_dict[arc["bvid"]])
+            self._set_download_urls(video_info, urls)
+            video_info_list.append(video_info)
+        return video_info_list
+
+    async def info_list(self, url, **kwargs) -> List[BiliVideoInfo]:
+        """
+        批量获取视频信息，优先使用资源信息缓存
+        Args:
+            url: 视频页面url
+            **kwargs: 支持 refresh、no_cache，同 info
+
+        展开的视频列表与分P(all_parts)和合集(all_collection)配置有关，整个列表以配置作为参数缓存；
+        同时各视频信息按各自的vid写入缓存，之后单独获取其中的视频时可以直接命中
+        """
+        use_cache = info_cache.enabled and not kwargs.get("no_cache", False)
+        key = f"{self._info_cache_key(url)}:list"
+        params = {"all_parts": bool(config["bilibili"]["all_parts"]),
+                  "all_collection": bool(config["bilibili"]["all_collection"])}
+
+        if use_cache and not kwargs.get("refresh", False):
+            entry = info_cache.get(key, self.info_cache_ttl)
+            if entry is not None and entry["params"] == params:
+                logger.info(f"匹配到缓存中的资源信息({key})")
+                return entry["info"]
+
+        video_info_list = await self._fetch_info_list(url)
+
+        if use_cache:
+            info_cache.put(key, {"info": video_info_list, "params": params})
+            for video_info in video_info_list:
+                info_cache.put(f"{self.site_name}:{video_info.vid}",
+                               {"info": video_info, "params": self._info_cache_params()})
+
+        return video_info_list
+
+    async def _download(self, url, **kwargs):
+        if not config["bilibili"]["all_parts"] and not config["bilibili"]["all_collection"]:
+            return await super()._download(url, **kwargs)
+
+        default_params = {
+            "no_download": False,
+            "force": False,     # True: 忽略媒体库记录，重新下载
+            "refresh": False,   # True: 忽略资源信息缓存，重新获取资源信息
+        }
+        params = {**default_params, **kwargs}
+        await self.task_semaphore.acquire()
+        try:
+            logger.info(f"开始请求资源信息")
+            video_info_list = await self.info_list(url, refresh=params["refresh"])
+
+            logger.info(f"获取到{len(video_info_list)}个视频")
+            for video_info in video_info_list:
+                video_info.print_info()
+
+            if not params["no_download"] and not params["force"]:
+                video_info_list = [v for v in video_info_list if not self._is_downloaded(v.vid)]
+            video_info_list = [v for v in video_info_list if not self._has_active_task(v)]
+            if params["no_download"] or not video_info_list:
+                self.task_semaphore.release()
+                return
 
-        return copy.deepcopy(video_info)
+            await self._start_download_tasks(video_info_list)
+        except Exception:
+            # 下载任务创建前出错，任务不会释放并发数
+            self.task_semaphore.release()
+            raise
 
     async def _download_process(self, video_info: BiliVideoInfo, progress: TaskDLProgress = None):
         video_path = video_info.video_dir + '/' + make_filename_valid('%s.mp4' % video_info.name)
@@ -132,10 +305,12 @@ class BilibiliFetcher(VideoFetcher[BiliVideoInfo]):
         if config['bilibili']['cookie']:
             headers["Cookie"] = config['bilibili']['cookie']
 
-        await downloader.download_mp4_by_merge_video_audio(
+        # 主地址和备用CDN地址一起下载，竞速选择最快的地址，下载中断时换用其它地址续传
+        # 缓存中旧版本的视频信息没有备用地址
+        return await downloader.download_mp4_by_merge_video_audio(
             video_path,
-            video_info.audio_download_url,
-            video_info.video_download_url,
+            [video_info.audio_download_url, *getattr(video_info, "audio_backup_urls", [])],
+            [video_info.video_download_url, *getattr(video_info, "video_backup_urls", [])],
             headers,
             progress)
 
@@ -1,6 +1,5 @@
-import copy
 import re
-from bs4 import BeautifulSoup, element
+from bs4 import SoupStrainer, element
 from urllib.parse import urlparse, parse_qs
 
 from ..request import downloader
@@ -10,6 +9,8 @@ from ..request.fetcher import VideoInfo, VideoFetcher, FetcherRegistry
 from ..request.requests import async_request, session_manager
 from ..utils.trace import logger
 from ..utils.file_utils import *
+from ..utils.html_utils import node_string, parse_html, MultiStrainer, has_class
+from ..utils.parse_executor import run_parse
 from ..config.config_manager import config
 
 
@@ -38,7 +39,21 @@ HANIME_HEADERS = {
 }
 
 
-@FetcherRegistry.register("hanime")
+# 视频页面中需要读取的节点，局部解析时只保留这些节点的子树
+VIDEO_PAGE_STRAINER = MultiStrainer(
+    SoupStrainer("video"),
+    SoupStrainer("h3", id="shareBtn-title"),
+    SoupStrainer("div", style="margin-bottom: 5px"),    # 副标题，发布日期
+    SoupStrainer("div", class_=has_class("video-caption-text")),
+    SoupStrainer("a", id="video-artist-name"),
+    SoupStrainer("div", class_=has_class("video-playlist-top")),
+    SoupStrainer("div", class_=has_class("single-video-tag")),
+    SoupStrainer("div", id="playlist-scroll"),
+    SoupStrainer("a", class_=has_class("hidden-sm")),   # 分类
+)
+
+
+@FetcherRegistry.register("hanime", url_patterns=[r"hanime1\.[\w.]+/watch\?v="])
 class HanimeFetcher(VideoFetcher):
     site_dir = os.path.join(DATA_DIR, "hanime")
 
@@ -46,14 +61,14 @@ class HanimeFetcher(VideoFetcher):
     def get_metadata(soup):
         metadata = VideoMetaData()
 
-        metadata.title = soup.find('h3', attrs={'id': 'shareBtn-title'}).string
-        metadata.sub_title = soup.find_all('div', attrs={'style': 'margin-bottom: 5px'})[1].string
+        metadata.title = node_string(soup.find('h3', attrs={'id': 'shareBtn-title'}))
+        metadata.sub_title = node_string(soup.find_all('div', attrs={'style': 'margin-bottom: 5px'})[1])
         metadata.describe = soup.find('div', attrs={'class': 'video-caption-text caption-ellipsis',
                                                     'style': 'color: #b8babc; font-weight: normal;'}).get_text()
-        metadata.author = soup.find('a', attrs={'id': "video-artist-name"}).string
+        metadata.author = node_string(soup.find('a', attrs={'id': "video-artist-name"}))
         metadata.author = metadata.author.replace('\n', '')
         metadata.author = metadata.author.replace(' ', '')
-        metadata.series = (soup.find('div', attrs={'class': 'video-playlist-top'})).find('h4').string
+        metadata.series = node_string(soup.find('div', attrs={'class': 'video-playlist-top'}).find('h4'))
 
         tags_element_list = soup.find_all('div', attrs={'class': "single-video-tag",
                                                         'style': "margin-bottom: 18px; font-weight: normal"})
@@ -62,7 +77,7 @@ class HanimeFetcher(VideoFetcher):
             metadata.tag_list.append(t.contents[0]["href"][t.contents[0]["href"].find("=") + 1:])
         metadata.public_time = re.search(
             r"\d{4}-\d{2}-\d{2}",
-            soup.find('div', attrs={'class': 'hidden-xs', 'style': 'margin-bottom: 5px'}).string).group()
+            node_string(soup.find('div', attrs={'class': 'hidden-xs', 'style': 'margin-bottom: 5px'}))).group()
 
         metadata.year = metadata.public_time[:4]
 
@@ -84,7 +99,7 @@ class HanimeFetcher(VideoFetcher):
                     video_url = video_url_element.attrs["href"]
                     vid = parse_qs(urlparse(video_url).query)["v"][0]
                     video_thumb_url = video_thumb_url_element.attrs["src"]
-                    video_title = video_title_element.string
+                    video_title = node_string(video_title_element)
                     series.append({"vid": vid, "title": video_title, "url": video_url, "thumbnail": video_thumb_url})
 
         return series
@@ -121,21 +136,13 @@ class HanimeFetcher(VideoFetcher):
 
         logger.info('\n下载完成!')
 
-    async def _fetch_info(self, url, **kwargs) -> VideoInfo:
-        view_url_parse = urlparse(url)
-        vid = parse_qs(view_url_parse.query)["v"][0]
-
-        video_info = self.video_info_cache.get_video_info(vid)
-        if video_info is not None:
-            logger.info("匹配到缓存中的视频信息(vid-%s)" % vid)
-            return copy.deepcopy(video_info)
+    def _parse_resource_id(self, url) -> str:
+        return parse_qs(urlparse(url).query).get("v", [""])[0]
 
-        req_kwargs = {}
-        if config["hanime"]["cookie"]:
-            req_kwargs["headers"] = HANIME_HEADERS.copy()
-            req_kwargs["headers"]["cookie"] = config["hanime"]["cookie"]
-        response = await async_request("GET", url, **req_kwargs)
-        video_soup = BeautifulSoup(response.text, 'html.parser')
+    @staticmethod
+    def _parse_video_page(text: str):
+        """解析视频页面，返回 (缩略图url, 下载url, 元数据, 系列信息, 分类)"""
+        video_soup = parse_html(text, VIDEO_PAGE_STRAINER)
 
         video_elem = video_soup.find('video')
         video_thumbnail_url = video_elem.get("poster")
@@ -147,14 +154,37 @@ class HanimeFetcher(VideoFetcher):
 
         video_download_url = video_source.get("src")
 
-        metadata = self.get_metadata(video_soup)
-        series_info = self.get_series_info(video_soup)
+        metadata = HanimeFetcher.get_metadata(video_soup)
+        series_info = HanimeFetcher.get_series_info(video_soup)
 
-        cover_url = None
-        search_genre = video_soup.find('a', attrs={'class': "hidden-sm hidden-md hidden-lg hidden-xl"}).string
+        search_genre = node_string(video_soup.find('a', attrs={'class': "hidden-sm hidden-md hidden-lg hidden-xl"}))
         search_genre = search_genre.replace('\n', '')
         search_genre = search_genre.replace(' ', '')
 
+        return video_thumbnail_url, video_download_url, metadata, series_info, search_genre
+
+    @staticmethod
+    def _parse_search_cover(text: str, url: str):
+        """从搜索结果页面中解析视频封面url，未找到时返回None"""
+        search_soup = parse_html(text, SoupStrainer("a", href=url))
+
+        cover_element = (search_soup.find('a', href=url)).find('img', src=re.compile('cover'))
+        if cover_element:
+            return cover_element.attrs['src']
+        return None
+
+    async def _fetch_info(self, url, **kwargs) -> VideoInfo:
+        vid = self._parse_resource_id(url)
+
+        req_kwargs = {}
+        if config["hanime"]["cookie"]:
+            req_kwargs["headers"] = HANIME_HEADERS.copy()
+            req_kwargs["headers"]["cookie"] = config["hanime"]["cookie"]
+        response = await async_request("GET", url, **req_kwargs)
+        video_thumbnail_url, video_download_url, metadata, series_info, search_genre = \
+            await run_parse(HanimeFetcher._parse_video_page, response.text)
+
+        cover_url = None
         genres_simp = ["里番", "泡面番"]
         genres_trad = ["裏番", "泡麵番"]
         if search_genre in genres_simp + genres_trad:
@@ -167,11 +197,7 @@ class HanimeFetcher(VideoFetcher):
                 req_kwargs["headers"]["cookie"] = config["hanime"]["cookie"]
             response = await async_request("GET", search_url, params={'query': metadata.title}, **req_kwargs)
 
-            search_soup = BeautifulSoup(response.text, 'html.parser')
-
-            cover_element = (search_soup.find('a', href=url)).find('img', src=re.compile('cover'))
-            if cover_element:
-                cover_url = cover_element.attrs['src']
+            cover_url = await run_parse(HanimeFetcher._parse_search_cover, response.text, url)
 
         if cover_url is None:
             cover_url = video_thumbnail_url
@@ -187,6 +213,4 @@ class HanimeFetcher(VideoFetcher):
         video_info.metadata = metadata
         video_info.series_info = series_info
 
-        await self.video_info_cache.update_cache(vid, video_info)
-
-        return copy.deepcopy(video_info)
+        return video_info
@@ -1,21 +1,31 @@
 import asyncio
+import atexit
 import json
+import math
 import os
 import re
+import shutil
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait, FIRST_COMPLETED
 from typing import Dict, List
+from urllib.parse import urlsplit
 import jmcomic
-import requests as sync_requests
-from bs4 import BeautifulSoup
-from common import Postman
-from jmcomic import JmOption, JmDownloader, DirRule, JmHtmlClient, JmApiClient, catch_exception, JmImageDetail, jm_log
+from bs4 import SoupStrainer
+from PIL import Image
+from jmcomic import JmOption, JmHtmlClient, JmApiClient, JmImageDetail, jm_log, \
+    JmcomicException, fix_windir_name, JmPhotoDetail, JmImageTool, JmModuleConfig, JmcomicText, MissingAlbumPhotoException
 
 from ..request.fetcher import ChapterInfo, ComicInfo, FetcherRegistry, ComicFetcher
 from ..metadata.comic.doc import make_comic
-from ..config.path import DATA_DIR
+from ..config.path import DATA_DIR, JM_DOMAIN_HEALTH_PATH
 from ..utils.file_utils import *
 from ..utils.trace import logger, SSGLogger
+from ..utils.html_utils import node_string, parse_html, MultiStrainer, has_class
+from ..utils.thread_utils import run_in_thread_pool, EXTRACT, DISK
 from ..config.config_manager import config
 from ..request.downloadtask import TaskDLProgress, FileDLProgress
+from ..request import downloader
 
 
 class JMChapterInfo(ChapterInfo):
@@ -30,179 +40,191 @@ class JMComicInfo(ComicInfo):
         self.chapter_list: list[JMChapterInfo] = []
 
 
-class SSGJmStreamResponse:
-    """包装JM请求的响应体，内部使用Stream方式读取响应并更新进度，且支持非Stream的调用属性"""
-
-    def __init__(self, response):
-        self._response = response
-        self._content = b""
-        self._text = None
-        self._json = None
-        self._encoding = response.encoding
-
-    def iter_content(self, chunk_size=1024):
-        for chunk in self._response.iter_content(chunk_size=chunk_size):
-            if chunk:
-                self._content += chunk
-                yield chunk
-
-    @property
-    def content(self):
-        return self._content
-
-    @property
-    def text(self):
-        self._text = self._content.decode(
-            self._encoding or 'utf-8',
-            errors='replace'
-        )
-        return self._text
-
-    def json(self, **kwargs):
-        if self._json is None:
-            try:
-                self._json = json.loads(self.text, **kwargs)
-            except json.JSONDecodeError:
-                try:
-                    self._json = json.loads(self._content.decode('utf-8', errors='replace'), **kwargs)
-                except json.JSONDecodeError as e:
-                    raise sync_requests.exceptions.JSONDecodeError(
-                        f"Failed to parse JSON: {e}",
-                        doc=self.text
-                    )
-        return self._json
-
-    def __getattr__(self, name):
-        return getattr(self._response, name)
-
-
-class SSGJmClient(JmApiClient):
-    """自定义 JM Client, 继承JmApiClient, 增加了下载进度功能"""
-    client_key = 'ssg_jm_client'
-
-    def __init__(self, postman: Postman, domain_list: List[str], **kwargs):
-        super().__init__(postman, domain_list)
-        self.progress: TaskDLProgress | None = None
-
-    def set_progress(self, progress: TaskDLProgress):
-        self.progress = progress
-
-    def request_with_retry(self,
-                           request,
-                           url,
-                           domain_index=0,
-                           retry_count=0,
-                           callback=None,
-                           **kwargs,
-                           ):
-        """
-        支持重试和切换域名的机制
-        """
-        if domain_index >= len(self.domain_list):
-            return self.fallback(request, url, domain_index, retry_count, **kwargs)
+class JmDomainHealth:
+    """JM域名健康度记录
 
-        url_backup = url
+    记录每个域名请求耗时和失败率的指数加权移动平均值(EWMA)，作为 jmcomic client 的 domain_retry_strategy 使用，
+    请求时按评分从优到劣依次尝试域名，代替按 domain_list 顺序且每个域名重试多次的默认策略。
 
-        if url.startswith('/'):
-            domain = self.domain_list[domain_index]
-            url = self.of_api_url(url, domain)
+    评分数据保存在文件中，下次运行时沿用，失败率随时间衰减，失败过的域名之后仍有机会被重新使用。
 
-            self.update_request_with_specify_domain(kwargs, domain)
+    配置了对冲请求延迟(jmcomic.domain.hedge_delay)时，请求耗时超过该值后同时向次优域名发起请求，使用先成功返回的结果。
+    """
 
-            jm_log(self.log_topic(), self.decode(url))
-        else:
-            self.update_request_with_specify_domain(kwargs, None, True)
-
-        if domain_index != 0 or retry_count != 0:
-            jm_log(f'req.retry',
-                   ', '.join([
-                       f'次数: [{retry_count}/{self.retry_times}]',
-                       f'域名: [{domain_index} of {self.domain_list}]',
-                       f'路径: [{url}]',
-                       f'参数: [{kwargs if "login" not in url else "#login_form#"}]'
-                   ])
-                   )
-
-        try:
-            resp = None
-            if self.progress is None:
-                resp = request(url, **kwargs)
-            else:
-                resp = request(url, **kwargs)
-                self.progress.set_total(url, len(resp.content))
-                self.progress.update(url, len(resp.content))
+    ALPHA = 0.3     # EWMA平滑系数，越大越偏向最近的请求
+    DEFAULT_RTT = 1.0   # 没有记录的域名的默认耗时(s)
+    FAILURE_PENALTY = 10.0  # 失败率为1时附加的评分耗时(s)
+    FAILURE_HALF_LIFE = 24 * 3600   # 失败率衰减一半的时间(s)
+    SAVE_INTERVAL = 30  # 评分数据保存间隔(s)
 
-            if callback is not None:
-                resp = callback(resp)
-
-            resp = self.raise_if_resp_should_retry(resp)
-
-            return resp
-        except Exception as e:
-            if self.retry_times == 0:
-                raise e
-
-            self.before_retry(e, kwargs, retry_count, url)
-
-        if retry_count < self.retry_times:
-            return self.request_with_retry(request, url_backup, domain_index, retry_count + 1, callback, **kwargs)
-        else:
-            return self.request_with_retry(request, url_backup, domain_index + 1, 0, callback, **kwargs)
+    def __init__(self, path: str):
+        self._path = path
+        self._lock = threading.Lock()
+        self._stats: dict[str, dict] | None = None     # 域名 -> {"rtt": 耗时, "fail": 失败率, "updated_at": 更新时间}
+        self._last_save = 0.0
+        self._hedge_pool: ThreadPoolExecutor | None = None
 
-
-class SSGJmDownloader(JmDownloader):
-    """继承JmDownloader类，加入漫画下载过程追踪和处理功能"""
-
-    def __init__(self, option: JmOption, progress: TaskDLProgress):
-        super().__init__(option)
-        self.client: SSGJmClient = option.new_jm_client(impl=SSGJmClient)
-        self.progress: TaskDLProgress = progress
+    def _get_stats(self) -> dict[str, dict]:
+        if self._stats is None:
+            self._stats = {}
+            if os.path.exists(self._path):
+                try:
+                    with open(self._path, "r", encoding="utf-8") as f:
+                        self._stats = json.load(f)
+                except (OSError, json.JSONDecodeError) as e:
+                    logger.warning(f"读取JM域名评分数据失败, info: {e}")
+            atexit.register(self.close)
+        return self._stats
+
+    def save(self):
+        """保存评分数据"""
+        with self._lock:
+            if self._stats is None:
+                return
+            data = json.dumps(self._stats, indent=2)
+            self._last_save = time.time()
+
+        temp_path = f"{self._path}.tmp"
         try:
-            self.client.set_progress(self.progress)
-        except Exception as e:
-            logger.warning(f"Client注入progress失败！info: {e}")
-            raise e
-
-    @catch_exception
-    def download_by_image_detail(self, image: JmImageDetail):
-        img_save_path = self.option.decide_image_filepath(image)
-
-        image.save_path = img_save_path
-        image.exists = jmcomic.file_exists(img_save_path)
-
-        self.before_image(image, img_save_path)
-
-        if image.skip:
-            self.after_image(image, img_save_path)
-            return
-
-        use_cache = self.option.decide_download_cache(image)
-        decode_image = self.option.decide_download_image_decode(image)
-
-        if use_cache is True and image.exists:
-            self.after_image(image, img_save_path)
+            with open(temp_path, "w", encoding="utf-8") as f:
+                f.write(data)
+            os.replace(temp_path, self._path)
+        except OSError as e:
+            logger.warning(f"保存JM域名评分数据失败, info: {e}")
+
+    def close(self):
+        """退出时关闭对冲请求线程池，不等待后台未完成的请求，并保存评分数据"""
+        with self._lock:
+            hedge_pool, self._hedge_pool = self._hedge_pool, None
+        if hedge_pool is not None:
+            hedge_pool.shutdown(wait=False, cancel_futures=True)
+        self.save()
+
+    def score(self, domain: str) -> float:
+        """域名评分，为预估的请求耗时(s)，越小越优"""
+        with self._lock:
+            stat = self._get_stats().get(domain)
+        if stat is None:
+            return self.DEFAULT_RTT
+
+        decay = 0.5 ** ((time.time() - stat["updated_at"]) / self.FAILURE_HALF_LIFE)
+        return stat["rtt"] + stat["fail"] * decay * self.FAILURE_PENALTY
+
+    def rank(self, domain_list: List[str]) -> List[str]:
+        """按评分从优到劣排序域名，评分相同时保持原顺序"""
+        return sorted(domain_list, key=self.score)
+
+    def record(self, domain: str, rtt: float | None):
+        """
+        记录一次请求结果
+        Args:
+            domain: 域名
+            rtt: 请求耗时(s)，为None时表示请求失败
+        """
+        now = time.time()
+        with self._lock:
+            stats = self._get_stats()
+            stat = stats.get(domain)
+            if stat is None:
+                stat = {"rtt": rtt if rtt is not None else self.DEFAULT_RTT, "fail": 0.0, "updated_at": now}
+                stats[domain] = stat
+
+            # 先按时间衰减失败率，再计入本次结果
+            decay = 0.5 ** ((now - stat["updated_at"]) / self.FAILURE_HALF_LIFE)
+            stat["fail"] = (1 - self.ALPHA) * stat["fail"] * decay + self.ALPHA * (0.0 if rtt is not None else 1.0)
+            if rtt is not None:
+                stat["rtt"] = (1 - self.ALPHA) * stat["rtt"] + self.ALPHA * rtt
+            stat["updated_at"] = now
+            need_save = now - self._last_save > self.SAVE_INTERVAL
+
+        if need_save:
+            self.save()
+
+    def _get_hedge_pool(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._hedge_pool is None:
+                self._hedge_pool = ThreadPoolExecutor(thread_name_prefix="JmHedge")
+            return self._hedge_pool
+
+    def _request_domain(self, client, request, path: str, domain: str, is_image: bool, kwargs: dict):
+        """向指定域名发起一次请求，并记录结果"""
+        # 各域名的请求使用独立的参数，避免并发的对冲请求互相修改headers
+        kwargs = dict(kwargs)
+        if kwargs.get("headers") is not None:
+            kwargs["headers"] = dict(kwargs["headers"])
+
+        url = client.of_api_url(path, domain)
+        client.update_request_with_specify_domain(kwargs, domain, is_image)
+        jm_log(client.log_topic(), client.decode(url))
+
+        start = time.monotonic()
+        try:
+            resp = request(url, **kwargs)
+            resp = client.raise_if_resp_should_retry(resp, is_image)
+        except Exception:
+            self.record(domain, None)
+            raise
+
+        self.record(domain, time.monotonic() - start)
+        return resp
+
+    def _request_ranked(self, client, request, path: str, is_image: bool, kwargs: dict):
+        """按评分依次向各个域名发起请求，全部失败时抛出最后一个异常"""
+        hedge_delay = float(config["jmcomic"]["domain"]["hedge_delay"] or 0)
+        pending = self.rank(client.domain_list)
+        last_error = None
+
+        while pending:
+            domain = pending.pop(0)
+            if hedge_delay <= 0 or not pending:
+                try:
+                    return self._request_domain(client, request, path, domain, is_image, kwargs)
+                except Exception as e:
+                    last_error = e
+                    client.before_retry(e, kwargs, 0, path)
+                    continue
+
+            pool = self._get_hedge_pool()
+            futures = {pool.submit(self._request_domain, client, request, path, domain, is_image, kwargs)}
+            done, _ = wait(futures, timeout=hedge_delay)
+            if not done:
+                hedge_domain = pending.pop(0)
+                jm_log("req.hedge", f"域名[{domain}]请求超过{hedge_delay}s，同时请求域名[{hedge_domain}]")
+                futures.add(pool.submit(self._request_domain, client, request, path, hedge_domain, is_image, kwargs))
+
+            # 使用先成功返回的结果，未完成的请求在后台继续执行，只用于更新域名评分
+            while futures:
+                done, futures = wait(futures, return_when=FIRST_COMPLETED)
+                for future in done:
+                    if future.exception() is None:
+                        return future.result()
+                    last_error = future.exception()
+                    client.before_retry(last_error, kwargs, 0, path)
+
+        raise last_error
+
+    def __call__(self, client, request=None, url=None, is_image=False, **kwargs):
+        # client初始化时以 domain_retry_strategy(client) 方式调用，无需处理
+        if request is None:
             return
 
-        self.client.download_by_image_detail(
-            image,
-            img_save_path,
-            decode_image=decode_image,
-        )
-
-        self.after_image(image, img_save_path)
-
-    def before_photo(self, photo: jmcomic.JmPhotoDetail):
-        if self.progress is not None:
-            self.progress.set_progress_count(len(photo))
+        retry_times = max(client.retry_times, 0)
+        for retry_count in range(retry_times + 1):
+            try:
+                if url.startswith("/"):
+                    return self._request_ranked(client, request, url, is_image, kwargs)
 
-    def after_photo(self, photo: jmcomic.JmPhotoDetail):
-        pass
+                # 图片等完整url，不需要选择域名
+                client.update_request_with_specify_domain(kwargs, None, is_image)
+                return client.raise_if_resp_should_retry(request(url, **kwargs), is_image)
+            except Exception as e:
+                if retry_count >= retry_times:
+                    raise
+                client.before_retry(e, kwargs, retry_count, url)
 
-    def before_image(self, image: jmcomic.JmImageDetail, img_save_path):
-        self.progress.add_progress(image.img_url)
 
-    def after_image(self, image: jmcomic.JmImageDetail, img_save_path):
-        pass
+# 全局JM域名健康度记录
+jm_domain_health = JmDomainHealth(JM_DOMAIN_HEALTH_PATH)
 
 
 class SSGJmOption(JmOption):
@@ -218,6 +240,10 @@ class SSGJmOption(JmOption):
                  ):
         super().__init__(dir_rule, download, client, plugins, filepath, call_after_init_plugin)
 
+    def new_jm_client(self, domain_list=None, impl=None, cache=None, domain_retry_strategy=None, **kwargs):
+        """创建client，默认使用 jm_domain_health 按域名评分选择请求域名"""
+        return super().new_jm_client(domain_list, impl, cache, domain_retry_strategy or jm_domain_health, **kwargs)
+
     @classmethod
     def default(cls) -> 'JmOption':
         option = cls.construct({})
@@ -231,6 +257,63 @@ class SSGJmOption(JmOption):
         return option
 
 
+def decode_jm_image(src_path: str, save_path: str, num: int, quality: int = 0):
+    """
+    还原JM分割打乱的图片并保存，在图片解码进程池中执行，保存格式由 save_path 的后缀决定
+
+    还原方式同 JmImageTool.decode_and_save，图片按高度被分割为 num 段并倒序排列
+    Args:
+        src_path: 下载的原始图片路径
+        save_path: 保存路径
+        num: 图片分割数，为0时不需要还原，只转换格式
+        quality: webp/jpg 图片的压缩质量(1-100)，webp 为100时使用无损压缩，为0时使用默认参数
+    """
+    with Image.open(src_path) as img_src:
+        if num == 0:
+            img_decode = img_src.copy()
+        else:
+            w, h = img_src.size
+            img_decode = Image.new("RGB", (w, h))
+            over = h % num
+            for i in range(num):
+                move = math.floor(h / num)
+                y_src = h - (move * (i + 1)) - over
+                y_dst = move * i
+
+                if i == 0:
+                    move += over
+                else:
+                    y_dst += over
+
+                img_decode.paste(img_src.crop((0, y_src, w, y_src + move)), (0, y_dst, w, y_dst + move))
+
+    save_kwargs = {}
+    suffix = os.path.splitext(save_path)[1].lower()
+    if suffix in (".jpg", ".jpeg"):
+        img_decode = img_decode.convert("RGB")
+        if quality:
+            save_kwargs["quality"] = quality
+    elif suffix == ".webp" and quality:
+        if quality >= 100:
+            save_kwargs["lossless"] = True
+        else:
+            save_kwargs["quality"] = quality
+
+    img_decode.save(save_path, **save_kwargs)
+
+
+_decode_pool: ProcessPoolExecutor | None = None
+
+
+def get_decode_pool() -> ProcessPoolExecutor:
+    """获取图片解码进程池，图片还原为CPU密集型操作，使用多进程避免受GIL限制"""
+    global _decode_pool
+    if _decode_pool is None:
+        workers = int(config["jmcomic"]["image"]["decode_workers"]) or os.cpu_count() or 1
+        _decode_pool = ProcessPoolExecutor(max_workers=workers)
+    return _decode_pool
+
+
 jm_logger = SSGLogger("jmcomic")
 
 
@@ -239,44 +322,119 @@ def ssgJmLog(topic: str, msg: str):
 
 
 # jmcomic自定义配置
-jmcomic.JmModuleConfig.CLASS_DOWNLOADER = SSGJmDownloader
 jmcomic.JmModuleConfig.EXECUTOR_LOG = ssgJmLog
 jmcomic.JmModuleConfig.CLASS_OPTION = SSGJmOption
-jmcomic.JmModuleConfig.register_client(SSGJmClient)
 
 
-@FetcherRegistry.register("jmcomic")
+@FetcherRegistry.register("jmcomic", url_patterns=[r"(?:18comic|jm)[\w.-]*/(?:album|photo)/\d+"])
 class JmComicFetcher(ComicFetcher[JMComicInfo, JMChapterInfo]):
     site_dir = os.path.join(DATA_DIR, "jmcomic")
+    login_ttl = 6 * 3600    # 登录状态有效期(s)，超过有效期后重新登录
+    image_concurrency = 10  # 每个章节同时下载的图片数
+    image_mirror_count = 2  # 图片下载失败时可换用的其它图片CDN域名数
+    # 漫画页面中需要读取的节点(标题和信息面板)，局部解析时只保留这些节点的子树
+    ALBUM_PAGE_STRAINER = MultiStrainer(SoupStrainer("h1"), SoupStrainer("div", class_=has_class("panel-body")))
 
     def __init__(self):
-        super().__init__()
+        super().__init__(max_chapter_tasks=max(int(config["jmcomic"]["chapter_concurrency"]), 1))
         self.jm_option = jmcomic.JmModuleConfig.option_class().default()
+        self._html_client: JmHtmlClient | None = None
+        self._api_client: JmApiClient | None = None
+        self._client_lock = threading.Lock()
+
+    @staticmethod
+    def _has_account() -> bool:
+        return bool(config["jmcomic"]["login"]["username"] and config["jmcomic"]["login"]["password"])
+
+    def _is_login_valid(self) -> bool:
+        """保存的登录cookie是否在有效期内"""
+        login_config = config["jmcomic"]["login"]
+        return bool(login_config["cookie"]) and time.time() - float(login_config["login_time"] or 0) < self.login_ttl
+
+    def jm_login(self, force=False) -> bool:
+        """
+        登录JM，登录状态在有效期内时不重复登录
+        Args:
+            force: 忽略有效期，强制重新登录
+        Returns: 是否进行了登录
+        """
+        if not self._has_account() or (not force and self._is_login_valid()):
+            return False
 
-    def jm_login(self):
         try:
-            if config["jmcomic"]["login"]["username"] and config["jmcomic"]["login"]["password"]:
-                self.jm_option.call_all_plugin("login")
-                cookie = self.jm_option.client.src_dict["postman"]["meta_data"]["cookies"]
-                if cookie:
-                    config["jmcomic"]["login"]["cookie"] = json.dumps(cookie)
+            self.jm_option.call_all_plugin("login")
+            cookie = self.jm_option.client.src_dict["postman"]["meta_data"]["cookies"]
+            if cookie:
+                config["jmcomic"]["login"]["cookie"] = json.dumps(cookie)
+                config["jmcomic"]["login"]["login_time"] = int(time.time())
+            return True
         except Exception as result:
             logger.warning(f"JM登录失败, info: {result}")
+            return False
+
+    def _get_html_client(self, relogin=False) -> JmHtmlClient:
+        """获取已登录的网页端client，登录后重新创建client以带上新的cookie，否则复用已有client"""
+        with self._client_lock:
+            if self.jm_login(force=relogin) or self._html_client is None:
+                self._html_client = self.jm_option.new_jm_client(impl=JmHtmlClient)
+                self._api_client = None
+            return self._html_client
+
+    def _get_api_client(self) -> JmApiClient:
+        """获取移动端API client，用于获取章节的图片地址，登录后随网页端client一起重新创建"""
+        self._get_html_client()
+        with self._client_lock:
+            if self._api_client is None:
+                self._api_client = self.jm_option.new_jm_client(impl=JmApiClient)
+            return self._api_client
+
+    @staticmethod
+    def _is_login_required(response) -> bool:
+        """请求是否因未登录被重定向到登录页"""
+        return "/login" in str(response.url)
+
+    def _get_jm_html(self, url_path: str) -> str:
+        """请求JM网页，登录状态失效时重新登录并重试一次"""
+        response = None
+        try:
+            response = self._get_html_client().get_jm_html(url_path)
+        except JmcomicException as e:
+            if e.context.get("resp") is None or not self._is_login_required(e.context["resp"]):
+                raise
+            logger.debug(f"JM请求被重定向到登录页, info: {e}")
 
-    def _fetch_info_sync(self, url, **kwargs) -> JMComicInfo:
-        chapter_id_list = kwargs.get("chapter_id_list", None)
+        if response is not None and not self._is_login_required(response):
+            return response.text
 
-        cid = ""
-        match = re.search(r"(?:album|photo)/(\d+)", url)
-        if match:
-            cid = match.group(1)
+        if not self._has_account():
+            raise ValueError("JM资源需要登录，请在配置文件中设置用户名和密码")
 
-        url_path = f"/album/{cid}"
+        logger.info("JM登录状态已失效，重新登录")
+        return self._get_html_client(relogin=True).get_jm_html(url_path).text
 
-        self.jm_login()
-        client = self.jm_option.new_jm_client(impl=JmHtmlClient)
-        response = client.get_jm_html(url_path)
-        soup = BeautifulSoup(response.text, 'html.parser')
+    def _parse_resource_id(self, url) -> str:
+        match = re.search(r"(?:album|photo)/(\d+)", url)
+        return match.group(1) if match else ""
+
+    def _fetch_album_api(self, cid: str) -> dict:
+        """通过移动端API获取漫画信息，API返回精简的json数据，没有发布日期"""
+        album = self._get_api_client().get_album_detail(cid)
+        return {
+            "title": album.name,
+            "cover_url": JmcomicText.get_album_cover_url(album.album_id),
+            "authors": list(album.authors),
+            "tags": list(album.tags),
+            # API 中没有简介时为null
+            "description": "" if album.description == "None" else album.description,
+            "date": "",
+            "photo_list": [{"href": f"/photo/{photo_id}", "title": photo_title or album.name}
+                           for photo_id, _, photo_title in album.episode_list],
+        }
+
+    def _fetch_album_html(self, cid: str) -> dict:
+        """通过网页获取漫画信息"""
+        url_path = f"/album/{cid}"
+        soup = parse_html(self._get_jm_html(url_path), self.ALBUM_PAGE_STRAINER)
 
         panel_body = soup.find_all('div', attrs={'class': 'panel-body'})[1]
         cover_soup = panel_body.find("div", attrs={"id": "album_photo_cover"}).find("img", attrs={"itemprop": "image"})
@@ -286,27 +444,7 @@ class JmComicFetcher(ComicFetcher[JMComicInfo, JMChapterInfo]):
         date_published_soup = panel_body.find("span", attrs={"itemprop": "datePublished"}, text=re.compile(r"上架日期"))
         episode_soup = panel_body.find("div", attrs={"class": "episode"})
 
-        comic_title = soup.find("h1").string
-        comic_cover_url = cover_soup.get("src")
-        authors = []
-        for author_element in author_soup:
-            authors.append(author_element.string)
-        comic_author = " & ".join(authors)
-        comic_desc = descrip_soup.string.lstrip().removeprefix("叙述：")
-        comic_date = date_published_soup.get("content")
-        date_match = re.search(r"^(\d+?)-(\d+?)-(\d+?)$", comic_date)
-
-        comic_tag_list = []
-        for t in web_tags_tag_list:
-            comic_tag_list.append(t.string)
-
-        comic_lang = "zh"
-        if "中文" in comic_tag_list:
-            comic_lang = "zh"
-        elif "日文" in comic_tag_list:
-            comic_lang = "ja"
-        elif "英文" in comic_tag_list:
-            comic_lang = "en"
+        comic_title = node_string(soup.find("h1"))
 
         photo_list = []
         if episode_soup:
@@ -314,7 +452,7 @@ class JmComicFetcher(ComicFetcher[JMComicInfo, JMChapterInfo]):
             for photo_soup in photo_soups:
                 photo_info = {
                     "href": photo_soup.get("href"),
-                    "title": photo_soup.find("h3").string
+                    "title": node_string(photo_soup.find("h3"))
                 }
                 photo_list.append(photo_info)
         else:
@@ -324,15 +462,56 @@ class JmComicFetcher(ComicFetcher[JMComicInfo, JMChapterInfo]):
             }
             photo_list.append(photo_info)
 
+        return {
+            "title": comic_title,
+            "cover_url": cover_soup.get("src"),
+            "authors": [node_string(author_element) for author_element in author_soup],
+            "tags": [node_string(t) for t in web_tags_tag_list],
+            "description": node_string(descrip_soup).lstrip().removeprefix("叙述："),
+            "date": date_published_soup.get("content"),
+            "photo_list": photo_list,
+        }
+
+    def _fetch_album(self, cid: str) -> dict:
+        """获取漫画信息，优先使用移动端API，失败时使用网页解析"""
+        try:
+            return self._fetch_album_api(cid)
+        except MissingAlbumPhotoException:
+            raise
+        except Exception as e:
+            logger.warning(f"JM API获取漫画信息失败，尝试从网页获取, info: {e}")
+        return self._fetch_album_html(cid)
+
+    def _fetch_info_sync(self, url, **kwargs) -> JMComicInfo:
+        chapter_id_list = kwargs.get("chapter_id_list", None)
+
+        cid = self._parse_resource_id(url)
+        album = self._fetch_album(cid)
+
+        comic_title = album["title"]
+        comic_author = " & ".join(album["authors"])
+        comic_tag_list = album["tags"]
+        comic_desc = album["description"]
+        date_match = re.search(r"^(\d+?)-(\d+?)-(\d+?)$", album["date"] or "")
+
+        comic_lang = "zh"
+        if "中文" in comic_tag_list:
+            comic_lang = "zh"
+        elif "日文" in comic_tag_list:
+            comic_lang = "ja"
+        elif "英文" in comic_tag_list:
+            comic_lang = "en"
+
         comic_info = JMComicInfo()
         comic_info.view_url = url
         comic_info.cid = cid
-        comic_info.cover_url = comic_cover_url
+        comic_info.cover_url = album["cover_url"]
         comic_info.title = comic_title
         comic_info.author = comic_author
         comic_info.genres = comic_tag_list
         comic_info.description = comic_desc
 
+        photo_list = album["photo_list"]
         if not chapter_id_list:
             chapter_id_list = range(1, len(photo_list) + 1)
 
@@ -348,9 +527,10 @@ class JmComicFetcher(ComicFetcher[JMComicInfo, JMChapterInfo]):
                 comic_chapter.metadata.creator = comic_author
                 comic_chapter.metadata.subjects = comic_tag_list
                 comic_chapter.metadata.description = comic_desc
-                comic_chapter.metadata.year = date_match.group(1)
-                comic_chapter.metadata.month = date_match.group(2)
-                comic_chapter.metadata.day = date_match.group(3)
+                if date_match:
+                    comic_chapter.metadata.year = date_match.group(1)
+                    comic_chapter.metadata.month = date_match.group(2)
+                    comic_chapter.metadata.day = date_match.group(3)
                 comic_chapter.comic_info = comic_info
                 comic_chapter.url = photo_info["href"]
                 comic_chapter.title = make_filename_valid(photo_info["title"])
@@ -359,14 +539,67 @@ class JmComicFetcher(ComicFetcher[JMComicInfo, JMChapterInfo]):
 
         return comic_info
 
-    def download_jmcomic_sync(self, save_dir: str, comic_title: str, url: str, chapter: JMChapterInfo,
-                               progress: TaskDLProgress = None):
-        cid = ""
-        match = re.search(r"(?:album|photo)/(\d+)", url)
-        if match:
-            cid = match.group(1)
+    def _fetch_photo_sync(self, photo_id) -> JmPhotoDetail:
+        """获取章节详情，包含图片地址和图片分割参数"""
+        return self._get_api_client().get_photo_detail(photo_id, fetch_album=False)
+
+    async def _fetch_info(self, url, **kwargs) -> JMComicInfo:
+        return await run_in_thread_pool(EXTRACT, self._fetch_info_sync, url, **kwargs)
+
+    def _decide_image_suffix(self, image: JmImageDetail) -> str:
+        """图片保存格式，动图保持原格式，否则以配置为先"""
+        image_format = config["jmcomic"]["image"]["format"]
+        if image.is_gif or not image_format:
+            return self.jm_option.decide_image_suffix(image)
+        return "." + image_format.lower().lstrip(".")
+
+    def _image_mirror_urls(self, url: str) -> List[str]:
+        """获取图片的下载地址列表，第一个为原地址，其余为替换成其它图片CDN域名的镜像地址"""
+        parts = urlsplit(url)
+        domains = [d for d in JmModuleConfig.DOMAIN_IMAGE_LIST if d != parts.netloc][:self.image_mirror_count]
+        return [url] + [parts._replace(netloc=d).geturl() for d in domains]
+
+    async def _download_image(self, image: JmImageDetail, save_dir: str, headers: dict,
+                              semaphore: asyncio.Semaphore, progress: TaskDLProgress = None):
+        """
+        下载单张图片，下载完成后释放下载并发数，再交给图片解码进程池还原，
+        因此图片的下载和还原是流水线执行的，还原当前图片时可以继续下载后续的图片
+        """
+        save_path = os.path.join(save_dir, fix_windir_name(self.jm_option.decide_image_filename(image)) +
+                                 self._decide_image_suffix(image))
+        # 原始图片单独保存，还原完成后删除
+        raw_path = os.path.join(save_dir, f"{image.filename}.raw")
+
+        if os.path.exists(save_path):
+            logger.debug(f"图片已存在: {save_path}")
+            if progress is not None:
+                f_size = os.path.getsize(save_path)
+                progress.add_progress(raw_path, total=f_size)
+                progress.update(raw_path, f_size)
+            return
+
+        async with semaphore:
+            # 图片较小，不同时请求多个镜像竞速，只在原地址失败时换用其它CDN域名续传
+            await downloader.download_file_ex(raw_path, self._image_mirror_urls(image.download_url),
+                                              progress=progress, headers=headers, race_mirrors=False)
+
+        decode_image = self.jm_option.decide_download_image_decode(image)
+        if decode_image or not save_path.endswith(image.img_file_suffix):
+            num = JmImageTool.get_num_by_url(image.scramble_id, image.img_url) if decode_image else 0
+            quality = int(config["jmcomic"]["image"]["quality"])
+            await asyncio.get_running_loop().run_in_executor(get_decode_pool(), decode_jm_image, raw_path,
+                                                             save_path, num, quality)
+            os.remove(raw_path)
+        else:
+            os.replace(raw_path, save_path)
 
-        image_temp_dir_path = save_dir + "/" + comic_title
+    async def _download_process(self, comic_title: str, chapter: JMChapterInfo, progress: TaskDLProgress = None):
+        """
+        jmcomic只用于获取章节的图片地址和分割参数，图片通过 downloader 异步下载
+        """
+        comic_info = chapter.comic_info
+        comic_dir = comic_info.comic_dir
+        image_temp_dir_path = os.path.join(comic_dir, comic_title)
 
         if not os.path.exists(image_temp_dir_path):
             os.mkdir(image_temp_dir_path)
@@ -375,31 +608,35 @@ class JmComicFetcher(ComicFetcher[JMComicInfo, JMChapterInfo]):
             progress.init_progress()
             progress.set_status(FileDLProgress.Status.DOWNLOADING)
 
-        self.jm_option.dir_rule = DirRule("Bd", image_temp_dir_path)
-
-        downloader_obj = SSGJmDownloader(self.jm_option.copy_option(), progress)
-        downloader_obj.download_photo(int(cid))
-        if downloader_obj.has_download_failures:
-            logger.error("JM下载失败！")
-            progress.set_status(FileDLProgress.Status.DOWNLOAD_ERROR)
+        photo = await run_in_thread_pool(EXTRACT, self._fetch_photo_sync, self._parse_resource_id(chapter.url))
+        images: list[JmImageDetail] = list(photo)
+        if progress:
+            progress.set_progress_count(len(images))
+
+        headers = JmModuleConfig.new_html_headers()
+        semaphore = asyncio.Semaphore(self.image_concurrency)
+
+        results = await asyncio.gather(
+            *[self._download_image(image, image_temp_dir_path, headers, semaphore, progress) for image in images],
+            return_exceptions=True)
+        errors = [r for r in results if isinstance(r, Exception)]
+        if errors:
+            logger.error(f"JM下载失败！共{len(errors)}张图片下载失败, info: {errors[0]}")
+            if progress:
+                progress.set_status(FileDLProgress.Status.DOWNLOAD_ERROR)
             return -1
 
         if progress:
             progress.set_status(FileDLProgress.Status.PROCESS)
 
-        make_comic(save_dir, comic_title, image_temp_dir_path, chapter.metadata)
+        await run_in_thread_pool(DISK, make_comic, comic_dir, comic_title, image_temp_dir_path, chapter.metadata)
 
         if progress:
             progress.set_status(FileDLProgress.Status.DOWNLOAD_OK)
 
-        return 0
-
-    async def _fetch_info(self, url, **kwargs) -> JMComicInfo:
-        return await asyncio.to_thread(self._fetch_info_sync, url, **kwargs)
+        # 删除图片文件夹
+        if not config["download"]["comic"]["leave_images"]:
+            shutil.rmtree(image_temp_dir_path)
+            logger.info('已删除图片缓存')
 
-    async def _download_process(self, comic_title: str, chapter: JMChapterInfo, progress: TaskDLProgress = None):
-        comic_info = chapter.comic_info
-        return await asyncio.to_thread(
-            self.download_jmcomic_sync,
-            comic_info.comic_dir, comic_title, chapter.url, chapter, progress
-        )
+        return 0
@@ -7,11 +7,12 @@ from ..request.fetcher import VideoInfo, VideoFetcher, FetcherRegistry
 from ..utils.trace import logger
 from ..request.downloadtask import TaskDLProgress
 from ..utils.file_utils import *
+from ..utils.thread_utils import run_in_thread_pool, EXTRACT, DOWNLOAD
 from ..request import ytdlp
 from ..config.config_manager import config
 
 
-@FetcherRegistry.register("twitter")
+@FetcherRegistry.register("twitter", url_patterns=[r"(?:twitter\.com|//(?:www\.|mobile\.)?x\.com)/[^/]+/status/\d+"])
 class TwitterFetcher(VideoFetcher[VideoInfo]):
     site_dir = os.path.join(DATA_DIR, "twitter")
 
@@ -28,7 +29,7 @@ class TwitterFetcher(VideoFetcher[VideoInfo]):
             'cookiefile': config["twitter"]["cookie_file"]
         }
         # yt-dlp 是同步的，放到线程池执行
-        twitter_info = await asyncio.to_thread(ytdlp.get_info, video_url, extend_opts)
+        twitter_info = await run_in_thread_pool(EXTRACT, ytdlp.get_info, video_url, extend_opts, self.site_name)
 
         if not twitter_info:
             logger.error("video info is None!")
@@ -82,6 +83,7 @@ class TwitterFetcher(VideoFetcher[VideoInfo]):
             video_info.cover_url = video_cover
             video_info.thumbnail_url = video_thumbnail
             video_info.metadata = metadata
+            video_info.ie_result = info
 
             video_info_list.append(video_info)
 
@@ -99,8 +101,16 @@ class TwitterFetcher(VideoFetcher[VideoInfo]):
             'cookiefile': config["twitter"]["cookie_file"],
         }
 
+        # 每个视频单独下载，重新提取页面时使用指定视频序号的url，只下载该视频
+        url = video_info.view_url
+        ie_result = getattr(video_info, "ie_result", None)
+        if ie_result and ie_result.get("playlist_index"):
+            url = re.sub(r"(/status/\d+).*", rf"\g<1>/video/{ie_result['playlist_index']}", url)
+
         # yt-dlp 是同步的，放到线程池执行
-        await asyncio.to_thread(ytdlp.download_by_yt_dlp, "", video_info.view_url, extend_opts, progress)
+        return await run_in_thread_pool(DOWNLOAD, ytdlp.download_by_yt_dlp, "", url, extend_opts, progress,
+                                        getattr(video_info, "ie_result", None), self.site_name,
+                                        loop=asyncio.get_running_loop())
 
     def _make_save_dir(self, info: VideoInfo):
         if not self.__class__.site_dir:
@@ -116,33 +126,40 @@ class TwitterFetcher(VideoFetcher[VideoInfo]):
         if not os.path.exists(info.video_dir):
             os.mkdir(info.video_dir)
 
-    async def download(self, url, **kwargs):
+    async def _download(self, url, **kwargs):
         default_params = {
             "no_download": False,
+            "force": False,     # True: 忽略媒体库记录，重新下载
         }
         params = {**default_params, **kwargs}
         await self.task_semaphore.acquire()
-
-        logger.info(f"开始请求资源信息")
-        video_info_list = await self._get_video_info_list_by_yt_dlp(url)
-
-        if video_info_list:
-            logger.info(f"获取到{len(video_info_list)}个视频")
-            for index, video_info in enumerate(video_info_list):
-                logger.info(f"视频{index + 1}")
-                video_info.print_info()
-
-            if params["no_download"]:
+        try:
+            logger.info(f"开始请求资源信息")
+            video_info_list = await self._get_video_info_list_by_yt_dlp(url)
+
+            if video_info_list:
+                logger.info(f"获取到{len(video_info_list)}个视频")
+                for index, video_info in enumerate(video_info_list):
+                    logger.info(f"视频{index + 1}")
+                    video_info.print_info()
+
+                if params["no_download"]:
+                    self.task_semaphore.release()
+                    return
+
+                if not params["force"]:
+                    video_info_list = [v for v in video_info_list if not self._is_downloaded(v.vid)]
+                video_info_list = [v for v in video_info_list if not self._has_active_task(v)]
+                if not video_info_list:
+                    self.task_semaphore.release()
+                    return
+
+                # 每个视频创建单独的下载任务并行下载，使用已获取的视频信息，各自显示进度和重试
+                await self._start_download_tasks(video_info_list)
+            else:
                 self.task_semaphore.release()
-                return
-
-            # 遍历所有视频信息，创建目录和元数据文件
-            for video_info in video_info_list:
-                self._make_save_dir(video_info)
-                await self._make_metadata_file(video_info)
-                self._make_source_info_file(video_info)
-
-            # 创建下载任务，yt-dlp只需要提供页面url，调用一次可以下载所有视频
-            await self._start_download_task(video_info_list[0])
-        else:
-            logger.warning("未获取到任何视频")
+                logger.warning("未获取到任何视频")
+        except Exception:
+            # 下载任务创建前出错，任务不会释放并发数
+            self.task_semaphore.release()
+            raise
@@ -1,15 +1,19 @@
 from typing import List
-from bs4 import BeautifulSoup
+from bs4 import SoupStrainer
 
 from ..request.fetcher import ChapterInfo, ComicInfo, FetcherRegistry, ComicFetcher
 from ..utils.file_utils import *
 from ..request.requests import async_request
 from ..config.path import DATA_DIR
+from ..utils.html_utils import node_string, parse_html
+from ..utils.parse_executor import run_parse
 
 
-@FetcherRegistry.register("wnacg")
+@FetcherRegistry.register("wnacg", url_patterns=[r"wnacg[\w.-]*/\S*?\d+\.html"])
 class WnacgFetcher(ComicFetcher):
     site_dir = os.path.join(DATA_DIR, "wnacg")
+    # 漫画页面中需要读取的信息都在 bodywrap 中，局部解析时只保留这些节点的子树
+    COMIC_PAGE_STRAINER = SoupStrainer("div", id="bodywrap")
 
     async def _get_image_urls(self, url: str) -> List[str]:
         cid = re.search(r"\d+(?=\.html)", url).group()
@@ -31,12 +35,23 @@ class WnacgFetcher(ComicFetcher):
 
         return image_url_list
 
+    def _parse_resource_id(self, url) -> str:
+        match = re.search(r"\d+(?=\.html)", url)
+        return match.group() if match else ""
+
     async def _fetch_info(self, url, **kwargs) -> ComicInfo:
-        cid = re.search(r"\d+(?=\.html)", url).group()
+        cid = self._parse_resource_id(url)
 
         response = await async_request("GET", url)
+        comic_info = await run_parse(WnacgFetcher._parse_comic_page, cid, url, response.text)
+        comic_info.chapter_list[0].image_urls = await self._get_image_urls(url)
 
-        soup = BeautifulSoup(response.text, 'html.parser')
+        return comic_info
+
+    @staticmethod
+    def _parse_comic_page(cid: str, url: str, text: str) -> ComicInfo:
+        """解析漫画页面，返回漫画信息，章节的图片列表需另外获取"""
+        soup = parse_html(text, WnacgFetcher.COMIC_PAGE_STRAINER)
         soup_userwrap = soup.find_all('div', attrs={'id': 'bodywrap'})[0]
         soup_cc = soup.find_all('div', attrs={'id': 'bodywrap'})[1]
         soup_info = soup_userwrap.find("div", attrs={"class": "asTBcell uwconn"})
@@ -44,12 +59,12 @@ class WnacgFetcher(ComicFetcher):
         soup_uinfo = soup_userwrap.find("div", attrs={"class": "asTBcell uwuinfo"})
         soup_date = soup_cc.find('div', text=re.compile(r"上傳於"))
 
-        comic_title = soup_userwrap.find("h2").string
+        comic_title = node_string(soup_userwrap.find("h2"))
         comic_cover_url = "https://" + soup_userwrap.find("img").get("src").lstrip("/")
 
         comic_tag_list = []
         for t in tag_soup_list:
-            comic_tag_list.append(t.contents[0].string)
+            comic_tag_list.append(node_string(t.contents[0]))
 
         comic_type = re.search(r"(?<=<label>分類：)[\s\S]+?(?=</label>)", str(soup_info)).group()
         comic_tag_list.append(comic_type)
@@ -61,8 +76,8 @@ class WnacgFetcher(ComicFetcher):
             comic_lang = "zh"
 
         comic_desc = re.search(r"(?<=<p>簡介：)[\s\S]*?(?=</p>)", str(soup_info)).group()
-        comic_author = soup_uinfo.find("p").string
-        date_match = re.search(r"(\d+)-(\d+)-(\d+)", soup_date.string)
+        comic_author = node_string(soup_uinfo.find("p"))
+        date_match = re.search(r"(\d+)-(\d+)-(\d+)", node_string(soup_date))
 
         comic_info = ComicInfo()
         comic_info.view_url = url
@@ -88,8 +103,6 @@ class WnacgFetcher(ComicFetcher):
         comic_chapter.metadata.day = date_match.group(3)
         comic_chapter.comic_info = comic_info
 
-        comic_chapter.image_urls = await self._get_image_urls(url)
-
         comic_info.chapter_list.append(comic_chapter)
 
         return comic_info
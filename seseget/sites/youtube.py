@@ -10,6 +10,8 @@ from ..request.downloadtask import TaskDLProgress
 from ..request import ytdlp
 from ..utils.trace import logger
 from ..utils.file_utils import *
+from ..utils.parse_executor import run_parse
+from ..utils.thread_utils import run_in_thread_pool, EXTRACT, DOWNLOAD
 
 
 class YtbVideoInfo(VideoInfo):
@@ -33,7 +35,7 @@ class YtbVideoInfo(VideoInfo):
         logger.info(f"---------------------------------")
 
 
-@FetcherRegistry.register("youtube")
+@FetcherRegistry.register("youtube", url_patterns=[r"youtube\.com/(?:watch\?(?:\S*&)?v=|shorts/)|youtu\.be/"])
 class YoutubeFetcher(VideoFetcher[YtbVideoInfo]):
     site_dir = os.path.join(DATA_DIR, "youtube")
     GET_INFO_BY_HTML = 1
@@ -41,18 +43,32 @@ class YoutubeFetcher(VideoFetcher[YtbVideoInfo]):
     def __init__(self, max_tasks=1):
         super().__init__(max_tasks=max_tasks)
 
+    @staticmethod
+    def _parse_vid(url) -> str:
+        """
+        从url中解析视频id，支持以下格式：
+        - https://www.youtube.com/watch?v={vid}，包括 m.youtube.com 等子域名
+        - https://www.youtube.com/shorts/{vid}
+        - https://youtu.be/{vid}
+        """
+        match = re.search(r"(?:youtube\.com/(?:watch\?(?:\S*&)?v=|shorts/)|youtu\.be/)([\w-]+)", url)
+        return match.group(1) if match else ""
+
+    @staticmethod
+    def _parse_player_response(text: str) -> dict:
+        """解析视频页面中的 ytInitialPlayerResponse"""
+        info = re.findall('var ytInitialPlayerResponse = (.*?);var', text)[0]
+        return json.loads(info)
+
     @staticmethod
     async def _get_video_info_by_html(video_url):
         """通过视频页面url请求youtube,获取视频信息"""
-        vid = ""
-        match = re.search(r'https?://www\.youtube\.com/watch\?v=([^/?]+)', video_url)
-        if match:
-            vid = match.group(1)
+        vid = YoutubeFetcher._parse_vid(video_url)
 
-        response = await async_request("GET", video_url)
+        # 短链接和shorts页面统一请求视频页面
+        response = await async_request("GET", f"https://www.youtube.com/watch?v={vid}" if vid else video_url)
 
-        info = re.findall('var ytInitialPlayerResponse = (.*?);var', response.text)[0]
-        json_data = json.loads(info)
+        json_data = await run_parse(YoutubeFetcher._parse_player_response, response.text)
 
         video_title = json_data['videoDetails']['title']
         video_descript = json_data['videoDetails']['shortDescription']
@@ -90,13 +106,10 @@ class YoutubeFetcher(VideoFetcher[YtbVideoInfo]):
     @staticmethod
     async def _get_video_info_by_yt_dlp(video_url):
         """通过yt_dlp请求视频信息"""
-        vid = ""
-        match = re.search(r'https?://www\.youtube\.com/watch\?v=([^/?]+)', video_url)
-        if match:
-            vid = match.group(1)
+        vid = YoutubeFetcher._parse_vid(video_url)
 
         # yt-dlp 是同步的，放到线程池执行
-        info = await asyncio.to_thread(ytdlp.get_info, video_url)
+        info = await run_in_thread_pool(EXTRACT, ytdlp.get_info, video_url, None, YoutubeFetcher.site_name)
 
         if not info:
             logger.error("video info is None!")
@@ -116,7 +129,7 @@ class YoutubeFetcher(VideoFetcher[YtbVideoInfo]):
         video_cover = info["thumbnail"]
         video_thumbnail = info["thumbnail"]
         video_date = f'{info["upload_date"][0:4]}-{info["upload_date"][4:6]}-{info["upload_date"][6:8]}'
-        video_tags: list = info["categories"]
+        video_tags: list = list(info["categories"])
         video_tags.append(info["channel"])
 
         video_view = str(info["view_count"])
@@ -141,9 +154,13 @@ class YoutubeFetcher(VideoFetcher[YtbVideoInfo]):
         video_info.metadata = metadata
         video_info.video_view = video_view
         video_info.video_like = video_like
+        video_info.ie_result = info
 
         return copy.deepcopy(video_info)
 
+    def _parse_resource_id(self, url) -> str:
+        return self._parse_vid(url)
+
     async def _fetch_info(self, url, **kwargs) -> YtbVideoInfo:
         if self.__class__.GET_INFO_BY_HTML:
             return await self._get_video_info_by_html(url)
@@ -154,4 +171,6 @@ class YoutubeFetcher(VideoFetcher[YtbVideoInfo]):
         video_path = video_info.video_dir + '/' + make_filename_valid('%s.mp4' % video_info.name)
 
         # yt-dlp 是同步的，放到线程池执行
-        await asyncio.to_thread(ytdlp.download_by_yt_dlp, video_path, video_info.view_url, None, progress)
+        return await run_in_thread_pool(DOWNLOAD, ytdlp.download_by_yt_dlp, video_path, video_info.view_url, None,
+                                        progress, getattr(video_info, "ie_result", None), self.site_name,
+                                        loop=asyncio.get_running_loop())
@@ -0,0 +1,46 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class SingleFlight:
+    """合并并发的相同请求
+
+    相同键的调用同一时间只会执行一次，执行期间其它调用者不再重复执行，而是等待并共享同一个结果(或异常)，
+    执行完成后移除记录，之后的调用会重新执行。
+    """
+
+    def __init__(self):
+        self._futures: Dict[Hashable, asyncio.Future] = {}
+
+    def in_flight(self, key: Hashable) -> bool:
+        """指定键是否正在执行"""
+        return key in self._futures
+
+    async def do(self, key: Hashable, func: Callable[..., Awaitable[Any]], *args, **kwargs) -> Any:
+        """
+        执行 func(*args, **kwargs)，相同键正在执行时等待其结果
+        Args:
+            key: 请求键，可哈希对象
+            func: 异步函数
+        """
+        future = self._futures.get(key)
+        if future is not None:
+            # shield: 等待者被取消时不影响正在执行的请求
+            return await asyncio.shield(future)
+
+        future = asyncio.get_running_loop().create_future()
+        self._futures[key] = future
+        try:
+            result = await func(*args, **kwargs)
+            future.set_result(result)
+            return result
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # 标记异常已被获取，没有其它等待者时避免 asyncio 打印 "exception was never retrieved"
+            future.exception()
+            raise
+        finally:
+            del self._futures[key]
@@ -0,0 +1,75 @@
+import importlib.util
+from typing import Callable, Optional
+
+from bs4 import BeautifulSoup, SoupStrainer
+
+from ..config.config_manager import config
+
+
+# 支持的解析器，按优先级排列，lxml 为可选依赖，未安装时使用内置的 html.parser
+HTML_PARSERS = ["lxml", "html.parser"]
+
+
+class MultiStrainer(SoupStrainer):
+    """匹配任意一个规则的 SoupStrainer
+
+    用于局部解析，只保留页面中需要读取的多个子树，跳过其余节点的建树，规则匹配的节点会保留其所有子孙节点
+    """
+
+    def __init__(self, *strainers: SoupStrainer):
+        super().__init__()
+        self.strainers = strainers
+
+    def allow_tag_creation(self, nsprefix, name, attrs) -> bool:
+        return any(s.allow_tag_creation(nsprefix, name, attrs) for s in self.strainers)
+
+    def allow_string_creation(self, string) -> bool:
+        return any(s.allow_string_creation(string) for s in self.strainers)
+
+
+def has_class(class_name: str) -> Callable[[Optional[str]], bool]:
+    """
+    生成匹配class的规则，用于 SoupStrainer 的 class_ 参数
+
+    局部解析时节点还未创建，class属性为原始字符串，直接使用类名无法匹配包含多个类名的节点
+    """
+    def match(value) -> bool:
+        if value is None:
+            return False
+        return class_name in (value if isinstance(value, list) else value.split())
+    return match
+
+
+def node_string(node) -> Optional[str]:
+    """
+    获取节点的 .string 并转换为 str
+
+    .string 返回的 NavigableString 引用了整个解析树，直接保存会使解析结果无法 pickle(局部解析规则中含有闭包)，
+    也会在缓存中保存整个解析树，解析结果中的文本需要使用该函数转换
+    """
+    string = node.string
+    return str(string) if string is not None else None
+
+
+_parser: Optional[str] = None
+
+
+def get_html_parser() -> str:
+    """获取html解析器，配置文件未指定或指定的解析器未安装时，使用已安装的优先级最高的解析器"""
+    global _parser
+    if _parser is None:
+        parser = config["common"]["html_parser"]
+        if parser not in HTML_PARSERS or (parser != "html.parser" and importlib.util.find_spec(parser) is None):
+            parser = next(p for p in HTML_PARSERS if p == "html.parser" or importlib.util.find_spec(p) is not None)
+        _parser = parser
+    return _parser
+
+
+def parse_html(markup: str | bytes, parse_only: Optional[SoupStrainer] = None) -> BeautifulSoup:
+    """
+    解析html
+    Args:
+        markup: html文本
+        parse_only: 局部解析规则，只解析匹配的节点，为None时解析整个页面
+    """
+    return BeautifulSoup(markup, get_html_parser(), parse_only=parse_only)
@@ -0,0 +1,37 @@
+import asyncio
+import functools
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+from ..config.config_manager import config
+
+
+_executor: Optional[Executor] = None
+
+
+def get_parse_executor() -> Executor:
+    """
+    获取页面解析执行器，类型和并发数见配置文件 common.parse_executor / common.parse_workers
+
+    - thread: 线程池，开销小，解析期间事件循环仍可调度其它协程
+    - process: 进程池，解析不受GIL限制，解析函数、参数和返回值需要可以被pickle
+    """
+    global _executor
+    if _executor is None:
+        workers = int(config["common"]["parse_workers"]) or min(4, os.cpu_count() or 1)
+        if config["common"]["parse_executor"] == "process":
+            _executor = ProcessPoolExecutor(max_workers=workers)
+        else:
+            _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="SSGParser")
+    return _executor
+
+
+async def run_parse(func: Callable[..., Any], *args, **kwargs) -> Any:
+    """
+    在解析执行器中执行 func(*args, **kwargs)，避免html/json解析阻塞事件循环
+
+    func 应为模块级函数或类的静态方法，以便在进程池中执行
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_parse_executor(), functools.partial(func, *args, **kwargs))
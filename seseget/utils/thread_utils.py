@@ -1,7 +1,10 @@
+import asyncio
+import threading
 from concurrent.futures import ThreadPoolExecutor, as_completed, Future
-from typing import Callable, Optional, List
+from typing import Any, Callable, Dict, Optional, List
 
 from .trace import logger
+from ..config.config_manager import config
 
 
 class SSGThreadPool:
@@ -16,28 +19,73 @@ class SSGThreadPool:
         self._done_callback: Optional[Callable[[Future], None]] = None
         self._is_shutdown = False
 
+        # 队列统计
+        self._stats_lock = threading.Lock()
+        self._queued = 0        # 等待执行的任务数
+        self._running = 0       # 正在执行的任务数
+        self._completed = 0     # 已结束的任务数
+        self._max_queued = 0    # 等待执行任务数的峰值
+
     def _handle_exception(self, future: Future):
         """处理完成任务的异常"""
-        if future.exception():
+        if not future.cancelled() and future.exception():
             exc = future.exception()
             logger.debug(f"任务异常: {future}! info: {exc}")
 
+    def _run(self, fn, args, kwargs):
+        with self._stats_lock:
+            self._queued -= 1
+            self._running += 1
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            with self._stats_lock:
+                self._running -= 1
+                self._completed += 1
+
+    def _on_done(self, future: Future):
+        with self._stats_lock:
+            if future.cancelled():
+                # 未开始执行就被取消的任务
+                self._queued -= 1
+            # 只保留异常结束的任务，供 wait_all 检查，避免长期运行的线程池记录无限增长
+            elif future.exception() is None and future in self._threads_list:
+                self._threads_list.remove(future)
+
     def submit(self, fn, /, *args, **kwargs) -> Future:
         """提交任务到线程池"""
         if self._is_shutdown:
             raise RuntimeError("Cannot submit to a shutdown thread pool")
 
-        thread: Future = self._pool.submit(fn, *args, **kwargs)
+        with self._stats_lock:
+            self._queued += 1
+            self._max_queued = max(self._max_queued, self._queued)
+            queued = self._queued
+        thread: Future = self._pool.submit(self._run, fn, args, kwargs)
 
         if self._done_callback:
             thread.add_done_callback(self._done_callback)
         else:
             thread.add_done_callback(self._handle_exception)
 
-        logger.debug(f"提交任务 {thread}")
-        self._threads_list.append(thread)
+        logger.debug(f"提交任务 {thread} 到 {self._name}, 排队任务数: {queued}")
+        with self._stats_lock:
+            self._threads_list.append(thread)
+        thread.add_done_callback(self._on_done)
         return thread
 
+    def stats(self) -> Dict[str, Any]:
+        """线程池队列统计"""
+        with self._stats_lock:
+            return {
+                "name": self._name,
+                "max_workers": self._max_workers,
+                "queued": self._queued,
+                "running": self._running,
+                "completed": self._completed,
+                "max_queued": self._max_queued,
+            }
+
     def close(self, wait: bool = True, cancel_futures: bool = False):
         """关闭线程池
 
@@ -49,7 +97,7 @@ class SSGThreadPool:
             return
 
         if cancel_futures:
-            for f in self._threads_list:
+            for f in list(self._threads_list):
                 if not f.done():
                     f.cancel()
                     logger.debug(f"取消任务: {f}")
@@ -67,7 +115,7 @@ class SSGThreadPool:
             return
 
         try:
-            for t in as_completed(self._threads_list):
+            for t in as_completed(list(self._threads_list)):
                 exception = t.exception()
                 if exception and raise_exceptions:
                     raise exception
@@ -94,3 +142,35 @@ class SSGThreadPool:
     @property
     def all_done(self) -> bool:
         return all(future.done() for future in self._threads_list)
+
+
+# 阻塞任务的分类，每类任务使用独立的线程池，避免耗时长的任务占满线程影响其它任务，线程数见配置文件 executor 项
+EXTRACT = "extract"         # 同步库获取资源信息，如 yt-dlp 提取视频信息、jmcomic 获取漫画详情
+DOWNLOAD = "download"       # 同步库下载，如 yt-dlp 下载视频
+SUBPROCESS = "subprocess"   # 等待子进程，如 ffmpeg 合并音视频
+DISK = "disk"               # 文件读写，如打包漫画文件、删除缓存目录
+
+_thread_pools: Dict[str, SSGThreadPool] = {}
+_thread_pools_lock = threading.Lock()
+
+
+def get_thread_pool(name: str) -> SSGThreadPool:
+    """获取指定分类的线程池，首次使用时创建"""
+    with _thread_pools_lock:
+        pool = _thread_pools.get(name)
+        if pool is None:
+            pool = SSGThreadPool(max(int(config["executor"][name]), 1), name=f"SSG-{name}")
+            _thread_pools[name] = pool
+        return pool
+
+
+async def run_in_thread_pool(name: str, fn, /, *args, **kwargs):
+    """在指定分类的线程池中执行阻塞函数，等待其结果"""
+    return await asyncio.wrap_future(get_thread_pool(name).submit(fn, *args, **kwargs))
+
+
+def get_thread_pool_stats() -> List[Dict[str, Any]]:
+    """所有已创建的线程池的队列统计"""
+    with _thread_pools_lock:
+        pools = list(_thread_pools.values())
+    return [pool.stats() for pool in pools]
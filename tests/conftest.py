@@ -0,0 +1,55 @@
+import os
+from types import SimpleNamespace
+
+import pytest
+from bs4.element import PageElement
+
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), "data")
+
+
+def read_data(name: str) -> str:
+    """读取 tests/data 下的页面样本"""
+    with open(os.path.join(DATA_DIR, name), encoding="utf-8") as f:
+        return f.read()
+
+
+def assert_plain_data(obj, path="info"):
+    """递归检查解析结果中只包含普通数据，不包含 bs4 节点(NavigableString 等)"""
+    assert not isinstance(obj, PageElement), f"{path} is {type(obj).__name__}"
+    if isinstance(obj, dict):
+        for key, value in obj.items():
+            assert_plain_data(value, f"{path}[{key!r}]")
+    elif isinstance(obj, (list, tuple, set)):
+        for index, value in enumerate(obj):
+            assert_plain_data(value, f"{path}[{index}]")
+    elif hasattr(obj, "__dict__"):
+        for key, value in vars(obj).items():
+            # 章节中反向引用的漫画信息会在漫画信息中检查
+            if key == "comic_info":
+                continue
+            assert_plain_data(value, f"{path}.{key}")
+
+
+class FakeAsyncRequest:
+    """替代 async_request，按url前缀返回页面样本"""
+
+    def __init__(self, pages: dict):
+        self.pages = pages
+        self.calls = []
+
+    async def __call__(self, method, url, **kwargs):
+        self.calls.append(url)
+        for prefix, name in self.pages.items():
+            if url.startswith(prefix):
+                return SimpleNamespace(text=read_data(name), url=url)
+        raise AssertionError(f"unexpected request: {url}")
+
+
+@pytest.fixture
+def info_cache(tmp_path):
+    from seseget.request.info_cache import InfoCache
+
+    cache = InfoCache(str(tmp_path / "info_cache.db"))
+    yield cache
+    cache.close()
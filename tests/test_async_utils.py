@@ -0,0 +1,118 @@
+import asyncio
+
+import pytest
+
+from seseget.utils.async_utils import SingleFlight
+
+
+class SlowFunc:
+    """记录调用次数，等待 release 后返回结果的异步函数"""
+
+    def __init__(self, result=None, exception=None):
+        self.result = result
+        self.exception = exception
+        self.calls = 0
+        self.release = asyncio.Event()
+
+    async def __call__(self, *args, **kwargs):
+        self.calls = self.calls + 1
+        await self.release.wait()
+        if self.exception is not None:
+            raise self.exception
+        return self.result
+
+
+def test_coalesce_concurrent_calls():
+    async def main():
+        flight = SingleFlight()
+        func = SlowFunc(result={"title": "t"})
+
+        tasks = [asyncio.create_task(flight.do("key", func)) for _ in range(3)]
+        await asyncio.sleep(0)
+        assert flight.in_flight("key")
+
+        func.release.set()
+        results = await asyncio.gather(*tasks)
+
+        assert func.calls == 1
+        assert all(result is results[0] for result in results)
+        assert not flight.in_flight("key")
+
+        # 执行完成后再次调用会重新执行
+        assert await flight.do("key", func) == {"title": "t"}
+        assert func.calls == 2
+
+    asyncio.run(main())
+
+
+def test_different_keys_not_coalesced():
+    async def main():
+        flight = SingleFlight()
+        func = SlowFunc(result=1)
+        func.release.set()
+
+        await asyncio.gather(flight.do("a", func), flight.do("b", func))
+        assert func.calls == 2
+
+    asyncio.run(main())
+
+
+def test_exception_shared():
+    async def main():
+        flight = SingleFlight()
+        func = SlowFunc(exception=ValueError("boom"))
+
+        tasks = [asyncio.create_task(flight.do("key", func)) for _ in range(2)]
+        await asyncio.sleep(0)
+        func.release.set()
+
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+        assert func.calls == 1
+        assert all(isinstance(result, ValueError) for result in results)
+        assert not flight.in_flight("key")
+
+    asyncio.run(main())
+
+
+def test_cancel_waiter():
+    async def main():
+        flight = SingleFlight()
+        func = SlowFunc(result="result")
+
+        leader = asyncio.create_task(flight.do("key", func))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(flight.do("key", func))
+        other_waiter = asyncio.create_task(flight.do("key", func))
+        await asyncio.sleep(0)
+
+        # 等待者被取消不影响正在执行的请求和其它等待者
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        assert flight.in_flight("key")
+
+        func.release.set()
+        assert await leader == "result"
+        assert await other_waiter == "result"
+        assert func.calls == 1
+
+    asyncio.run(main())
+
+
+def test_cancel_leader():
+    async def main():
+        flight = SingleFlight()
+        func = SlowFunc(result="result")
+
+        leader = asyncio.create_task(flight.do("key", func))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(flight.do("key", func))
+        await asyncio.sleep(0)
+
+        # 执行者被取消时请求随之取消，等待者收到 CancelledError，记录被移除
+        leader.cancel()
+        results = await asyncio.gather(leader, waiter, return_exceptions=True)
+        assert all(isinstance(result, asyncio.CancelledError) for result in results)
+        assert not flight.in_flight("key")
+
+    asyncio.run(main())
@@ -0,0 +1,74 @@
+import io
+
+from seseget.config.config_manager import ConfigManager
+
+
+DEFAULT_CONF = """\
+# 全局配置
+common:
+  # 代理地址
+  proxy: ""
+  # 解析执行器
+  parse_executor: thread
+  parse_workers: 0
+
+# 下载配置
+download:
+  # 最大连接数
+  connections: 8
+  timeout:
+    # 连接超时(s)
+    connect: 10
+    # 读取超时(s)
+    read: 30
+  format:
+  - cbz
+  #- epub
+
+# 缓存配置
+cache:
+  enable: true  # 是否启用
+"""
+
+OLD_CONF = """\
+# 全局配置
+common:
+  parse_workers: 0
+
+# 下载配置
+download:
+  # 最大连接数
+  connections: 4
+  timeout:
+    # 连接超时(s)
+    connect: 10
+  format:
+  - cbz
+  #- epub
+"""
+
+
+def load(text):
+    return ConfigManager._yaml.load(text)
+
+
+def dump(data) -> str:
+    stream = io.StringIO()
+    ConfigManager._yaml.dump(data, stream)
+    return stream.getvalue()
+
+
+def test_merge_default_keeps_position_and_comments():
+    data = load(OLD_CONF)
+
+    assert ConfigManager._merge_default(data, load(DEFAULT_CONF))
+
+    expected = DEFAULT_CONF.replace("connections: 8", "connections: 4")
+    assert dump(data) == expected
+
+
+def test_merge_default_unchanged():
+    data = load(DEFAULT_CONF)
+
+    assert not ConfigManager._merge_default(data, load(DEFAULT_CONF))
+    assert dump(data) == DEFAULT_CONF
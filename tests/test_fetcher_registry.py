@@ -0,0 +1,76 @@
+import pytest
+
+import seseget.sites  # noqa: F401  注册所有站点
+from seseget.request.fetcher import FetcherRegistry, VideoFetcher
+
+
+SITE_URLS = [
+    ("hanime", "https://hanime1.me/watch?v=12345"),
+    ("bilibili", "https://www.bilibili.com/video/BV1xx411c7mD"),
+    ("bilibili", "https://www.bilibili.com/video/BV1xx411c7mD/?p=2"),
+    ("bilibili", "https://m.bilibili.com/video/BV1xx411c7mD"),
+    ("bilibili", "https://bilibili.com/video/BV1xx411c7mD?spm_id_from=333.1007"),
+    ("bika", "https://manhuabika.com/comic/5821859b5f6b9a4f93dbf6e9"),
+    ("twitter", "https://twitter.com/user/status/1700000000000000000"),
+    ("twitter", "https://x.com/user/status/1700000000000000000"),
+    ("jmcomic", "https://18comic.vip/album/123456/"),
+    ("jmcomic", "https://jmcomic-zzz.one/photo/123456"),
+    ("youtube", "https://www.youtube.com/watch?v=abc123"),
+    ("youtube", "https://m.youtube.com/watch?v=abc123&t=10s"),
+    ("youtube", "https://www.youtube.com/watch?app=desktop&v=abc123"),
+    ("youtube", "https://youtu.be/abc123?si=xyz"),
+    ("youtube", "https://www.youtube.com/shorts/abc123"),
+    ("wnacg", "https://www.wnacg.com/photos-index-aid-123456.html"),
+]
+
+# 能从url中解析资源id的站点
+RESOURCE_ID_SITES = {"hanime", "bilibili", "bika", "jmcomic", "youtube", "wnacg"}
+
+
+@pytest.mark.parametrize("site, url", SITE_URLS)
+def test_match_site(site, url):
+    assert FetcherRegistry.match_site(url) == site
+
+
+@pytest.mark.parametrize("site, url", [(s, u) for s, u in SITE_URLS if s in RESOURCE_ID_SITES])
+def test_matched_url_has_resource_id(site, url):
+    """url_patterns 能识别的url，站点的 _parse_resource_id 也要能解析"""
+    fetcher_class = FetcherRegistry._registry[site]
+    assert fetcher_class._parse_resource_id(object.__new__(fetcher_class), url)
+
+
+@pytest.mark.parametrize("url", [u for s, u in SITE_URLS if s == "youtube"])
+def test_youtube_vid(url):
+    assert FetcherRegistry._registry["youtube"]._parse_vid(url) == "abc123"
+
+
+@pytest.mark.parametrize("url", [u for s, u in SITE_URLS if s == "bilibili"])
+def test_bilibili_bvid(url):
+    assert FetcherRegistry._registry["bilibili"]._parse_bvid(url) == "BV1xx411c7mD"
+
+
+@pytest.mark.parametrize("url", [
+    "https://example.com/watch?v=abc123",
+    "https://www.youtube.com/@channel",
+    "https://x.com/user",
+    "https://www.wnacg.com/albums.html",
+    "not a url",
+])
+def test_match_site_unknown(url):
+    assert FetcherRegistry.match_site(url) is None
+
+
+def test_register_rebuilds_index(monkeypatch):
+    monkeypatch.setattr(FetcherRegistry, "_registry", dict(FetcherRegistry._registry))
+    monkeypatch.setattr(FetcherRegistry, "_url_patterns", list(FetcherRegistry._url_patterns))
+    monkeypatch.setattr(FetcherRegistry, "_url_index", None)
+
+    assert FetcherRegistry.match_site("https://video.example/v/1") is None
+
+    @FetcherRegistry.register("example", url_patterns=[r"video\.example/v/\d+"])
+    class ExampleFetcher(VideoFetcher):
+        async def _fetch_info(self, url, **kwargs):
+            pass
+
+    assert FetcherRegistry.match_site("https://VIDEO.example/v/1") == "example"
+    assert FetcherRegistry.match_site("https://hanime1.me/watch?v=12345") == "hanime"
@@ -0,0 +1,94 @@
+import pytest
+
+from seseget.request.downloader import HedgePolicy
+
+
+def make_policy(**hedge_config):
+    hedge_config = {"percentile": 95, "max_rate": 0.05, "min_delay": 0, **hedge_config}
+    return HedgePolicy(lambda: hedge_config), hedge_config
+
+
+def test_delay_needs_min_samples():
+    policy, _ = make_policy()
+    for _ in range(HedgePolicy.MIN_SAMPLES - 1):
+        policy.record(1.0, False)
+    assert policy.delay() is None
+
+    policy.record(1.0, False)
+    assert policy.delay() == 1.0
+
+
+def test_delay_percentile():
+    policy, _ = make_policy(percentile=90)
+    for cost in range(1, 101):
+        policy.record(float(cost), False)
+
+    assert policy.delay() == 91.0
+
+
+def test_delay_min_delay():
+    policy, _ = make_policy(min_delay=5)
+    for _ in range(HedgePolicy.MIN_SAMPLES):
+        policy.record(0.1, False)
+
+    assert policy.delay() == 5.0
+
+
+def test_failed_request_not_sampled():
+    policy, _ = make_policy()
+    for _ in range(HedgePolicy.MIN_SAMPLES):
+        policy.record(None, False)
+
+    assert policy.delay() is None
+
+
+def test_window():
+    policy, _ = make_policy(percentile=0)
+    for _ in range(HedgePolicy.WINDOW):
+        policy.record(1.0, False)
+    for _ in range(HedgePolicy.WINDOW):
+        policy.record(2.0, False)
+
+    # 只统计最近 WINDOW 个请求的耗时
+    assert policy.delay() == 2.0
+
+
+def test_config_read_per_call():
+    policy, hedge_config = make_policy(percentile=50)
+    for cost in range(1, 101):
+        policy.record(float(cost), False)
+    assert policy.delay() == 51.0
+
+    hedge_config["percentile"] = 99
+    assert policy.delay() == 100.0
+
+
+@pytest.mark.parametrize("max_rate, expected", [(0, 0), (0.05, 1), (0.1, 2)])
+def test_try_hedge_budget(max_rate, expected):
+    policy, _ = make_policy(max_rate=max_rate)
+
+    # 样本不足时按 MIN_SAMPLES 个请求计算对冲请求数上限
+    granted = 0
+    while policy.try_hedge():
+        granted = granted + 1
+    assert granted == expected
+
+
+def test_try_hedge_counts_recent_hedges():
+    policy, _ = make_policy(max_rate=0.1)
+    for _ in range(18):
+        policy.record(1.0, False)
+
+    assert policy.try_hedge()
+    assert policy.try_hedge()
+    assert not policy.try_hedge()
+
+    # 对冲请求完成后仍计入最近请求的对冲比例
+    policy.record(1.0, True)
+    policy.record(1.0, True)
+    assert not policy.try_hedge()
+
+    # 不对冲的请求增多后比例下降
+    for _ in range(10):
+        policy.record(1.0, False)
+    assert policy.try_hedge()
@@ -0,0 +1,162 @@
+import asyncio
+
+import pytest
+
+from conftest import FakeAsyncRequest, assert_plain_data, read_data
+from seseget.sites import bika, bilibili, hanime, jm_comic, twitter, wnacg, youtube
+
+
+def round_trip(cache, key, info):
+    """检查资源信息只包含普通数据，并且写入缓存后可以原样读出"""
+    assert_plain_data(info)
+    cache.put(key, info)
+    cached = cache.get(key, ttl=60)
+    assert cached is not None, f"{key} was not cached"
+    assert type(cached) is type(info)
+    return cached
+
+
+def test_hanime(info_cache, monkeypatch):
+    fake_request = FakeAsyncRequest({
+        "https://hanime1.me/watch": "hanime_video.html",
+        "https://hanime1.me/search": "hanime_search.html",
+    })
+    monkeypatch.setattr(hanime, "async_request", fake_request)
+
+    url = "https://hanime1.me/watch?v=12345"
+    info = asyncio.run(hanime.HanimeFetcher()._fetch_info(url))
+    cached = round_trip(info_cache, "hanime:12345", info)
+
+    assert len(fake_request.calls) == 2
+    assert cached.vid == "12345"
+    assert cached.name == "Title 1"
+    assert cached.cover_url == "https://img.example/cover/12345.jpg"
+    assert cached.download_url == "https://cdn.example/v1080.mp4"
+    assert cached.metadata.tag_list == info.metadata.tag_list
+    assert type(cached.metadata.title) is str
+
+
+def test_wnacg(info_cache):
+    url = "https://www.wnacg.com/photos-index-aid-100.html"
+    info = wnacg.WnacgFetcher._parse_comic_page("100", url, read_data("wnacg_comic.html"))
+    cached = round_trip(info_cache, "wnacg:100", info)
+
+    assert cached.title == "Comic Title"
+    assert cached.author == "Uploader"
+    assert cached.genres[:2] == ["tag1", "tag2"]
+    chapter = cached.chapter_list[0]
+    assert chapter.comic_info is cached
+    assert chapter.metadata.year == "2024"
+
+
+def test_jm_comic(info_cache, monkeypatch):
+    fetcher = jm_comic.JmComicFetcher()
+
+    def fetch_album_api(cid):
+        raise RuntimeError("api unavailable")
+
+    monkeypatch.setattr(fetcher, "_fetch_album_api", fetch_album_api)
+    monkeypatch.setattr(fetcher, "_get_jm_html", lambda url_path: read_data("jm_album.html"))
+
+    info = fetcher._fetch_info_sync("https://18comic.vip/album/100/")
+    cached = round_trip(info_cache, "jm:100", info)
+
+    assert cached.title == "Album Title"
+    assert cached.author == "Author A & Author B"
+    assert cached.genres == ["中文", "tag2"]
+    assert cached.description == "Album description"
+    assert [c.url for c in cached.chapter_list] == ["/photo/100", "/photo/101"]
+    assert [c.title for c in cached.chapter_list] == ["Episode 1", "Episode 2"]
+
+
+def test_bilibili(info_cache):
+    arc = {
+        "bvid": "BV1xx411c7mD",
+        "title": "Video Title",
+        "owner": {"name": "Uploader"},
+        "pubdate": 1704153600,
+        "pic": "http://i0.hdslb.com/cover.jpg",
+        "desc": "Video description",
+        "stat": {"view": 1, "like": 2, "coin": 3, "favorite": 4, "share": 5},
+    }
+    pages = [{"page": 1, "part": "P1"}, {"page": 2, "part": "P2"}]
+    for page in pages:
+        info = bilibili.BilibiliFetcher._make_video_info(arc, page, len(pages), ["tag1"])
+        cached = round_trip(info_cache, f"bilibili:{info.vid}", info)
+
+        assert cached.name == info.name
+        assert cached.cover_url == "https://i0.hdslb.com/cover.jpg"
+        assert cached.metadata.tag_list == ["tag1"]
+
+
+def test_bika(info_cache):
+    context = bika.BikaComicInfo()
+    context.title = "Comic Title"
+    context.author = "Author"
+    context.genres = ["生肉"]
+    context.description = "Comic description"
+    context.cover = "https://storage.example/cover.jpg"
+    context.chapter = [
+        {"order": 0},
+        {"title": "Chapter 1", "order": 1, "updated_at": "2024-01-02T00:00:00.000Z",
+         "pages": [{"media": {"fileServer": "https://storage.example", "path": "tobs/a/b/1.jpg"}}]},
+    ]
+
+    fetcher = bika.BikaFetcher()
+    url = "https://manhuabika.com/pcomicview/?cid=abc"
+    info = fetcher._make_comic_info(url, "abc", context)
+    info.chapter_list.append(fetcher._make_chapter_info(context, context.chapter[1], info))
+    cached = round_trip(info_cache, "bika:abc", info)
+
+    assert cached.title == "Comic Title"
+    chapter = cached.chapter_list[0]
+    assert chapter.image_urls == ["https://storage.example/static/1.jpg"]
+    assert chapter.metadata.language == "ja"
+
+
+@pytest.mark.parametrize("url", ["https://www.youtube.com/watch?v=abc123", "https://youtu.be/abc123"])
+def test_youtube(info_cache, monkeypatch, url):
+    monkeypatch.setattr(youtube, "async_request", FakeAsyncRequest({
+        "https://www.youtube.com/watch": "youtube_watch.html",
+    }))
+
+    info = asyncio.run(youtube.YoutubeFetcher._get_video_info_by_html(url))
+    cached = round_trip(info_cache, "youtube:abc123", info)
+
+    assert cached.vid == "abc123"
+    assert cached.name == "Video Title"
+    assert cached.cover_url == "https://i.ytimg.com/vi/abc123/maxresdefault.jpg"
+    assert cached.metadata.public_time == "2024-01-02"
+    assert cached.video_view == "1000"
+
+
+def test_twitter(info_cache, monkeypatch):
+    ie_result = {
+        "id": "1700000000000000000",
+        "uploader_id": "user",
+        "uploader": "User",
+        "upload_date": "20240102",
+        "description": "Tweet text",
+        "thumbnail": "https://pbs.twimg.com/thumb.jpg",
+        "formats": [{"format_id": "mp4", "url": "https://video.twimg.com/v.mp4"}],
+    }
+
+    async def fake_run_in_thread_pool(name, fn, *args, **kwargs):
+        return ie_result
+
+    monkeypatch.setattr(twitter, "run_in_thread_pool", fake_run_in_thread_pool)
+
+    url = "https://x.com/user/status/1700000000000000000"
+    info = asyncio.run(twitter.TwitterFetcher()._fetch_info(url))
+    cached = round_trip(info_cache, "twitter:1700000000000000000", info)
+
+    assert cached.name == "user_20240102_1700000000000000000"
+    assert cached.metadata.public_time == "2024-01-02"
+    assert cached.ie_result == ie_result
+
+
+@pytest.mark.parametrize("ttl", [0, -1])
+def test_expired(info_cache, ttl):
+    info_cache.put("site:1", {"title": "t"})
+    assert info_cache.get("site:1", ttl=ttl) is None
+    assert info_cache.get("site:1", ttl=60) is None
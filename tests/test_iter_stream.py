@@ -0,0 +1,75 @@
+import asyncio
+import time
+
+import pytest
+
+from seseget.request import downloader
+from seseget.request.downloader import StreamStalledError, _iter_stream
+
+
+class FakeResponse:
+    """按 (等待时间, 数据) 列表产出数据的流式响应"""
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+
+    async def aiter_content(self):
+        for delay, data in self.chunks:
+            await asyncio.sleep(delay)
+            yield data
+
+
+@pytest.fixture
+def timeout_config(monkeypatch):
+    """替换下载超时配置，避免修改配置文件"""
+    timeout = {"idle": 0.2, "low_speed": 0, "low_speed_window": 0.3}
+    monkeypatch.setattr(downloader, "config", {"download": {"timeout": timeout}})
+    return timeout
+
+
+def read_all(chunks) -> bytes:
+    async def main():
+        return b"".join([data async for data in _iter_stream(FakeResponse(chunks))])
+
+    return asyncio.run(main())
+
+
+def test_read_all(timeout_config):
+    assert read_all([(0, b"a"), (0.05, b"b"), (0, b"c")]) == b"abc"
+
+
+def test_idle_timeout(timeout_config):
+    start = time.monotonic()
+    with pytest.raises(StreamStalledError, match="没有收到数据"):
+        read_all([(0, b"a"), (5, b"b")])
+
+    assert time.monotonic() - start < 1
+
+
+def test_slow_stream_within_idle_timeout(timeout_config):
+    # 每次读取都在空闲超时内，未设置最低速度时不会中断
+    chunks = [(0.1, b"a")] * 5
+    assert read_all(chunks) == b"a" * 5
+
+
+def test_low_speed(timeout_config):
+    timeout_config["low_speed"] = 1     # 1KB/s
+    start = time.monotonic()
+    with pytest.raises(StreamStalledError, match="低于最低速度"):
+        read_all([(0.02, b"a" * 10)] * 100)
+
+    # 至少经过一个统计窗口后才判断速度
+    assert 0.3 <= time.monotonic() - start < 1
+
+
+def test_fast_stream_not_low_speed(timeout_config):
+    timeout_config["low_speed"] = 1     # 1KB/s
+    chunks = [(0.02, b"a" * 1024)] * 25
+    assert len(read_all(chunks)) == 1024 * 25
+
+
+def test_speed_recovers_within_window(timeout_config):
+    timeout_config["low_speed"] = 1     # 1KB/s
+    # 开始时有一段较慢的传输，但窗口内的平均速度不低于最低速度
+    chunks = [(0.1, b"a" * 10), (0.1, b"a" * 10), (0, b"a" * 4096)] + [(0.05, b"a" * 512)] * 10
+    assert len(read_all(chunks)) == 20 + 4096 + 512 * 10
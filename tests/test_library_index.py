@@ -0,0 +1,84 @@
+import os
+
+import pytest
+
+from seseget.library.index import LibraryIndex
+
+
+@pytest.fixture
+def index(tmp_path):
+    library_index = LibraryIndex(str(tmp_path / "library.db"))
+    yield library_index
+    library_index.close()
+
+
+def test_allocate_dir_collisions(index, tmp_path):
+    path = str(tmp_path / "data" / "title")
+
+    # 目录不存在时直接使用原目录名
+    assert index.allocate_dir(path) == path
+    os.makedirs(path)
+
+    assert index.allocate_dir(path) == f"{path}_[1]"
+    os.makedirs(f"{path}_[1]")
+    assert index.allocate_dir(path) == f"{path}_[2]"
+    os.makedirs(f"{path}_[2]")
+
+    # 外部创建的目录占用了序号时继续向后查找
+    os.makedirs(f"{path}_[3]")
+    assert index.allocate_dir(path) == f"{path}_[4]"
+
+
+def test_allocate_dir_without_create(index, tmp_path):
+    path = str(tmp_path / "title")
+    os.makedirs(path)
+
+    # 分配后的序号不再重复分配，即使目录还未创建
+    assert index.allocate_dir(path) == f"{path}_[1]"
+    assert index.allocate_dir(path) == f"{path}_[2]"
+
+
+def test_add_and_contains(index, tmp_path):
+    path = tmp_path / "hanime" / "title"
+    path.mkdir(parents=True)
+
+    index.add("hanime", "12345", str(path), title="title", url="https://hanime1.me/watch?v=12345")
+
+    assert index.contains("hanime", "12345")
+    assert not index.contains("hanime", "54321")
+    assert not index.contains("wnacg", "12345")
+    assert index.get("hanime", "12345")["path"] == str(path)
+    assert (path / LibraryIndex.MANIFEST_NAME).exists()
+
+    # 目录被删除后记录失效
+    os.remove(path / LibraryIndex.MANIFEST_NAME)
+    path.rmdir()
+    assert not index.contains("hanime", "12345")
+
+
+def test_rebuild(index, tmp_path):
+    data_dir = tmp_path / "data"
+    comic_dir = data_dir / "wnacg" / "comic"
+    video_dir = data_dir / "bilibili" / "video"
+    comic_dir.mkdir(parents=True)
+    video_dir.mkdir(parents=True)
+
+    index.add("wnacg", "100/1", str(comic_dir), title="chapter 1")
+    index.add("wnacg", "100/2", str(comic_dir), title="chapter 2")
+    index.add("bilibili", "BV1xx411c7mD", str(video_dir), title="video")
+
+    broken_dir = data_dir / "broken"
+    broken_dir.mkdir()
+    (broken_dir / LibraryIndex.MANIFEST_NAME).write_text("{", encoding="utf-8")
+
+    # 使用新的数据库模拟索引丢失
+    rebuilt = LibraryIndex(str(tmp_path / "rebuilt.db"))
+    try:
+        assert not rebuilt.contains("wnacg", "100/1")
+        assert rebuilt.rebuild(str(data_dir)) == 3
+
+        assert rebuilt.get("wnacg", "100/1")["title"] == "chapter 1"
+        assert rebuilt.get("wnacg", "100/2")["path"] == str(comic_dir)
+        assert rebuilt.contains("bilibili", "BV1xx411c7mD")
+    finally:
+        rebuilt.close()
@@ -0,0 +1,70 @@
+import asyncio
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+
+from conftest import FakeAsyncRequest, assert_plain_data, read_data
+from seseget.sites import hanime, wnacg, youtube
+from seseget.utils import parse_executor
+from seseget.utils.parse_executor import run_parse
+
+
+@pytest.fixture
+def process_executor(monkeypatch):
+    """使用进程池作为解析执行器，解析函数、参数和返回值都需要可以被pickle"""
+    executor = ProcessPoolExecutor(max_workers=1)
+    monkeypatch.setattr(parse_executor, "_executor", executor)
+    yield executor
+    executor.shutdown(wait=True, cancel_futures=True)
+
+
+def run_in_process(func, *args):
+    result = asyncio.run(run_parse(func, *args))
+    assert_plain_data(result)
+    pickle.dumps(result)
+    return result
+
+
+def test_hanime_parse_video_page(process_executor):
+    thumbnail_url, download_url, metadata, series_info, search_genre = \
+        run_in_process(hanime.HanimeFetcher._parse_video_page, read_data("hanime_video.html"))
+
+    assert thumbnail_url == "https://img.example/thumb.jpg"
+    assert download_url == "https://cdn.example/v1080.mp4"
+    assert metadata.title == "Title 1"
+    assert search_genre == "裏番"
+
+
+def test_hanime_parse_search_cover(process_executor):
+    cover_url = run_in_process(hanime.HanimeFetcher._parse_search_cover,
+                               read_data("hanime_search.html"), "https://hanime1.me/watch?v=12345")
+
+    assert cover_url == "https://img.example/cover/12345.jpg"
+
+
+def test_hanime_fetch_info(process_executor, monkeypatch):
+    monkeypatch.setattr(hanime, "async_request", FakeAsyncRequest({
+        "https://hanime1.me/watch": "hanime_video.html",
+        "https://hanime1.me/search": "hanime_search.html",
+    }))
+
+    info = asyncio.run(hanime.HanimeFetcher()._fetch_info("https://hanime1.me/watch?v=12345"))
+
+    assert_plain_data(info)
+    assert info.cover_url == "https://img.example/cover/12345.jpg"
+
+
+def test_wnacg_parse_comic_page(process_executor):
+    comic_info = run_in_process(wnacg.WnacgFetcher._parse_comic_page,
+                                "100", "https://www.wnacg.com/photos-index-aid-100.html",
+                                read_data("wnacg_comic.html"))
+
+    assert comic_info.title == "Comic Title"
+    assert comic_info.chapter_list[0].comic_info is comic_info
+
+
+def test_youtube_parse_player_response(process_executor):
+    json_data = run_in_process(youtube.YoutubeFetcher._parse_player_response, read_data("youtube_watch.html"))
+
+    assert json_data["videoDetails"]["title"] == "Video Title"